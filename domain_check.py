@@ -0,0 +1,305 @@
+"""Liveness and redirect check for the domains in the tools' workbooks.
+
+Collects the Website column of every workbook given (any tool's output or
+sweep.xlsx), checks each distinct domain once with asyncio and writes the
+workbooks back with Live, HTTP status, Final URL and Latency ms columns
+(replacing those of an earlier run).
+A domain listed by several registries is resolved and requested once.
+
+Each domain gets a HEAD request to https://<domain>/ (GET when HEAD is
+refused, http:// when https does not connect), following up to
+MAX_REDIRECTS redirects. Only status line and headers are read. Open
+connections are capped overall (--concurrency) and per host (--per-host),
+so sites sharing one redirect target or hosting provider are not hammered.
+
+--resolve HOST=ADDR:PORT sends every connection for HOST to ADDR:PORT, so
+the stage can run against a local stand-in server:
+    python -m http.server 8080 &
+    python domain_check.py certificates.xlsx --resolve example.nl=127.0.0.1:8080
+
+Usage:
+    python domain_check.py sweep/sweep.xlsx
+    python domain_check.py certificates.xlsx ggl_whitelist_3.xlsx --suffix _checked
+"""
+import argparse
+import asyncio
+import os
+import socket
+import ssl
+import time
+from collections import defaultdict
+from urllib.parse import urljoin, urlsplit
+
+from domain_utils import normalize_domain
+from records import DomainCheck
+
+DEFAULT_CONCURRENCY = 50
+DEFAULT_PER_HOST = 2
+DEFAULT_TIMEOUT = 10
+MAX_REDIRECTS = 5
+USER_AGENT = "Mozilla/5.0 (compatible; search_tools domain check)"
+CHECK_HEADERS = ["Live", "HTTP status", "Final URL", "Latency ms"]
+
+
+class HttpError(Exception):
+    """Connection-level failure (DNS, TCP, TLS, malformed response)."""
+
+
+class DomainChecker:
+    """Checks domains concurrently under a global and a per-host connection cap."""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, timeout=DEFAULT_TIMEOUT,
+                 resolve=None):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.resolve = dict(resolve or {})
+        self.ssl_context = ssl.create_default_context()
+        self.dns = {}  # host -> future of its getaddrinfo() result (one lookup per host)
+
+    async def _address(self, host, port):
+        if host in self.resolve:
+            return self.resolve[host]
+        if host not in self.dns:
+            loop = asyncio.get_running_loop()
+            self.dns[host] = asyncio.ensure_future(loop.getaddrinfo(host, None, type=socket.SOCK_STREAM))
+        try:
+            # Shielded: a check timing out must not cancel the lookup other checks of this host wait on
+            infos = await asyncio.shield(self.dns[host])
+        except OSError as e:
+            raise HttpError(f"dns: {e}")
+        # IPv4 first: many hosts publish AAAA records that don't answer
+        infos = sorted(infos, key=lambda info: info[0] != socket.AF_INET)
+        return infos[0][4][0], port
+
+    async def _request(self, method, url):
+        """(status, location) of one request; only the status line and headers are read."""
+        parts = urlsplit(url)
+        secure = parts.scheme == "https"
+        host = parts.hostname
+        address, port = await self._address(host, parts.port or (443 if secure else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        # Host slot first, so a busy host doesn't sit on a pool slot while it waits
+        async with self.hosts[host], self.pool:
+            try:
+                reader, writer = await asyncio.open_connection(
+                    address, port, ssl=self.ssl_context if secure else None, server_hostname=host if secure else None)
+            except ssl.SSLError as e:
+                raise HttpError(f"tls: {e}")
+            except OSError as e:
+                raise HttpError(f"connect: {e}")
+            try:
+                writer.write((f"{method} {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUser-Agent: {USER_AGENT}\r\n"
+                              "Accept: */*\r\nConnection: close\r\n\r\n").encode("latin-1"))
+                await writer.drain()
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, OSError) as e:
+                raise HttpError(f"response: {e}")
+            finally:
+                writer.close()
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            status = int(lines[0].split()[1])
+        except (IndexError, ValueError):
+            raise HttpError(f"response: bad status line {lines[0][:80]!r}")
+        location = None
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "location":
+                location = value.strip()
+        return status, location
+
+    async def _follow(self, url):
+        """(status, final url) after following redirects."""
+        for _ in range(MAX_REDIRECTS + 1):
+            status, location = await self._request("HEAD", url)
+            if status in (405, 501):  # HEAD not supported
+                status, location = await self._request("GET", url)
+            if status not in (301, 302, 303, 307, 308) or not location:
+                return status, url
+            url = urljoin(url, location)
+        return status, url
+
+    async def check(self, domain):
+        start = time.perf_counter()
+        error = None
+        for scheme in ("https", "http"):
+            try:
+                status, final_url = await asyncio.wait_for(self._follow(f"{scheme}://{domain}/"), self.timeout)
+            except asyncio.TimeoutError:
+                error = f"timeout after {self.timeout:g}s"
+            except HttpError as e:
+                error = str(e)
+                if error.startswith("dns"):
+                    break  # http:// won't resolve either
+            else:
+                return DomainCheck(domain, True, status, final_url, round((time.perf_counter() - start) * 1000))
+        return DomainCheck(domain, False, error=error, latency_ms=round((time.perf_counter() - start) * 1000))
+
+    async def check_all(self, domains):
+        self.pool = asyncio.Semaphore(self.concurrency)
+        self.hosts = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        domains = list(dict.fromkeys(domains))
+        results = {}
+        done = 0
+
+        async def run(domain):
+            nonlocal done
+            results[domain] = await self.check(domain)
+            done += 1
+            if done % 100 == 0:
+                print(f"Checked {done}/{len(domains)} domains")
+
+        # No more pending checks than connections, so thousands of domains don't hold thousands of tasks
+        queue = iter(domains)
+
+        async def worker():
+            for domain in queue:
+                await run(domain)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(domains)) or 1)))
+        return results
+
+
+def check_domains(domains, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, timeout=DEFAULT_TIMEOUT,
+                  resolve=None):
+    """Checks every distinct domain once. Returns {domain: DomainCheck}."""
+    checker = DomainChecker(concurrency, per_host, timeout, resolve)
+    return asyncio.run(checker.check_all(domains))
+
+
+def _website_column(header):
+    for i, name in enumerate(header):
+        if str(name or "").strip().lower() == "website":
+            return i
+    return None
+
+
+def workbook_domains(path):
+    """Distinct normalized domains of a workbook's Website column."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        column = _website_column(next(rows, ()))
+        if column is None:
+            print(f"Warning: {path} has no Website column, skipped")
+            return []
+        return list(dict.fromkeys(
+            d for d in (normalize_domain(str(row[column] or "")) for row in rows if column < len(row)) if d))
+    finally:
+        wb.close()
+
+
+def check_columns(check):
+    if check is None:
+        return ["", "", "", ""]
+    if not check.reachable:
+        return ["no", check.error, "", check.latency_ms]
+    return ["yes", check.status, check.final_url, check.latency_ms]
+
+
+def _column_widths(ws, columns):
+    """{0-based column: width} of a read-only worksheet, from the sheet's <cols> element (rows are not read)."""
+    from xml.etree.ElementTree import iterparse
+
+    widths = {}
+    with ws._get_source() as source:
+        for event, element in iterparse(source, events=("start", "end")):
+            tag = element.tag.rpartition("}")[2]
+            if event == "start" and tag == "sheetData":
+                break  # <cols> comes before the rows
+            if event == "end" and tag == "col" and element.get("width"):
+                for index in range(int(element.get("min")) - 1, min(int(element.get("max")), columns)):
+                    widths[index] = float(element.get("width"))
+    return widths
+
+
+def annotate_workbook(path, checks, output=None):
+    """Copies a workbook with the check columns at the end (in place without `output`). Returns its path.
+
+    Check columns of an earlier run are replaced, and column widths are kept.
+    """
+    from openpyxl import load_workbook
+    from openpyxl.utils import get_column_letter
+    from stream_utils import StreamingWorkbook
+
+    wb = load_workbook(path, read_only=True)
+    target = output or f"{path}.{os.getpid()}.tmp"
+    try:
+        ws = wb.active
+        rows = ws.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        column = _website_column(header)
+        if column is None:
+            return None
+        keep = [i for i, name in enumerate(header) if name not in CHECK_HEADERS]
+        previous = {name: i for i, name in enumerate(header) if name in CHECK_HEADERS}
+        widths = _column_widths(ws, len(header))
+        sources = keep + [previous.get(name) for name in CHECK_HEADERS]
+        out_widths = {get_column_letter(n): widths[i] for n, i in enumerate(sources, 1) if i in widths}
+        with StreamingWorkbook(target, ws.title, [header[i] for i in keep] + CHECK_HEADERS, out_widths) as out:
+            for row in rows:
+                domain = normalize_domain(str(row[column] or "")) if column < len(row) else None
+                out.append([row[i] if i < len(row) else None for i in keep] + check_columns(checks.get(domain)))
+    finally:
+        wb.close()
+    if not output:
+        os.replace(target, path)
+    return output or path
+
+
+def summarize(checks, seconds):
+    reachable = [c for c in checks.values() if c.reachable]
+    redirected = [c for c in reachable if urlsplit(c.final_url).hostname not in (c.domain, f"www.{c.domain}")]
+    ok = [c for c in reachable if c.status < 400]
+    print(f"Checked {len(checks)} domains in {seconds:.1f}s: {len(ok)} ok, "
+          f"{len(reachable) - len(ok)} HTTP error, {len(checks) - len(reachable)} unreachable, "
+          f"{len(redirected)} redirect to another host")
+
+
+def parse_resolve(value):
+    """argparse type for --resolve HOST=ADDR:PORT."""
+    host, _, target = value.partition("=")
+    address, _, port = target.rpartition(":")
+    if not host or not address or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"expected HOST=ADDR:PORT, got '{value}'")
+    return host.lower(), (address, int(port))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the domains in the tools' workbooks are live")
+    parser.add_argument("workbooks", nargs="+", help="Workbooks with a Website column")
+    parser.add_argument("--suffix", default="", help="Write <name><suffix>.xlsx instead of updating the workbooks in place")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"Open connections at most (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST, help=f"Open connections per host at most (default: {DEFAULT_PER_HOST})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help=f"Seconds per attempt (https, then http), redirects included (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument("--resolve", type=parse_resolve, action="append", default=[], metavar="HOST=ADDR:PORT", help="Connect to ADDR:PORT for HOST (repeatable), e.g. a local test server")
+    args = parser.parse_args()
+
+    domains = []
+    for path in args.workbooks:
+        domains.extend(workbook_domains(path))
+    unique = list(dict.fromkeys(domains))
+    print(f"{len(unique)} distinct domains ({len(domains)} across {len(args.workbooks)} workbook(s))")
+
+    start = time.perf_counter()
+    checks = check_domains(unique, args.concurrency, args.per_host, args.timeout, dict(args.resolve))
+    summarize(checks, time.perf_counter() - start)
+
+    for path in args.workbooks:
+        output = None
+        if args.suffix:
+            stem, ext = os.path.splitext(path)
+            output = f"{stem}{args.suffix}{ext}"
+        written = annotate_workbook(path, checks, output)
+        if written:
+            print(f"Wrote {written}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Shared domain normalization for all registry tools.
+
+All tools funnel hrefs and free-text website cells through the same rules:
+lowercase, no scheme/credentials/port/path, no leading "www.", and a
+syntactic hostname check. Public suffixes come from an offline snapshot
+(public_suffix_list.dat) so nothing touches the network.
+"""
+import os
+import re
+from functools import lru_cache
+
+PUBLIC_SUFFIX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "public_suffix_list.dat")
+
+# Scheme, credentials, then the host up to the first port/path/query/fragment
+_HOST_RE = re.compile(r"^\s*(?:(?:[a-z][a-z0-9+.-]*:)?//)?(?:[^@/?#\s]*@)?([^/?#:\s]+)", re.IGNORECASE)
+_VALID_HOST_RE = re.compile(r"^(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+(?:[a-z]{2,63}|xn--[a-z0-9-]{1,59})$")
+_WWW_RE = re.compile(r"^www\d*\.")
+_SPLIT_RE = re.compile(r"[,;|\s]+")
+_FIND_RE = re.compile(r"\b(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,}\b")
+
+_suffix_rules = None
+
+
+def load_public_suffixes(path=PUBLIC_SUFFIX_FILE):
+    """Parses a public suffix list file into (rules, wildcards, exceptions)."""
+    rules, wildcards, exceptions = set(), set(), set()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('//'):
+                    continue
+                rule = line.split()[0].lower()
+                if rule.startswith('!'):
+                    exceptions.add(rule[1:])
+                elif rule.startswith('*.'):
+                    wildcards.add(rule[2:])
+                else:
+                    rules.add(rule)
+    except FileNotFoundError:
+        print(f"Warning: public suffix snapshot not found at {path}, falling back to last label.")
+    return frozenset(rules), frozenset(wildcards), frozenset(exceptions)
+
+
+def _rules():
+    global _suffix_rules
+    if _suffix_rules is None:
+        _suffix_rules = load_public_suffixes()
+    return _suffix_rules
+
+
+@lru_cache(maxsize=1 << 18)
+def normalize_domain(value):
+    """Returns the bare lowercase hostname for a URL/domain string, or None if it isn't one."""
+    if not value:
+        return None
+    match = _HOST_RE.match(value)
+    if not match:
+        return None
+    host = match.group(1).lower().strip('.')
+    if not host.isascii():
+        try:
+            host = host.encode('idna').decode('ascii')
+        except UnicodeError:
+            return None
+    host = _WWW_RE.sub('', host, count=1)
+    if not _VALID_HOST_RE.match(host):
+        return None
+    return host
+
+
+@lru_cache(maxsize=1 << 16)
+def public_suffix(domain):
+    """Returns the public suffix of an already normalized domain (e.g. 'co.uk')."""
+    rules, wildcards, exceptions = _rules()
+    labels = domain.split('.')
+    for i in range(len(labels)):
+        candidate = '.'.join(labels[i:])
+        if candidate in exceptions:
+            return '.'.join(labels[i + 1:])
+        if candidate in rules:
+            return candidate
+        if i + 1 < len(labels) and '.'.join(labels[i + 1:]) in wildcards:
+            return candidate
+    return labels[-1]
+
+
+def registrable_domain(domain):
+    """Returns the registrable part (eTLD+1) of a normalized domain, e.g. 'bet365.co.uk'."""
+    suffix = public_suffix(domain)
+    if domain == suffix:
+        return None
+    head = domain[:-len(suffix) - 1]
+    return f"{head.rsplit('.', 1)[-1]}.{suffix}"
+
+
+def strip_public_suffix(domain):
+    """Returns the domain without its public suffix, e.g. 'sports.bet365' for 'sports.bet365.co.uk'."""
+    suffix = public_suffix(domain)
+    if domain == suffix:
+        return ''
+    return domain[:-len(suffix) - 1]
+
+
+def normalize_domains(values, dedupe=True):
+    """Batch API: normalizes an iterable of URLs/domains, dropping invalid ones.
+
+    Order of first appearance is kept. Raw duplicates are collapsed before
+    normalizing so large registry dumps only pay for unique strings.
+    """
+    if dedupe:
+        values = dict.fromkeys(v for v in values if v)
+    results = []
+    seen = set()
+    for value in values:
+        domain = normalize_domain(value)
+        if domain is None:
+            continue
+        if dedupe:
+            if domain in seen:
+                continue
+            seen.add(domain)
+        results.append(domain)
+    return results
+
+
+def split_domains(text):
+    """Normalizes a free-text cell of comma/semicolon/space separated domains."""
+    if not text:
+        return []
+    return normalize_domains(_SPLIT_RE.split(text))
+
+
+def extract_domains(text):
+    """Finds every domain-looking token inside arbitrary text."""
+    if not text:
+        return []
+    return normalize_domains(m.group(0) for m in _FIND_RE.finditer(text))
@@ -0,0 +1,634 @@
+"""Shared browser-driver helpers for the Selenium tools.
+
+Fast start: chromedriver is resolved once through webdriver_manager and the
+path is cached on disk. Later runs validate the cached binary offline
+(file present, `--version` runs, major version matches the local Chrome)
+and skip the network round-trips of ChromeDriverManager().install().
+
+Detail pages: fetch_in_tabs() overlaps detail page loads in background tabs
+instead of navigating the SERP tab away and reloading it afterwards.
+
+Banners: dismiss_banner() remembers per driver and host which consent and
+cookie banners were already handled (or are covered by a cookie stored in
+the profile) and only waits for a banner where one can still appear.
+
+Recycling: BrowserRecycler restarts the browser after a number of page
+loads or once Chrome's process tree passes a memory limit, with the
+replacement prelaunched in the background so the swap doesn't stall a run.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+import time
+import weakref
+from collections import Counter
+
+_MODULE_START = time.perf_counter()
+
+CACHE_DIR = os.environ.get("SEARCH_TOOLS_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "search_tools")
+DRIVER_CACHE_FILE = os.path.join(CACHE_DIR, "chromedriver.json")
+
+_VERSION_RE = re.compile(r"(\d+)\.\d+\.\d+(?:\.\d+)?")
+
+CHROME_CANDIDATES = [
+    "google-chrome", "google-chrome-stable", "chromium", "chromium-browser",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+]
+# chrome.exe --version prints nothing on Windows; the install dir is named after the version
+CHROME_WINDOWS_DIRS = [
+    r"C:\Program Files\Google\Chrome\Application",
+    r"C:\Program Files (x86)\Google\Chrome\Application",
+    os.path.join(os.environ.get("LOCALAPPDATA", ""), "Google", "Chrome", "Application"),
+]
+
+
+def process_elapsed():
+    """Seconds since the current process started (interpreter startup included where the OS tells us)."""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # Field 22 is the start time in clock ticks after boot; comm may contain spaces
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.perf_counter() - _MODULE_START
+
+
+class StartupTimer:
+    """Records named startup phases and prints how long each one took."""
+
+    def __init__(self):
+        self.marks = []
+
+    def mark(self, phase):
+        self.marks.append((phase, process_elapsed()))
+
+    def first_result(self, report=False):
+        """Marks the first finished company (in whatever mode the run uses), once; prints the report too if asked."""
+        if any(phase == "first lookup done" for phase, _ in self.marks):
+            return
+        self.mark("first lookup done")
+        if report:
+            self.report()
+
+    def report(self):
+        print("\n" + "=" * 60)
+        print("STARTUP REPORT")
+        print("=" * 60)
+        previous = 0.0
+        for phase, at in self.marks:
+            print(f"{phase:<32} +{at - previous:6.2f}s  (t={at:6.2f}s)")
+            previous = at
+        print("=" * 60)
+
+
+def _version_major(text):
+    match = _VERSION_RE.search(text or "")
+    return int(match.group(1)) if match else None
+
+
+def _run_version(binary):
+    try:
+        out = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def local_chrome_major():
+    """Major version of the installed Chrome, or None if it can't be determined offline."""
+    binary = os.environ.get("CHROME_BINARY")
+    for candidate in ([binary] if binary else []) + CHROME_CANDIDATES:
+        major = _version_major(_run_version(candidate))
+        if major:
+            return major
+    for app_dir in CHROME_WINDOWS_DIRS:
+        versions = [_version_major(os.path.basename(p)) for p in glob.glob(os.path.join(app_dir, "*.*.*.*"))]
+        versions = [v for v in versions if v]
+        if versions:
+            return max(versions)
+    return None
+
+
+def _load_cache():
+    try:
+        with open(DRIVER_CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(entry):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(DRIVER_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(entry, f, indent=2)
+    except OSError as e:
+        print(f"Warning: could not write driver cache: {e}")
+
+
+def validate_cached_driver(entry):
+    """Offline check that a cached chromedriver entry is still usable."""
+    path = entry.get("path")
+    if not path or not os.path.isfile(path) or not os.access(path, os.X_OK):
+        return False
+    driver_major = _version_major(_run_version(path))
+    if not driver_major:
+        return False
+    chrome_major = local_chrome_major()
+    if chrome_major and chrome_major != driver_major:
+        print(f"Cached chromedriver {driver_major} does not match Chrome {chrome_major}, refreshing...")
+        return False
+    return True
+
+
+def chromedriver_path(fast_start=False):
+    """Returns a chromedriver path, reusing the cached one when fast_start is set."""
+    if fast_start:
+        entry = _load_cache()
+        if entry and validate_cached_driver(entry):
+            return entry["path"]
+
+    from webdriver_manager.chrome import ChromeDriverManager
+    path = ChromeDriverManager().install()
+    _save_cache({
+        "path": path,
+        "driver_major": _version_major(_run_version(path)),
+        "resolved_at": time.time(),
+    })
+    return path
+
+
+def _host(url):
+    from urllib.parse import urlsplit
+    return urlsplit(url).netloc.lower()
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1 (--tabs, --tabs-per-host)."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a whole number, got '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def fetch_in_tabs(driver, urls, handler, max_tabs=4, per_host=2, timeout=20, poll_interval=0.2, on_error=None, ready=None):
+    """Loads detail URLs in background tabs and runs handler(driver, url) on each as it finishes.
+
+    Tabs are opened with window.open from the current (SERP) window, so page
+    loads overlap and the SERP itself is never reloaded. At most max_tabs are
+    open at once and at most per_host of them point at the same host. The
+    handler runs with the driver switched to the finished tab; its return
+    value is collected as (url, result) in completion order. A handler
+    exception is printed, passed to on_error(url, exc) if given and recorded
+    as a None result. A tab counts as loaded once the `ready` selector is
+    present (see navigation.ready_selector) or the document has fully loaded.
+    """
+    if max_tabs < 1 or per_host < 1:
+        # No tab could ever be opened and the loop below would spin forever
+        raise ValueError(f"max_tabs and per_host must be at least 1, got {max_tabs} and {per_host}")
+    origin = driver.current_window_handle
+    pending = list(urls)
+    open_tabs = {}  # handle -> (url, host, opened_at)
+    results = []
+
+    def host_load(host):
+        return sum(1 for _, h, _ in open_tabs.values() if h == host)
+
+    try:
+        while pending or open_tabs:
+            # Open as many tabs as the caps allow
+            for url in list(pending):
+                if len(open_tabs) >= max_tabs:
+                    break
+                host = _host(url)
+                if host_load(host) >= per_host:
+                    continue
+                driver.switch_to.window(origin)
+                before = set(driver.window_handles)
+                driver.execute_script("window.open(arguments[0], '_blank');", url)
+                new_handles = set(driver.window_handles) - before
+                pending.remove(url)
+                if new_handles:
+                    note_navigation(driver)
+                else:
+                    # Popup blocked: fall back to loading it in a fresh tab directly
+                    driver.switch_to.new_window('tab')
+                    driver.get(url)
+                    new_handles = {driver.current_window_handle}
+                open_tabs[new_handles.pop()] = (url, host, time.time())
+
+            # Collect whichever tabs are done
+            finished = False
+            for handle, (url, host, opened_at) in list(open_tabs.items()):
+                driver.switch_to.window(handle)
+                try:
+                    loaded = driver.execute_script(
+                        "return document.readyState === 'complete' || "
+                        "(!!arguments[0] && !!document.querySelector(arguments[0]));", ready)
+                except Exception:
+                    loaded = False
+                if not loaded and time.time() - opened_at < timeout:
+                    continue
+                try:
+                    results.append((url, handler(driver, url)))
+                except Exception as e:
+                    print(f"Error scraping {url}: {e}")
+                    if on_error:
+                        on_error(url, e)
+                    results.append((url, None))
+                try:
+                    driver.close()
+                except Exception:
+                    pass
+                del open_tabs[handle]
+                finished = True
+
+            if not finished and open_tabs:
+                time.sleep(poll_interval)
+    finally:
+        for handle in list(open_tabs):
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+            except Exception:
+                pass
+        driver.switch_to.window(origin)
+    return results
+
+
+# Banners the tools dismiss: the button to click and the cookies that show it was accepted before
+BANNERS = {
+    "consent": {
+        "xpath": "//button[contains(., 'Accept all') or contains(., 'I agree')]",
+        "cookies": {"SOCS": None, "CONSENT": "YES"},
+    },
+    "cookie_banner": {
+        "xpath": "//button[contains(., 'Accept all cookies')]",
+        "cookies": {"cookies_preferences_set": None, "cookies_policy": None},
+    },
+}
+
+
+class SessionState:
+    """Banners already dealt with in one driver session, keyed by (banner, host).
+
+    Once a banner was clicked, covered by a profile cookie, or simply did not
+    show up within its wait, later pages on that host only get an instant
+    find_elements() check instead of the full wait. `saved` adds up the wait
+    time skipped that way.
+    """
+
+    def __init__(self):
+        self.handled = set()
+        self.skipped = Counter()
+        self.saved = 0.0
+
+    def _accepted_by_cookie(self, driver, banner):
+        wanted = BANNERS[banner]["cookies"]
+        try:
+            cookies = driver.get_cookies()
+        except Exception:
+            return False
+        for cookie in cookies:
+            prefix = wanted.get(cookie.get("name"), False)
+            if prefix is None or (prefix and str(cookie.get("value", "")).startswith(prefix)):
+                return True
+        return False
+
+    def dismiss(self, driver, banner, timeout):
+        """Clicks `banner` if it is (or, on a new host, becomes) clickable. Returns True if clicked."""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
+        xpath = BANNERS[banner]["xpath"]
+        key = (banner, _host(driver.current_url))
+        if key not in self.handled and self._accepted_by_cookie(driver, banner):
+            self.handled.add(key)
+        if key in self.handled:
+            # Seen before: only click it if it came back, never wait for it
+            self.skipped[banner] += 1
+            self.saved += timeout
+            try:
+                for button in driver.find_elements(By.XPATH, xpath):
+                    if button.is_displayed():
+                        button.click()
+                        return True
+            except Exception:
+                pass
+            return False
+        self.handled.add(key)
+        try:
+            WebDriverWait(driver, timeout).until(EC.element_to_be_clickable((By.XPATH, xpath))).click()
+            return True
+        except Exception:
+            return False  # No banner on this host (or it timed out); not waited for again
+
+    def report(self):
+        if self.skipped:
+            waits = ", ".join(f"{count} {banner}" for banner, count in sorted(self.skipped.items()))
+            print(f"Banner waits skipped: {waits} (~{self.saved:.0f}s saved)")
+
+
+_SESSIONS = weakref.WeakKeyDictionary()
+
+
+def session_state(driver):
+    """The SessionState of a driver, created on first use."""
+    state = _SESSIONS.get(driver)
+    if state is None:
+        state = _SESSIONS[driver] = SessionState()
+    return state
+
+
+def dismiss_banner(driver, banner, timeout=3):
+    """Dismisses a consent/cookie banner, waiting for it only where it can still appear."""
+    return session_state(driver).dismiss(driver, banner, timeout)
+
+
+def process_tree_rss(pid):
+    """Resident memory in bytes of a process and all its descendants, or None where it can't be read.
+
+    Shared pages are counted once per process, so this overstates Chrome's
+    real footprint; what matters for recycling is how it grows.
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil:
+        try:
+            root = psutil.Process(pid)
+            total = 0
+            for proc in [root] + root.children(recursive=True):
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total
+        except psutil.Error:
+            return None
+
+    # Linux without psutil: parent links from /proc/<pid>/stat, sizes from statm
+    children = {}
+    try:
+        entries = [e for e in os.listdir("/proc") if e.isdigit()]
+    except OSError:
+        return None
+    for entry in entries:
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total, todo = 0, [pid]
+    while todo:
+        current = todo.pop()
+        try:
+            with open(f"/proc/{current}/statm", "r") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            if current == pid:
+                return None
+        todo.extend(children.get(current, ()))
+    return total
+
+
+def note_navigation(driver):
+    """Counts a page load not started with driver.get() (a clicked link, a window.open tab) for recycling."""
+    note = getattr(driver, "note_navigation", None)
+    if note:
+        note()
+
+
+class RecycledDriver:
+    """Stands in for the current WebDriver of a BrowserRecycler and counts its navigations.
+
+    Everything is passed through to the real driver, so the tools, waits and
+    helpers use it like any WebDriver; the recycler swaps the driver behind
+    it between lookups.
+    """
+
+    def __init__(self, driver):
+        self._driver = driver
+        self._navigations = 0
+
+    def get(self, url):
+        self._navigations += 1
+        return self._driver.get(url)
+
+    def note_navigation(self):
+        self._navigations += 1
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+
+class BrowserRecycler:
+    """Restarts the browser after `max_navigations` or once its process tree passes `max_rss_mb`.
+
+    `launch()` starts a browser and returns its WebDriver. Once either limit
+    is PRELAUNCH_AT reached, a replacement is launched (and warmed up with
+    `warm_up(driver)`) in the background. checkpoint(), called between
+    lookups, swaps it in when the limit is hit or the browser has died, and
+    quits the old one in the background, so a swap costs about a pointer
+    assignment. `driver` is the RecycledDriver the tool works with.
+    """
+
+    PRELAUNCH_AT = 0.8
+
+    def __init__(self, launch, max_navigations=None, max_rss_mb=None, warm_up=None, on_quit=None):
+        import threading
+
+        self.launch = launch
+        self.on_quit = on_quit
+        self.max_navigations = max_navigations
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.warm_up = warm_up
+        self.driver = RecycledDriver(launch())
+        self.spare = None
+        self.spare_thread = None
+        self.lock = threading.Lock()
+        self.recycles = Counter()
+        self.spare_ready = 0
+        self.swap_seconds = 0.0
+        self.peak_rss = 0
+        self.last_rss = None
+
+    def _launch_spare(self):
+        try:
+            driver = self.launch()
+            if self.warm_up:
+                self.warm_up(driver)
+        except Exception as e:
+            print(f"[recycle] Could not prelaunch a replacement browser: {e}")
+            driver = None
+        with self.lock:
+            self.spare = driver
+
+    def _prelaunch(self):
+        import threading
+
+        if self.spare is None and self.spare_thread is None:
+            self.spare_thread = threading.Thread(target=self._launch_spare, name="browser-prelaunch", daemon=True)
+            self.spare_thread.start()
+
+    def rss(self):
+        try:
+            pid = self.driver._driver.service.process.pid
+        except AttributeError:
+            return None
+        rss = process_tree_rss(pid)
+        if rss is not None:
+            self.last_rss = rss
+            self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def _alive(self):
+        try:
+            self.driver._driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def checkpoint(self):
+        """Called between lookups: prelaunches or swaps in a fresh browser when one is due."""
+        if not self._alive():
+            self.recycle("crashed")
+            return
+        usage = 0.0
+        reason = None
+        if self.max_navigations:
+            usage = self.driver._navigations / self.max_navigations
+            reason = "navigations"
+        rss = self.rss() if self.max_rss else None
+        if rss and rss / self.max_rss > usage:
+            usage = rss / self.max_rss
+            reason = "memory"
+        if usage >= self.PRELAUNCH_AT:
+            self._prelaunch()
+        if usage >= 1:
+            self.recycle(reason)
+
+    def recycle(self, reason):
+        import threading
+
+        start = time.perf_counter()
+        self._prelaunch()
+        self.spare_thread.join()
+        with self.lock:
+            spare, self.spare, self.spare_thread = self.spare, None, None
+        if spare is None:
+            spare = self.launch()  # Prelaunch failed, start one in the foreground
+            if self.warm_up:
+                self.warm_up(spare)
+        elif time.perf_counter() - start < 0.1:
+            self.spare_ready += 1
+
+        old = self.driver._driver
+        rss = self.last_rss
+        self.driver._driver = spare
+        self.driver._navigations = 0
+        # The new browser hasn't seen any banner yet (its profile cookies are checked again)
+        session_state(self.driver).handled.clear()
+        self.swap_seconds += time.perf_counter() - start
+        self.recycles[reason] += 1
+        memory = f", tree RSS was {rss / 2**20:.0f} MB" if rss and reason == "memory" else ""
+        print(f"[recycle] Browser replaced ({reason}{memory}) in {time.perf_counter() - start:.2f}s")
+        threading.Thread(target=self._quit, args=(old,), daemon=True).start()
+
+    def report(self):
+        self.rss()
+        line = "Browser recycling: "
+        total = sum(self.recycles.values())
+        if total:
+            reasons = ", ".join(f"{count} {reason}" for reason, count in sorted(self.recycles.items()))
+            line += (f"{total} restart(s) ({reasons}), {self.spare_ready} with the replacement ready, "
+                     f"{self.swap_seconds / total:.2f}s avg swap")
+        else:
+            line += f"no restarts ({self.driver._navigations} navigations)"
+        if self.peak_rss:
+            line += f"; browser tree RSS peak {self.peak_rss / 2**20:.0f} MB, last {self.last_rss / 2**20:.0f} MB"
+        print(line)
+
+    def close(self):
+        if self.spare_thread:
+            self.spare_thread.join()
+        for driver in (self.driver._driver, self.spare):
+            if driver:
+                self._quit(driver)
+
+    def _quit(self, driver):
+        _quit_quietly(driver)
+        if self.on_quit:
+            self.on_quit(driver)
+
+
+def _quit_quietly(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def warm_up_google(driver, timeout=5):
+    """Loads Google and accepts its consent banner, so a prelaunched browser starts its first query at once."""
+    try:
+        driver.get("https://www.google.com")
+        dismiss_banner(driver, "consent", timeout)
+    except Exception as e:
+        print(f"[recycle] Warm-up of the replacement browser failed: {e}")
+
+
+def add_recycle_arguments(parser):
+    parser.add_argument("--recycle-after", type=int, help="Restart the browser after this many page loads (a replacement is prelaunched)")
+    parser.add_argument("--recycle-rss", type=float, metavar="MB", help="Restart the browser once its process tree uses this much memory")
+
+
+def recycling_driver(init_driver, user_data_dir, max_navigations=None, max_rss_mb=None, warm_up=None,
+                     template=None, **options):
+    """BrowserRecycler over init_driver(user_data_dir=..., **options).
+
+    Chrome locks a profile while it runs, so a browser and its prelaunched
+    replacement alternate between `user_data_dir` and a "_spare" sibling.
+    With a profile `template` every browser gets a fresh clone of it
+    instead, deleted once that browser has quit.
+    """
+    if template:
+        from profile_template import clone_profile, discard_profile
+
+        clones = {}
+
+        def launch():
+            path = clone_profile(template)
+            try:
+                driver = init_driver(user_data_dir=path, **options)
+            except Exception:
+                discard_profile(path)
+                raise
+            clones[id(driver)] = path
+            return driver
+
+        def discard(driver):
+            path = clones.pop(id(driver), None)
+            if path:
+                discard_profile(path)
+
+        return BrowserRecycler(launch, max_navigations, max_rss_mb, warm_up, on_quit=discard)
+
+    import itertools
+
+    profiles = itertools.cycle([user_data_dir, f"{user_data_dir}_spare"])
+    return BrowserRecycler(lambda: init_driver(user_data_dir=next(profiles), **options),
+                           max_navigations, max_rss_mb, warm_up)
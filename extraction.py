@@ -0,0 +1,291 @@
+"""Declarative page extraction driven by per-registry spec files.
+
+Each registry has a JSON spec in extraction_specs/ describing, per page,
+which fields to pull out: CSS selectors with fallbacks, label lookups
+("Status Of Licence" -> value cell in the same row), record lists (table
+rows, accordion items, grid cards) and post-processing steps. Specs are
+compiled once (CSS via soupsieve, label patterns via re) and run against a
+single parse of the page:
+
+    extractor = get_extractor("MGA")
+    data = extractor.extract("licensee", driver.page_source)
+
+Field spec keys:
+    select      CSS selector or list of fallback selectors
+    self        true: after the selectors, read the element the field is evaluated
+                on itself (the page, a record, or a fragment passed to extract())
+    label       {"match": [...] or "pattern": regex, "row": "tr", "value": [css, ...]}:
+                the value is read from the label's row (or parent) instead of the page;
+                with "sibling": [tags] it is the label's next sibling of those tags;
+                "tags" limits the label to text inside those elements
+    attr        attribute to read instead of the element text
+    separator   text separator for get_text (default: none, stripped)
+    many        collect every match instead of the first one
+    require_prefix / exclude / match
+                filters applied to raw values (prefix, substrings, regex)
+    regex       keep only values matching this pattern, reduced to group 1
+    post        list of post-processor names (see POST_PROCESSORS)
+    fallback    another field spec tried when this one yields nothing
+
+Record spec keys (a spec with "records"):
+    scope       optional container selector(s); the first match is used
+    records     selector(s) for the record elements, first non-empty wins
+    skip        number of leading records to drop (header rows)
+    fields      field specs evaluated relative to each record
+    require     field names that must be non-empty to keep a record
+
+A spec may also carry a "navigation" block for the Selenium tools
+(navigation.py): "strategy" (normal/eager/none), "ready" {page: css} and
+"idle" [pages that also wait for network idle].
+"""
+import json
+import os
+import re
+
+from domain_utils import normalize_domain, normalize_domains, split_domains
+
+SPEC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "extraction_specs")
+
+
+def _parser():
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+PARSER = _parser()
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _dedupe(values):
+    return list(dict.fromkeys(values))
+
+
+POST_PROCESSORS = {
+    "strip": lambda values: [v.strip() for v in values],
+    "lower": lambda values: [v.lower() for v in values],
+    "title": lambda values: [v.title() for v in values],
+    "domain": lambda values: [d for d in (normalize_domain(v) for v in values) if d],
+    "domains": lambda values: normalize_domains(values),
+    "split_domains": lambda values: [d for v in values for d in split_domains(v)],
+    "dedupe": _dedupe,
+    "non_empty": lambda values: [v for v in values if v],
+}
+
+
+def parse_html(html):
+    """Parses HTML once with the fastest available parser. Soups pass through untouched."""
+    if not isinstance(html, (str, bytes)):
+        return html
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, PARSER)
+
+
+class CompiledField:
+    def __init__(self, name, spec, label_index):
+        import soupsieve
+
+        self.name = name
+        self.selectors = [soupsieve.compile(css) for css in _as_list(spec.get("select"))]
+        self.read_self = spec.get("self", False)
+        self.attr = spec.get("attr")
+        self.separator = spec.get("separator")
+        self.many = spec.get("many", False)
+        self.require_prefix = spec.get("require_prefix")
+        self.exclude = _as_list(spec.get("exclude"))
+        self.match = re.compile(spec["match"]) if spec.get("match") else None
+        self.regex = re.compile(spec["regex"], re.IGNORECASE) if spec.get("regex") else None
+        self.post = []
+        for step in _as_list(spec.get("post")):
+            if step not in POST_PROCESSORS:
+                raise ValueError(f"Unknown post-processor '{step}' in field '{name}'")
+            self.post.append(POST_PROCESSORS[step])
+
+        self.label = None
+        label = spec.get("label")
+        if label:
+            pattern = label.get("pattern") or "|".join(re.escape(m) for m in _as_list(label["match"]))
+            self.label = {
+                "key": f"{name}:{id(self)}",
+                "row": label.get("row", "tr"),
+                "sibling": label.get("sibling"),
+                "value": [soupsieve.compile(css) for css in _as_list(label.get("value", "td:last-of-type"))],
+            }
+            label_index.append((self.label["key"], re.compile(pattern, re.IGNORECASE), label.get("tags")))
+
+        self.fallback = CompiledField(name, spec["fallback"], label_index) if spec.get("fallback") else None
+
+    def _read(self, node):
+        if self.attr:
+            value = node.get(self.attr)
+            return (value or "").strip()
+        if self.separator is not None:
+            return node.get_text(self.separator, strip=True)
+        return node.get_text(strip=True)
+
+    def _filter(self, values):
+        kept = []
+        for value in values:
+            if not value:
+                continue
+            if self.require_prefix and not value.startswith(self.require_prefix):
+                continue
+            if self.exclude and any(x in value for x in self.exclude):
+                continue
+            if self.match and not self.match.search(value):
+                continue
+            if self.regex:
+                found = self.regex.search(value)
+                if not found:
+                    continue
+                value = found.group(1).strip()
+            kept.append(value)
+        return kept
+
+    def _nodes(self, selector, root):
+        if self.many:
+            return selector.select(root)
+        node = selector.select_one(root)
+        return [node] if node is not None else []
+
+    def evaluate(self, root, labels):
+        values = []
+        for selector in self.selectors:
+            values = self._filter([self._read(n) for n in self._nodes(selector, root)])
+            if values:
+                break
+        if not values and self.read_self:
+            values = self._filter([self._read(root)])
+
+        if not values and self.label:
+            label_node = labels.get(self.label["key"])
+            if label_node is not None and self.label["sibling"]:
+                sibling = label_node.find_next_sibling(self.label["sibling"])
+                values = self._filter([self._read(sibling)] if sibling is not None else [])
+            elif label_node is not None:
+                row = label_node.find_parent(self.label["row"]) or label_node.parent
+                if row is not None:
+                    for selector in self.label["value"]:
+                        nodes = [n for n in self._nodes(selector, row) if n is not label_node]
+                        values = self._filter([self._read(n) for n in nodes])
+                        if values:
+                            break
+
+        for step in self.post:
+            values = step(values)
+
+        if not values and self.fallback:
+            return self.fallback.evaluate(root, labels)
+        if self.many:
+            return values
+        return values[0] if values else None
+
+
+class CompiledRecords:
+    def __init__(self, name, spec, label_index):
+        import soupsieve
+
+        self.name = name
+        self.scope = [soupsieve.compile(css) for css in _as_list(spec.get("scope"))]
+        self.records = [soupsieve.compile(css) for css in _as_list(spec["records"])]
+        self.skip = spec.get("skip", 0)
+        self.require = _as_list(spec.get("require"))
+        # Record fields do not take part in page-level label lookups
+        self.fields = {n: CompiledField(n, f, []) for n, f in spec["fields"].items()}
+
+    def evaluate(self, root, labels):
+        container = root
+        if self.scope:
+            container = None
+            for selector in self.scope:
+                container = selector.select_one(root)
+                if container is not None:
+                    break
+            if container is None:
+                return []
+
+        elements = []
+        for selector in self.records:
+            elements = selector.select(container)
+            if elements:
+                break
+
+        rows = []
+        for element in elements[self.skip:]:
+            row = {name: field.evaluate(element, {}) for name, field in self.fields.items()}
+            if all(row.get(r) for r in self.require):
+                rows.append(row)
+        return rows
+
+
+class CompiledPage:
+    def __init__(self, name, spec):
+        self.name = name
+        self.label_index = []
+        self.outputs = {}
+        for out_name, out_spec in spec.items():
+            if "records" in out_spec:
+                self.outputs[out_name] = CompiledRecords(out_name, out_spec, self.label_index)
+            else:
+                self.outputs[out_name] = CompiledField(out_name, out_spec, self.label_index)
+
+    def _find_labels(self, soup):
+        """Single pass over the page's text nodes, recording the first hit of every label."""
+        found = {}
+        if not self.label_index:
+            return found
+        pending = list(self.label_index)
+        for text in soup.find_all(string=True):
+            for entry in list(pending):
+                key, pattern, tags = entry
+                if not pattern.search(text):
+                    continue
+                node = text.find_parent(tags) if tags else text.parent
+                if node is not None:
+                    found[key] = node
+                    pending.remove(entry)
+            if not pending:
+                break
+        return found
+
+    def extract(self, html):
+        soup = parse_html(html)
+        labels = self._find_labels(soup)
+        return {name: output.evaluate(soup, labels) for name, output in self.outputs.items()}
+
+
+class Extractor:
+    """All compiled pages of one registry spec."""
+
+    def __init__(self, spec):
+        self.registry = spec.get("registry")
+        # Load strategy and readiness selectors for navigation.py
+        self.navigation = spec.get("navigation", {})
+        self.pages = {name: CompiledPage(name, page) for name, page in spec["pages"].items()}
+
+    def extract(self, page, html):
+        return self.pages[page].extract(html)
+
+
+_extractors = {}
+
+
+def load_spec(registry, spec_dir=SPEC_DIR):
+    path = os.path.join(spec_dir, f"{registry.lower()}.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_extractor(registry):
+    """Returns the compiled extractor for a registry, compiling its spec on first use."""
+    key = registry.upper()
+    if key not in _extractors:
+        _extractors[key] = Extractor(load_spec(registry))
+    return _extractors[key]
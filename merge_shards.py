@@ -0,0 +1,131 @@
+"""Merges the workbooks of a sharded cga/mga/ukgc run back into one, in input order.
+
+Each host runs the same input file with its own --shard i/N and writes
+certificates_shard<i>of<N>.xlsx. Shard workbooks are mostly in input order,
+but companies deferred while a breaker was open are written at the end, so
+each shard's rows are indexed by normalized company name and the merge walks
+the input file once, pulling each company's rows from the shard it hashed to.
+
+Usage:
+    python merge_shards.py companies.txt shards/certificates_shard*.xlsx -o certificates.xlsx
+"""
+import argparse
+import os
+import re
+from collections import deque
+
+from query_batching import normalize_name
+from registry_index import detect_registry, import_workbook
+from stream_utils import StreamingWorkbook, iter_companies, shard_of
+
+SHARD_RE = re.compile(r"_shard(\d+)of(\d+)\.xlsx$", re.IGNORECASE)
+UNATTRIBUTED_PREFIX = "Unattributed ("
+COLUMN_WIDTHS = {
+    "CGA": {'A': 15, 'B': 30, 'C': 5, 'D': 25, 'E': 15, 'F': 30},
+    "MGA": {'A': 15, 'B': 30, 'C': 5, 'D': 25, 'E': 15, 'F': 15},
+    "UKGC": {'A': 15, 'B': 30, 'C': 20, 'D': 25, 'E': 15, 'F': 15, 'G': 30},
+}
+
+
+def detect_shard(path):
+    """(i, N) from a certificates_shard<i>of<N>.xlsx file name, or None."""
+    match = SHARD_RE.search(os.path.basename(path))
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+class ShardReader:
+    """One shard workbook's rows, indexed by normalized company name (column B).
+
+    Each run of consecutive rows for a company is one lookup; batch leftovers
+    ("Unattributed (...)") stay with the run they follow. A name that appears
+    twice in the input gets its runs back in shard order.
+    """
+
+    def __init__(self, path):
+        from openpyxl import load_workbook
+
+        self.path = path
+        self.runs = {}  # normalized name -> deque of runs (lists of rows)
+        wb = load_workbook(path, read_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            self.header = next(rows, None)
+            key = run = None
+            for row in rows:
+                company = str(row[1] or "") if len(row) > 1 else ""
+                if run is None or not (company.startswith(UNATTRIBUTED_PREFIX) or normalize_name(company) == key):
+                    key, run = normalize_name(company), []
+                    self.runs.setdefault(key, deque()).append(run)
+                run.append(list(row))
+        finally:
+            wb.close()
+
+    def take(self, company):
+        """Rows of the next run of `company` in this shard, batch leftovers included."""
+        runs = self.runs.get(normalize_name(company))
+        return runs.popleft() if runs else []
+
+    def remaining(self):
+        """Rows no input name asked for."""
+        for runs in self.runs.values():
+            while runs:
+                yield from runs.popleft()
+
+
+def merge_shards(input_file, shard_files, output):
+    """Writes the shards' rows to `output` in the order of `input_file`. Returns the row count."""
+    readers = {}
+    count = None
+    for path in shard_files:
+        shard = detect_shard(path)
+        if not shard:
+            raise ValueError(f"{path} is not named like certificates_shard<i>of<N>.xlsx")
+        if count is not None and shard[1] != count:
+            raise ValueError(f"{path} belongs to a {shard[1]}-way split, others to a {count}-way split")
+        if shard[0] in readers:
+            raise ValueError(f"Shard {shard[0]}/{shard[1]} given twice")
+        count = shard[1]
+        readers[shard[0]] = ShardReader(path)
+    if not readers:
+        raise ValueError("No shard workbooks given")
+
+    missing = sorted(set(range(1, count + 1)) - set(readers))
+    if missing:
+        print(f"Warning: shard(s) {', '.join(map(str, missing))} of {count} missing, their companies are skipped")
+
+    header = next(r.header for r in readers.values())
+    widths = COLUMN_WIDTHS.get(detect_registry(header))
+    with StreamingWorkbook(output, "Certificates", list(header), widths) as out:
+        for name in iter_companies(input_file):
+            reader = readers.get(shard_of(name, count))
+            if reader:
+                out.extend(reader.take(name))
+        for index, reader in sorted(readers.items()):
+            leftover = list(reader.remaining())
+            if leftover:
+                print(f"Warning: {len(leftover)} row(s) of shard {index} matched no name in the input, appended at the end")
+                out.extend(leftover)
+    return out.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the workbooks of a --shard i/N run in input order")
+    parser.add_argument("file", help="The input file every shard was run with")
+    parser.add_argument("shards", nargs="+", help="Shard workbooks (certificates_shard<i>of<N>.xlsx)")
+    parser.add_argument("-o", "--output", default="certificates.xlsx", help="Merged workbook (default: certificates.xlsx)")
+    parser.add_argument("--index", type=str, help="Also load the merged results into this cross-registry SQLite index")
+    args = parser.parse_args()
+
+    try:
+        rows = merge_shards(args.file, args.shards, args.output)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        exit(1)
+    print(f"Merged {len(args.shards)} shard(s), {rows} row(s) -> {args.output}")
+
+    if args.index:
+        import_workbook(args.index, args.output)
+
+
+if __name__ == "__main__":
+    main()
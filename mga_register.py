@@ -0,0 +1,227 @@
+"""Native client for the MGA authorisation register (no Google, no browser).
+
+Queries the register's own company search over HTTP, resolves selection
+pages listing several licensees (details=1 links) and fetches the detail
+pages concurrently. Detail pages are parsed by parse_licensee(), which the
+Selenium path in search_tool_mga.py shares, so both produce the same
+website/status output.
+"""
+import http.cookiejar
+import re
+import urllib.parse
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from extraction import get_extractor, parse_html
+from records import DomainRecord, LicenceRecord
+from resilience import NOT_FOUND, classify_error, host_of
+
+BASE_URL = "https://www.authorisation.mga.org.mt/"
+# {query} is replaced with the URL-encoded company name
+SEARCH_URL_TEMPLATE = BASE_URL + "verification.aspx?lang=EN&company={query}"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+SEARCH_INPUT_HINTS = ('company', 'search', 'name', 'txt')
+
+
+def english_url(url):
+    """Forces English for consistent label matching if possible."""
+    if "lang=" in url:
+        return re.sub(r'lang=[^&]*', 'lang=EN', url)
+    elif "?" in url:
+        return url + "&lang=EN"
+    return url + "?lang=EN"
+
+
+def parse_licensee(page):
+    """Returns (websites, status, company) from an MGA licensee detail page (soup or HTML).
+
+    The selectors, label lookups and link filters live in extraction_specs/mga.json.
+    """
+    data = get_extractor("MGA").extract("licensee", page)
+    return data["websites"], data["status"], data["company"]
+
+
+class RegisterSession:
+    """urllib opener with its own cookie jar (the register is an ASP.NET site)."""
+
+    def __init__(self, timeout=20):
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+        self.opener.addheaders = [
+            ("User-Agent", USER_AGENT),
+            ("Accept-Language", "en-US,en;q=0.9"),
+        ]
+
+    def fetch(self, url, data=None):
+        """Returns (final_url, html)."""
+        if data is not None:
+            data = urllib.parse.urlencode(data).encode("utf-8")
+        with self.opener.open(url, data=data, timeout=self.timeout) as response:
+            charset = response.headers.get_content_charset() or "utf-8"
+            return response.geturl(), response.read().decode(charset, errors="replace")
+
+
+def selection_links(soup, page_url):
+    """Absolute detail URLs listed on a multi-licensee selection page."""
+    links = []
+    for a in soup.find_all('a', href=True):
+        href = a['href']
+        if 'details=1' in href:
+            url = english_url(urllib.parse.urljoin(page_url, href))
+            if url not in links:
+                links.append(url)
+    return links
+
+
+def submit_search_form(session, soup, page_url, company):
+    """Fallback for the ASP.NET search form: posts the company name with the page's hidden state."""
+    form = soup.find('form')
+    if not form:
+        return None
+    data = {}
+    search_field = None
+    for field in form.find_all('input'):
+        name = field.get('name')
+        if not name:
+            continue
+        field_type = (field.get('type') or 'text').lower()
+        if field_type == 'hidden':
+            data[name] = field.get('value', '')
+        elif field_type in ('text', 'search') and search_field is None \
+                and any(h in name.lower() for h in SEARCH_INPUT_HINTS):
+            search_field = name
+        elif field_type == 'submit' and name not in data:
+            data[name] = field.get('value', '')
+    if not search_field:
+        return None
+    data[search_field] = company
+    action = urllib.parse.urljoin(page_url, form.get('action') or page_url)
+    return session.fetch(action, data=data)
+
+
+def search_register(session, company):
+    """Runs the register's own search. Returns detail page URLs (or the page itself if it is one)."""
+    search_url = SEARCH_URL_TEMPLATE.format(query=urllib.parse.quote_plus(company))
+    page_url, html = session.fetch(search_url)
+    soup = parse_html(html)
+
+    links = selection_links(soup, page_url)
+    if links:
+        return links
+    if parse_licensee(soup)[1]:
+        # The search resolved straight to a single licensee
+        return [page_url]
+
+    posted = submit_search_form(session, soup, page_url, company)
+    if posted:
+        page_url, html = posted
+        soup = parse_html(html)
+        links = selection_links(soup, page_url)
+        if links:
+            return links
+        if parse_licensee(soup)[1]:
+            return [page_url]
+    return []
+
+
+def fetch_licensee(url, timeout=20):
+    """Fetches and parses one licensee detail page."""
+    session = RegisterSession(timeout=timeout)
+    page_url, html = session.fetch(url)
+    websites, status, company = parse_licensee(parse_html(html))
+    return LicenceRecord(page_url, status=status, company=company, domains=[DomainRecord(w) for w in websites])
+
+
+def lookup_company(company, num_results=1, pool=None, timeout=20, budget=None, session=None):
+    """Looks one company up on the register; detail pages are fetched on `pool` if given.
+
+    With a resilience.Budget, request timeouts are capped by what is left of
+    it and failures are recorded on it for the circuit breaker. A caller's
+    RegisterSession (cookies kept across lookups) is used for the search.
+    """
+    def failed(url, e):
+        print(f"Error fetching {url}: {e}")
+        if budget:
+            budget.fail(classify_error(e), f"{url}: {e}", host_of(url))
+
+    if budget:
+        timeout = min(timeout, budget.timeout("detail"))
+    session = session or RegisterSession(timeout=timeout)
+    try:
+        detail_urls = search_register(session, company)[:num_results]
+    except Exception as e:
+        print(f"Register search failed for {company}: {e}")
+        if budget:
+            budget.fail(classify_error(e), f"register search: {e}", host_of(BASE_URL))
+        return []
+
+    if pool:
+        futures = [pool.submit(fetch_licensee, url, timeout) for url in detail_urls]
+        pages = []
+        for url, future in zip(detail_urls, futures):
+            try:
+                pages.append(future.result())
+            except Exception as e:
+                failed(url, e)
+    else:
+        pages = []
+        for url in detail_urls:
+            try:
+                pages.append(fetch_licensee(url, timeout))
+            except Exception as e:
+                failed(url, e)
+    return pages
+
+
+def iter_lookups(companies, num_results=1, workers=4, timeout=20, total=None, guard=None, with_kind=False):
+    """Looks companies up concurrently and yields (company, [results]) in input order.
+
+    `companies` may be a lazy iterable. At most 2 * workers lookups are in
+    flight at any time, so memory does not grow with the input size. With a
+    resilience.LookupGuard each lookup runs under its budget and breaker;
+    companies it defers are not yielded (see guard.retry_deferred()).
+    with_kind adds the guard's failure kind as a third item.
+    """
+    window = deque()
+    total = total or "?"
+    idx = 0
+    with ThreadPoolExecutor(max_workers=workers) as search_pool, \
+            ThreadPoolExecutor(max_workers=workers) as detail_pool:
+        def drain():
+            nonlocal idx
+            company, future = window.popleft()
+            results, kind = future.result()
+            idx += 1
+            if results is None:
+                print(f"[{idx}/{total}] {company}: deferred")
+                return None
+            statuses = ", ".join(r.status or "?" for r in results) or "not found"
+            print(f"[{idx}/{total}] {company}: {len(results)} result(s) ({statuses})")
+            return (company, results, kind) if with_kind else (company, results)
+
+        def lookup(company):
+            if guard is None:
+                results = lookup_company(company, num_results, detail_pool, timeout)
+                return results, None if results else NOT_FOUND
+            return guard.run(company, lambda budget: lookup_company(company, num_results, detail_pool, timeout, budget))
+
+        for company in companies:
+            window.append((company, search_pool.submit(lookup, company)))
+            if len(window) >= workers * 2:
+                done = drain()
+                if done:
+                    yield done
+        while window:
+            done = drain()
+            if done:
+                yield done
+
+
+def lookup_companies(companies, num_results=1, workers=4, timeout=20):
+    """Looks up every company concurrently. Returns {company: [results]} in input order."""
+    companies = list(companies)
+    return dict(iter_lookups(companies, num_results, workers, timeout, total=len(companies)))
@@ -0,0 +1,204 @@
+"""Page-load strategies and readiness waits for the Selenium tools.
+
+With Chrome's default "normal" strategy driver.get() blocks until every
+image, font and tracking script has loaded. The registry pages are server
+rendered, so what the extractor needs is there long before that. navigate()
+lets driver.get() return early ("eager" once the DOM is parsed, "none"
+straight away) and then waits only for the page's readiness selector, for
+the full load, or for the network to go quiet, whichever the registry asks
+for.
+
+Per registry the "navigation" block of its extraction spec sets the default
+strategy, a readiness selector per extractor page and the pages that also
+need a network-idle wait (read from the CDP Network events in Chrome's
+performance log). Google pages use GOOGLE_NAVIGATION below.
+
+Every navigation is timed. On the next navigation in the same tab, the
+page's loadEventEnd shows how much later the default strategy would have
+returned; navigation_report() prints both figures per registry.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+
+from extraction import get_extractor
+
+PAGE_LOAD_STRATEGIES = ("normal", "eager", "none")
+
+GOOGLE_NAVIGATION = {
+    "strategy": "eager",
+    "ready": {"home": "textarea[name=q], input[name=q]", "results": "#rso, .g, #search"},
+}
+
+# Readiness check polled after driver.get(): the page's selector or the full load, whichever comes first
+_READY_JS = "return document.readyState === 'complete' || (!!arguments[0] && !!document.querySelector(arguments[0]));"
+# Where the current document's load event ended, relative to its navigation start (0 while still loading)
+_TIMING_JS = (
+    "var n = performance.getEntriesByType('navigation')[0];"
+    "return [performance.timeOrigin, n ? n.loadEventEnd : 0, performance.now()];"
+)
+
+
+def registry_navigation(registry):
+    """The navigation block of a registry's spec (GOOGLE for Google pages)."""
+    if registry.upper() == "GOOGLE":
+        return GOOGLE_NAVIGATION
+    return get_extractor(registry).navigation
+
+
+def ready_selector(registry, page):
+    """CSS selector marking `page` of `registry` as ready for extraction, or None."""
+    return registry_navigation(registry).get("ready", {}).get(page)
+
+
+def configure_options(options, registry, strategy=None):
+    """Sets the page-load strategy on Chrome options (the registry's default unless given).
+
+    Registries with network-idle pages also get Chrome's performance log,
+    which carries the CDP Network events the idle wait listens to.
+    """
+    nav = registry_navigation(registry)
+    options.page_load_strategy = strategy or nav.get("strategy", "normal")
+    if nav.get("idle"):
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options.page_load_strategy
+
+
+def _drain_performance_log(driver):
+    try:
+        return driver.get_log("performance")
+    except Exception:
+        return None
+
+
+def wait_network_idle(driver, quiet=0.5, timeout=10):
+    """Waits until no request has been in flight for `quiet` seconds. Returns False on timeout.
+
+    Needs the performance log (see configure_options); without it returns
+    False straight away.
+    """
+    in_flight = set()
+    start = last_activity = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        entries = _drain_performance_log(driver)
+        if entries is None:
+            return False
+        for entry in entries:
+            message = json.loads(entry["message"])["message"]
+            method = message.get("method", "")
+            request_id = message.get("params", {}).get("requestId")
+            if method == "Network.requestWillBeSent":
+                in_flight.add(request_id)
+                last_activity = time.perf_counter()
+            elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+                in_flight.discard(request_id)
+                last_activity = time.perf_counter()
+        if not in_flight and time.perf_counter() - last_activity >= quiet:
+            return True
+        time.sleep(0.1)
+    return False
+
+
+class NavigationStats:
+    """Per-registry navigation count, time until ready and time saved against the full load.
+
+    Shared by every driver of the process (pipeline and daemon workers run on
+    their own threads); the lock covers the counters and `pending`, never a
+    call into a browser.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.navigations = defaultdict(int)
+        self.ready_seconds = defaultdict(float)
+        self.saved_seconds = defaultdict(float)
+        self.measured = defaultdict(int)
+        self.pending = {}  # (driver id, window) -> (registry, time origin, ms ready after navigation start)
+
+    def settle(self, driver):
+        """Books the time saved on the page currently open in the driver's tab, if it was ours."""
+        try:
+            key = (id(driver), driver.current_window_handle)
+        except Exception:
+            return
+        with self.lock:
+            entry = self.pending.pop(key, None)
+        if not entry:
+            return
+        registry, origin, ready_ms = entry
+        try:
+            now_origin, load_end, now_ms = driver.execute_script(_TIMING_JS)
+        except Exception:
+            return
+        if now_origin != origin:
+            return  # The tab moved on (link click, form post); no baseline to compare with
+        # Still loading: the full load would have taken at least until now
+        full_ms = load_end or now_ms
+        with self.lock:
+            self.saved_seconds[registry] += max(0.0, full_ms - ready_ms) / 1000
+            self.measured[registry] += 1
+
+    def record(self, driver, registry, seconds):
+        with self.lock:
+            self.navigations[registry] += 1
+            self.ready_seconds[registry] += seconds
+        try:
+            origin, _, ready_ms = driver.execute_script(_TIMING_JS)
+            key = (id(driver), driver.current_window_handle)
+        except Exception:
+            return
+        with self.lock:
+            self.pending[key] = (registry, origin, ready_ms)
+            if len(self.pending) > 256:
+                # Entries of tabs that were closed before their next navigation
+                self.pending.pop(next(iter(self.pending)))
+
+    def report(self):
+        with self.lock:
+            lines = []
+            for registry in sorted(self.navigations):
+                count = self.navigations[registry]
+                line = f"  {registry:<7} {count} navigation(s), {self.ready_seconds[registry] / count:.2f}s avg until ready"
+                if self.measured[registry]:
+                    line += f", ~{self.saved_seconds[registry] / self.measured[registry]:.2f}s saved per navigation vs full load"
+                lines.append(line)
+        if lines:
+            print("Navigation timings:")
+            print("\n".join(lines))
+
+
+STATS = NavigationStats()
+
+
+def navigate(driver, url, registry, page=None, timeout=20):
+    """driver.get(url), then waits until `page` of `registry` is ready for extraction.
+
+    Ready means the page's readiness selector is present or the document has
+    fully loaded, plus network idle for pages the spec lists under "idle".
+    A page that is never ready is left to the extractor after `timeout`.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    nav = registry_navigation(registry)
+    STATS.settle(driver)
+    if page in nav.get("idle", ()):
+        _drain_performance_log(driver)  # Only count requests of this navigation
+    start = time.perf_counter()
+    driver.get(url)
+    css = nav.get("ready", {}).get(page)
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(lambda d: d.execute_script(_READY_JS, css))
+    except Exception:
+        print(f"Page not ready after {timeout:.0f}s, extracting what is there: {url}")
+    if page in nav.get("idle", ()):
+        wait_network_idle(driver, timeout=max(0.5, timeout - (time.perf_counter() - start)))
+    STATS.record(driver, registry.upper(), time.perf_counter() - start)
+
+
+def navigation_report(*drivers):
+    """Settles the pages still open in `drivers` and prints the per-registry timings."""
+    for driver in drivers:
+        if driver:
+            STATS.settle(driver)
+    STATS.report()
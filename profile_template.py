@@ -0,0 +1,216 @@
+"""Throwaway Chrome profiles cloned from a small prepared template.
+
+A persistent chrome_profile keeps growing (HTTP cache, history, service
+workers), which slows every Chrome start, and two workers can't use it at
+once because Chrome locks its profile directory. Instead the template holds
+just what a lookup needs: Google's consent cookie and preferences. Each
+browser gets its own copy in a RAM-backed temp directory (/dev/shm where
+there is one) and the copy is deleted once the browser has quit, so
+parallel workers never share a profile and caches never touch the disk.
+
+The template is built on first use (Chrome opens Google once and accepts the
+consent banner) or from an existing profile with --from-profile:
+    python profile_template.py --registry mga
+    python profile_template.py --from-profile chrome_profile
+Then run any Selenium tool with --profile-template.
+"""
+import argparse
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from driver_utils import CACHE_DIR
+
+DEFAULT_TEMPLATE = os.path.join(CACHE_DIR, "profile_template")
+CLONE_PREFIX = "search_tools_profile_"
+
+# Chrome's lock files; a copied lock makes Chrome think the profile is in use
+LOCK_FILES = {"SingletonLock", "SingletonSocket", "SingletonCookie", "lockfile", "LOCK"}
+# Caches and history, in the user data dir or a profile directory; everything else (cookies, prefs) is kept
+VOLATILE = {
+    "Cache", "Code Cache", "GPUCache", "DawnCache", "DawnGraphiteCache", "DawnWebGPUCache", "ShaderCache",
+    "GrShaderCache", "GraphiteDawnCache", "Service Worker", "CacheStorage", "blob_storage", "IndexedDB",
+    "File System", "Session Storage", "Sessions", "History", "History-journal", "Favicons", "Favicons-journal",
+    "Top Sites", "Top Sites-journal", "Visited Links", "Shortcuts", "Shortcuts-journal",
+    "Network Action Predictor", "Network Action Predictor-journal", "Crashpad", "BrowserMetrics",
+    "component_crx_cache", "extensions_crx_cache", "Safe Browsing", "OptimizationHints",
+    "optimization_guide_model_store", "segmentation_platform", "Download Service", "Extension State",
+}
+
+_CLONES = set()
+_LOCK = threading.Lock()
+
+
+def ram_dir():
+    """Directory for profile clones: /dev/shm when it is a writable tmpfs, else the temp dir."""
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def _ignore(directory, names):
+    return [n for n in names if n in LOCK_FILES or n in VOLATILE or n.startswith("BrowserMetrics")]
+
+
+def _size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        pass
+    return True
+
+
+def remove_stale_clones(directory=None):
+    """Deletes clones left behind by processes that were killed before they could clean up."""
+    directory = directory or ram_dir()
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        if not name.startswith(CLONE_PREFIX):
+            continue
+        pid = name[len(CLONE_PREFIX):].split("_", 1)[0]
+        if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def prune_profile(path):
+    """Removes caches, history and lock files from a profile in place. Returns the bytes left."""
+    for root, dirs, files in os.walk(path):
+        for name in list(dirs):
+            if name in VOLATILE or name.startswith("BrowserMetrics"):
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+                dirs.remove(name)
+        for name in files:
+            if name in LOCK_FILES or name in VOLATILE:
+                try:
+                    os.remove(os.path.join(root, name))
+                except OSError:
+                    pass
+    return _size(path)
+
+
+def _install(staging, template):
+    """Moves a finished template into place; a worker that finished first wins."""
+    os.makedirs(os.path.dirname(template) or ".", exist_ok=True)
+    try:
+        os.rename(staging, template)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)  # Another worker built it meanwhile
+
+
+def template_from_profile(source, template=DEFAULT_TEMPLATE):
+    """Builds the template from an existing profile directory (copied, then pruned)."""
+    staging = f"{template}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.copytree(source, staging, ignore=_ignore, symlinks=True)
+    size = prune_profile(staging)
+    _install(staging, template)
+    print(f"Profile template {template}: {size / 2**20:.1f} MB (from {source})")
+    return template
+
+
+def build_template(init_driver, template=DEFAULT_TEMPLATE, **options):
+    """Builds the template with a fresh browser: opens Google once, accepts consent, quits and prunes.
+
+    `init_driver` is a tool's init_driver(); `options` are passed on to it.
+    """
+    from driver_utils import warm_up_google
+
+    staging = f"{template}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    print(f"Building profile template in {template}...")
+    driver = init_driver(user_data_dir=staging, **options)
+    try:
+        warm_up_google(driver)
+        time.sleep(1)  # Lets Chrome flush the consent cookie to disk
+    finally:
+        driver.quit()
+    size = prune_profile(staging)
+    _install(staging, template)
+    print(f"Profile template {template}: {size / 2**20:.1f} MB")
+    return template
+
+
+def ensure_template(init_driver, template=DEFAULT_TEMPLATE, **options):
+    """The template path, built first when it doesn't exist yet."""
+    if not os.path.isdir(template):
+        build_template(init_driver, template, **options)
+    return template
+
+
+def clone_profile(template=DEFAULT_TEMPLATE):
+    """Copies the template into a new RAM-backed directory and returns its path.
+
+    Clones are deleted by discard_profile() or when the process exits.
+    """
+    start = time.perf_counter()
+    directory = ram_dir()
+    remove_stale_clones(directory)
+    path = tempfile.mkdtemp(prefix=f"{CLONE_PREFIX}{os.getpid()}_", dir=directory)
+    with _LOCK:
+        _CLONES.add(path)
+    shutil.copytree(template, path, ignore=_ignore, symlinks=True, dirs_exist_ok=True)
+    print(f"Cloned profile template into {path} in {time.perf_counter() - start:.2f}s")
+    return path
+
+
+def discard_profile(path):
+    """Deletes a clone (call it once its browser has quit)."""
+    with _LOCK:
+        _CLONES.discard(path)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@atexit.register
+def _discard_all():
+    for path in list(_CLONES):
+        discard_profile(path)
+
+
+def add_template_arguments(parser):
+    parser.add_argument("--profile-template", nargs="?", const=DEFAULT_TEMPLATE, metavar="DIR",
+                        help=f"Run on a throwaway in-memory copy of this prepared profile instead of --user-data-dir (default: {DEFAULT_TEMPLATE}, built on first use)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the profile template the tools clone with --profile-template")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help=f"Template directory (default: {DEFAULT_TEMPLATE})")
+    parser.add_argument("--registry", choices=("cga", "mga", "ukgc"), default="cga", help="Tool whose browser settings build the template (default: cga)")
+    parser.add_argument("--from-profile", type=str, help="Build it from this existing Chrome user data dir instead of a fresh browser")
+    parser.add_argument("--fast-start", action="store_true", help="Reuse the cached chromedriver path instead of resolving it online")
+    parser.add_argument("--force", action="store_true", help="Replace an existing template")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.template):
+        if not args.force:
+            print(f"{args.template} already exists ({_size(args.template) / 2**20:.1f} MB), use --force to rebuild it")
+            return
+        shutil.rmtree(args.template)
+    if args.from_profile:
+        template_from_profile(args.from_profile, args.template)
+    else:
+        from search_api import registry_tool
+
+        build_template(registry_tool(args.registry).init_driver, args.template, fast_start=args.fast_start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Opt-in profiling of a tool run (--profile-run; --profile is Chrome's profile name).
+
+Two modes:
+  cprofile  Deterministic profile of the main thread. Writes <prefix>.pstats
+            (open with `python -m pstats`, snakeviz, ...) and prints the top
+            functions by cumulative time.
+  sample    Snapshots every thread's stack every few milliseconds. Writes
+            <prefix>.collapsed, one "frame;frame;... count" line per stack
+            (flamegraph.pl, speedscope.app, inferno), and prints where the
+            wall time went: browser round trips (WebDriver/Playwright), HTTP,
+            sleeps, HTML parsing, name matching, workbook export or other
+            local Python.
+
+The sampler has no dependencies and costs well under 5% at the default
+interval, so it can stay on for a whole run. Both modes stop and write
+their files at interpreter exit, including after exit(1) or Ctrl+C.
+"""
+import atexit
+import linecache
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_MODES = ("cprofile", "sample")
+SAMPLE_INTERVAL = 0.005
+
+# A sample goes to the first category with a frame anywhere on the stack
+# (a WebDriver call spends its time in http.client, but it is a browser round trip)
+CATEGORIES = (
+    ("browser", ("selenium", "playwright", "greenlet")),
+    ("http", ("urllib", "http/client", "http\\client", "ssl.py", "socket.py", "requests", "urllib3")),
+    ("parse", ("bs4", "soupsieve", "lxml", "html/parser", "html\\parser", "extraction.py")),
+    ("match", ("difflib", "query_batching.py", "domain_utils.py")),
+    ("export", ("openpyxl", "stream_utils.py", "et_xmlfile")),
+    ("sqlite", ("sqlite3", "registry_index.py", "work_queue.py")),
+)
+
+
+def add_profile_arguments(parser):
+    parser.add_argument("--profile-run", choices=PROFILE_MODES,
+                        help="Profile this run: cprofile writes a .pstats file, sample a flame graph and a wall-time breakdown")
+    parser.add_argument("--profile-out", type=str,
+                        help="File name prefix for the profile output (default: profile_<tool>_<timestamp>)")
+
+
+def _frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _category(frames):
+    """Category of one stack (outermost frame first)."""
+    paths = [frame.f_code.co_filename for frame in frames]
+    for name, markers in CATEGORIES:
+        if any(m in path for path in paths for m in markers):
+            return name
+    # time.sleep() is a C call, so look at the line the innermost Python frame is on
+    top = frames[-1]
+    if "sleep(" in linecache.getline(top.f_code.co_filename, top.f_lineno):
+        return "sleep"
+    return "python"
+
+
+class Sampler:
+    """Background thread sampling the stacks of all other threads."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.categories = {"main": Counter(), "workers": Counter()}
+        self.samples = 0
+        self.running = False
+        self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        self.wall = time.perf_counter() - self.started
+        self.cpu = time.process_time() - self.cpu_started
+
+    def _run(self):
+        own = threading.get_ident()
+        main = threading.main_thread().ident
+        names = {}
+        while self.running:
+            time.sleep(self.interval)
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(frame)
+                    frame = frame.f_back
+                frames.reverse()
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                thread = names.get(ident, str(ident))
+                self.stacks[";".join([thread] + [_frame_label(f.f_code) for f in frames])] += 1
+                self.categories["main" if ident == main else "workers"][_category(frames)] += 1
+            self.samples += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def report(self):
+        print("\n" + "=" * 60)
+        print("PROFILE (sampled)")
+        print("=" * 60)
+        print(f"Wall {self.wall:.1f}s, process CPU {self.cpu:.1f}s, {self.samples} samples")
+        main = self.categories["main"]
+        total = sum(main.values()) or 1
+        print("Main thread wall time:")
+        for name, count in main.most_common():
+            print(f"  {name:<8} {count / total:6.1%}  ~{self.wall * count / total:7.1f}s")
+        workers = self.categories["workers"]
+        if workers:
+            # Each sample is one worker thread for one interval, so this is thread time, not wall time
+            total = sum(workers.values())
+            print("Worker threads (share of thread time):")
+            for name, count in workers.most_common():
+                print(f"  {name:<8} {count / total:6.1%}")
+        print("=" * 60)
+
+
+def start_profiling(args, tool):
+    """Starts the profiler selected by --profile-run (no-op without it); results are written at exit."""
+    mode = getattr(args, "profile_run", None)
+    if not mode:
+        return None
+    prefix = args.profile_out or f"profile_{tool}_{time.strftime('%Y%m%d-%H%M%S')}"
+
+    if mode == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+
+        def finish():
+            import pstats
+
+            profiler.disable()
+            path = prefix + ".pstats"
+            profiler.dump_stats(path)
+            print("\n" + "=" * 60)
+            print("PROFILE (cProfile, main thread)")
+            print("=" * 60)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+            print(f"Profile written to {path} (python -m pstats {path})")
+
+        profiler.enable()
+    else:
+        profiler = Sampler()
+
+        def finish():
+            profiler.stop()
+            path = prefix + ".collapsed"
+            profiler.write(path)
+            profiler.report()
+            print(f"Flame graph stacks written to {path} (flamegraph.pl {path} > flame.svg, or speedscope.app)")
+
+        profiler.start()
+    atexit.register(finish)
+    return profiler
@@ -0,0 +1,133 @@
+"""Packs several company names into one site: query and attributes results back.
+
+A batch query looks like  site:cert.gcb.cw ("Company A" OR "Company B")  and
+is capped by character length (Google also ignores terms past ~32 words).
+Each result is attributed to the input company whose normalized name shows
+up in the result's company/operator/title/URL fields.
+"""
+import difflib
+import re
+
+DEFAULT_MAX_QUERY_LEN = 200
+MAX_QUERY_WORDS = 32
+
+# Legal-form suffixes that registries and users spell inconsistently
+LEGAL_SUFFIXES = {
+    "ltd", "limited", "plc", "llc", "inc", "corp", "corporation", "co", "company",
+    "bv", "nv", "gmbh", "ag", "sa", "srl", "sl", "spa", "ab", "as", "aps", "oy", "sarl", "lp",
+}
+# Result fields checked for a company name, most reliable first
+ATTRIBUTION_FIELDS = ("company", "operator", "title", "url", "website")
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_name(name):
+    """Lowercase, punctuation-free company name without legal-form suffixes."""
+    words = _SPACE_RE.split(_PUNCT_RE.sub("", (name or "").casefold()).strip())
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return " ".join(w for w in words if w)
+
+
+def _squash(text):
+    return _SPACE_RE.sub("", _PUNCT_RE.sub("", (text or "").casefold()))
+
+
+def iter_batches(companies, site, max_query_len=DEFAULT_MAX_QUERY_LEN, max_per_batch=None):
+    """Groups companies into (query, [companies]) pairs that fit the length budget, lazily."""
+    current = []
+
+    def query_for(names):
+        if len(names) == 1:
+            return f'{site} "{names[0]}"'
+        return f'{site} (' + " OR ".join(f'"{n}"' for n in names) + ")"
+
+    def fits(names):
+        query = query_for(names)
+        return len(query) <= max_query_len and len(query.split()) <= MAX_QUERY_WORDS
+
+    for company in companies:
+        candidate = current + [company]
+        if current and (not fits(candidate) or (max_per_batch and len(candidate) > max_per_batch)):
+            yield query_for(current), current
+            candidate = [company]
+        current = candidate
+    if current:
+        yield query_for(current), current
+
+
+def build_batches(companies, site, max_query_len=DEFAULT_MAX_QUERY_LEN, max_per_batch=None):
+    """List form of iter_batches()."""
+    return list(iter_batches(companies, site, max_query_len, max_per_batch))
+
+
+def attribute_result(result, companies, cutoff=0.85):
+    """Returns the company in `companies` this result belongs to, or None."""
+    if len(companies) == 1:
+        return companies[0]
+
+    keys = {c: normalize_name(c) for c in companies}
+    for field in ATTRIBUTION_FIELDS:
+        value = result.get(field)
+        if not value:
+            continue
+        text = normalize_name(value)
+        squashed = _squash(value)
+        # Longest name first so "Acme Games" beats "Acme"
+        for company in sorted(companies, key=lambda c: len(keys[c]), reverse=True):
+            key = keys[company]
+            if key and (key in text or key.replace(" ", "") in squashed):
+                return company
+        if field in ("company", "operator", "title"):
+            scores = [(difflib.SequenceMatcher(None, keys[c], text).ratio(), c) for c in companies]
+            score, company = max(scores)
+            if score >= cutoff:
+                return company
+    return None
+
+
+def attribute_results(companies, results, per_company=None):
+    """Splits a batch's results into {company: [results]} plus unattributed leftovers."""
+    grouped = {company: [] for company in companies}
+    unattributed = []
+    for result in results or []:
+        company = attribute_result(result, companies)
+        if company is None:
+            unattributed.append(result)
+        elif per_company is None or len(grouped[company]) < per_company:
+            grouped[company].append(result)
+    return grouped, unattributed
+
+
+def run_batched(companies, site, search, per_company=1, max_query_len=DEFAULT_MAX_QUERY_LEN, between=None):
+    """Runs search(query, num_results) once per batch and yields (company, results).
+
+    `companies` may be any iterable; batches are built as it is consumed.
+    between(batch_number) is called after every batch but the last, so
+    callers can keep their usual pacing between queries.
+
+    Results that cannot be matched to any company of their batch are yielded
+    under an "Unattributed (A / B)" label so they still reach the export.
+    """
+    batches = iter_batches(companies, site, max_query_len)
+    current = next(batches, None)
+    idx = packed = 0
+    while current is not None:
+        query, batch = current
+        idx += 1
+        packed += len(batch)
+        print(f"\n[batch {idx}] {', '.join(batch)}")
+        print("=" * 60)
+        results = search(query, per_company * len(batch))
+        grouped, unattributed = attribute_results(batch, results, per_company)
+        for company in batch:
+            yield company, grouped[company]
+        if unattributed:
+            print(f"Warning: {len(unattributed)} result(s) could not be attributed to a company in this batch")
+            yield f"Unattributed ({' / '.join(batch)})", unattributed
+        current = next(batches, None)
+        if between and current is not None:
+            between(idx)
+    print(f"Packed {packed} companies into {idx} batched queries")
@@ -0,0 +1,123 @@
+"""Host-wide search rate limit shared by every cga/mga/ukgc process.
+
+Each process paces itself with random sleeps and breathers, but several
+workers on one host add up and set off captcha storms. With --rate-limit,
+a process takes a token before every Google query and every further results
+page it loads, from a bucket kept in a small SQLite file in the temp
+directory, so all processes on the host share one steady rate plus a small
+burst, however many of them are running. The limiter is off by default: a
+single process is already paced by its own sleeps.
+
+Taking a token is one IMMEDIATE transaction: the bucket is refilled for the
+time since the last update, one token is reserved (the balance may go
+negative) and the caller sleeps until its token is due. Waiters are thus
+served in order and the lock is never held while sleeping. Time spent
+waiting is given back to the company's Budget, since it says nothing about
+the registry being slow.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+DEFAULT_RATE = 10  # queries per minute, all processes together (TokenBucket's default; the tools default to off)
+DEFAULT_BURST = 2
+DEFAULT_RATE_FILE = os.path.join(tempfile.gettempdir(), "search_tools_rate.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class TokenBucket:
+    """Token bucket named `name` in the SQLite file at `path`, refilled at `rate` tokens per second."""
+
+    def __init__(self, path=DEFAULT_RATE_FILE, name="google", rate=DEFAULT_RATE / 60, burst=DEFAULT_BURST):
+        self.path = path
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.acquired = 0
+        self.waited = 0.0
+        self.lock = threading.Lock()  # One connection per process, shared by its threads
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def reserve(self):
+        """Takes one token and returns how many seconds to wait until it is due."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self.conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+                tokens -= 1
+                self.conn.execute(
+                    "INSERT INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                    (self.name, tokens, now),
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return max(0.0, -tokens / self.rate)
+
+    def acquire(self):
+        """Blocks until a token is available. Returns the seconds waited."""
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+        with self.lock:
+            self.acquired += 1
+            self.waited += wait
+        return wait
+
+    def report(self):
+        if self.acquired:
+            print(f"Search rate limit ({self.rate * 60:g}/min host-wide): {self.acquired} queries, "
+                  f"{self.waited:.0f}s waited for a token ({self.waited / self.acquired:.1f}s avg)")
+
+    def close(self):
+        self.conn.close()
+
+
+LIMITER = None
+
+
+def add_rate_arguments(parser):
+    parser.add_argument("--rate-limit", type=float,
+                        help=f"Google requests (queries and results pages) per minute shared by all processes on this host, e.g. {DEFAULT_RATE} (default: off)")
+    parser.add_argument("--rate-burst", type=int, default=DEFAULT_BURST,
+                        help=f"Queries allowed back to back before the rate applies (default: {DEFAULT_BURST})")
+    parser.add_argument("--rate-file", type=str, default=DEFAULT_RATE_FILE,
+                        help="SQLite file holding the shared bucket (default: in the temp directory)")
+
+
+def configure(args):
+    """Sets up the process-wide limiter from --rate-limit/--rate-burst/--rate-file."""
+    global LIMITER
+    LIMITER = None
+    if args.rate_limit and args.rate_limit > 0:
+        LIMITER = TokenBucket(args.rate_file, rate=args.rate_limit / 60, burst=max(1, args.rate_burst))
+    return LIMITER
+
+
+def throttle(budget=None):
+    """Waits for the shared limiter (if configured) before a query; the wait does not use up `budget`."""
+    if LIMITER is None:
+        return 0.0
+    waited = LIMITER.acquire()
+    if waited and budget is not None:
+        budget.extend(waited)
+    return waited
+
+
+def rate_report():
+    if LIMITER is not None:
+        LIMITER.report()
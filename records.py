@@ -0,0 +1,144 @@
+"""Typed result records shared by the per-company tools (cga/mga/ukgc).
+
+A register page becomes a LicenceRecord holding its domains as
+DomainRecords, from scraping through batch attribution, the work queue and
+the daemon to result_rows(). Both types use __slots__ and intern their
+status strings: a large UKGC run repeats "Active"/"Inactive" on every
+domain, and each record then costs a few pointers instead of a dict.
+
+Records cross JSON boundaries (work queue, daemon) through to_json() and
+loads(): each record is tagged with its type so it comes back as a record.
+"""
+import json
+import sys
+
+
+def intern_text(value):
+    """Stripped, interned copy of a repeated string such as a status; None/"" pass through."""
+    if not value:
+        return value
+    return sys.intern(value.strip())
+
+
+class Record:
+    __slots__ = ()
+    TYPE = None
+
+    def get(self, field, default=None):
+        """dict-style access, so attribution and other generic code can read any field."""
+        return getattr(self, field, default)
+
+    def to_dict(self):
+        return {"_type": self.TYPE, **{name: getattr(self, name) for name in self.__slots__}}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{n}={getattr(self, n)!r}" for n in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class DomainRecord(Record):
+    """One website listed for a licence, with its status and matched brand where the register has them."""
+
+    __slots__ = ("name", "status", "brand")
+    TYPE = "domain"
+
+    def __init__(self, name, status=None, brand=None):
+        self.name = name
+        self.status = intern_text(status)
+        self.brand = intern_text(brand)
+
+
+class LicenceRecord(Record):
+    """One register page (licence or certificate) and the domains it lists.
+
+    `title` is the search result's title where the record comes from the SERP
+    (CGA); batch attribution checks it after company and operator.
+    """
+
+    __slots__ = ("url", "status", "company", "operator", "domains", "title")
+    TYPE = "licence"
+
+    def __init__(self, url, status=None, company=None, operator=None, domains=(), title=None):
+        self.url = url
+        self.status = intern_text(status)
+        self.company = company
+        self.operator = operator
+        self.domains = tuple(domains)
+        self.title = title
+
+    @property
+    def website(self):
+        """Domain names joined with ", " (None without domains), for display and attribution."""
+        return ", ".join(d.name for d in self.domains) or None
+
+    def to_dict(self):
+        data = super().to_dict()
+        data["domains"] = [d.to_dict() for d in self.domains]
+        return data
+
+
+class DomainCheck(Record):
+    """Liveness of one domain (domain_check.py): HTTP status and redirect target, or why it failed."""
+
+    __slots__ = ("domain", "reachable", "status", "final_url", "latency_ms", "error")
+    TYPE = "check"
+
+    def __init__(self, domain, reachable=False, status=None, final_url=None, latency_ms=None, error=None):
+        self.domain = domain
+        self.reachable = reachable
+        self.status = status
+        self.final_url = final_url
+        self.latency_ms = latency_ms
+        self.error = error
+
+
+class LookupResult(Record):
+    """Outcome of one company lookup (search_api.py): its licences, or the failure kind when it failed."""
+
+    __slots__ = ("registry", "company", "records", "failure")
+    TYPE = "lookup"
+
+    def __init__(self, registry, company, records=(), failure=None):
+        self.registry = registry
+        self.company = company
+        self.records = tuple(records)
+        self.failure = failure
+
+    @property
+    def ok(self):
+        """True when the lookup ran to the end (with or without licences found)."""
+        return self.failure in (None, "not_found")
+
+    def to_dict(self):
+        data = super().to_dict()
+        data["records"] = [r.to_dict() for r in self.records]
+        return data
+
+
+RECORD_TYPES = {cls.TYPE: cls for cls in (DomainRecord, LicenceRecord, DomainCheck, LookupResult)}
+
+
+def to_json(obj):
+    """json.dumps(default=...) hook for records."""
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def _from_dict(data):
+    cls = RECORD_TYPES.get(data.get("_type"))
+    if cls is None:
+        return data
+    return cls(**{k: v for k, v in data.items() if k != "_type"})
+
+
+def dumps(obj):
+    return json.dumps(obj, default=to_json)
+
+
+def loads(text):
+    """json.loads that turns tagged dicts back into records."""
+    return json.loads(text, object_hook=_from_dict)
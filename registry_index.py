@@ -0,0 +1,281 @@
+"""Cross-registry company/domain index backed by SQLite.
+
+Every tool can feed its workbook into the index (--index), after which
+domain -> licensees and company -> domains lookups are plain indexed
+point queries instead of spreadsheet searches.
+
+Usage:
+    python registry_index.py import certificates.xlsx --registry MGA
+    python registry_index.py domain bet365.com example.nl
+    python registry_index.py domain --file domains.txt --json
+    python registry_index.py company "Company Name"
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+
+from domain_utils import normalize_domain, registrable_domain
+
+DEFAULT_INDEX = "registry_index.sqlite"
+REGISTRIES = ("CGA", "MGA", "UKGC", "GGL", "KSA", "SGA")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    id INTEGER PRIMARY KEY,
+    registry TEXT NOT NULL,
+    company TEXT NOT NULL,
+    company_key TEXT NOT NULL,
+    domain TEXT NOT NULL DEFAULT '',
+    root_domain TEXT NOT NULL DEFAULT '',
+    brand TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    source_url TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL,
+    UNIQUE (registry, company_key, domain, source_url)
+);
+CREATE INDEX IF NOT EXISTS idx_listings_domain ON listings(domain);
+CREATE INDEX IF NOT EXISTS idx_listings_root_domain ON listings(root_domain);
+CREATE INDEX IF NOT EXISTS idx_listings_company ON listings(company_key, registry);
+"""
+
+# Header layouts of the workbooks written by each tool
+WORKBOOK_COLUMNS = {
+    "CGA": {"company": 1, "domain": 3, "source_url": 4},
+    "MGA": {"company": 1, "domain": 3, "source_url": 4, "status": 5},
+    "UKGC": {"company": 1, "brand": 2, "domain": 3, "status": 6, "source_url": 5},  # 4 is the per-domain URL Status
+    "GGL": {"company": 0, "domain": 1},
+    "KSA": {"company": 0, "domain": 1},
+    "SGA": {"company": 0, "domain": 1},
+}
+
+_COMPANY_KEY_RE = re.compile(r"\s+")
+
+
+def company_key(name):
+    """Case/whitespace-insensitive key used to match company names."""
+    return _COMPANY_KEY_RE.sub(" ", name or "").strip().casefold()
+
+
+class RegistryIndex:
+    """Thin wrapper around the SQLite listings table."""
+
+    def __init__(self, path=DEFAULT_INDEX):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_rows(self, registry, rows, replace_registry=False):
+        """Inserts (company, domain, brand, status, source_url) rows for a registry.
+
+        Existing rows of every company present in `rows` are replaced, so
+        re-running a tool refreshes its companies. Whole-list registries pass
+        replace_registry=True to swap the full snapshot at once.
+        """
+        registry = registry.upper()
+        now = time.time()
+        records = []
+        for company, domain, brand, status, source_url in rows:
+            if not company:
+                continue
+            domain = normalize_domain(domain) or ""
+            records.append((
+                registry, company, company_key(company), domain,
+                (registrable_domain(domain) or "") if domain else "",
+                brand or "", status or "", source_url or "", now,
+            ))
+
+        with self.conn:
+            if replace_registry:
+                self.conn.execute("DELETE FROM listings WHERE registry = ?", (registry,))
+            else:
+                keys = {(registry, r[2]) for r in records}
+                self.conn.executemany(
+                    "DELETE FROM listings WHERE registry = ? AND company_key = ?", keys
+                )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO listings (registry, company, company_key, domain, root_domain, "
+                "brand, status, source_url, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records,
+            )
+        return len(records)
+
+    def lookup_domain(self, domain, include_subdomains=False):
+        """Which registries and licensees list this domain."""
+        domain = normalize_domain(domain)
+        if not domain:
+            return []
+        if include_subdomains:
+            root = registrable_domain(domain) or domain
+            cur = self.conn.execute(
+                "SELECT registry, company, domain, brand, status, source_url FROM listings "
+                "WHERE root_domain = ?", (root,)
+            )
+        else:
+            cur = self.conn.execute(
+                "SELECT registry, company, domain, brand, status, source_url FROM listings "
+                "WHERE domain = ?", (domain,)
+            )
+        return [dict(r) for r in cur]
+
+    def lookup_domains(self, domains, include_subdomains=False):
+        """Batch variant of lookup_domain: {normalized domain: [listings]}."""
+        results = {}
+        for value in domains:
+            domain = normalize_domain(value)
+            if domain and domain not in results:
+                results[domain] = self.lookup_domain(domain, include_subdomains)
+        return results
+
+    def lookup_company(self, name, registries=None):
+        """Which domains this company holds, per registry."""
+        sql = ("SELECT registry, company, domain, brand, status, source_url FROM listings "
+               "WHERE company_key = ?")
+        params = [company_key(name)]
+        if registries:
+            sql += f" AND registry IN ({','.join('?' * len(registries))})"
+            params.extend(r.upper() for r in registries)
+        return [dict(r) for r in self.conn.execute(sql, params)]
+
+    def stats(self):
+        cur = self.conn.execute(
+            "SELECT registry, COUNT(DISTINCT company_key) AS companies, "
+            "COUNT(DISTINCT NULLIF(domain, '')) AS domains FROM listings GROUP BY registry"
+        )
+        return [dict(r) for r in cur]
+
+
+def detect_registry(header):
+    """Guesses the registry from a workbook header row ("MGA - Licencia", ...)."""
+    first = str(header[0] or "") if header else ""
+    if " - " in first:
+        return first.split(" - ")[0].strip().upper()
+    return None
+
+
+def read_workbook_rows(excel_file, registry):
+    """Yields (company, domain, brand, status, source_url) from a tool's workbook."""
+    from openpyxl import load_workbook
+
+    columns = WORKBOOK_COLUMNS[registry]
+    wb = load_workbook(excel_file, read_only=True)
+    try:
+        ws = wb.active
+        for row in ws.iter_rows(min_row=2, values_only=True):
+            def cell(key):
+                idx = columns.get(key)
+                if idx is None or idx >= len(row) or row[idx] is None:
+                    return ""
+                return str(row[idx]).strip()
+            yield cell("company"), cell("domain"), cell("brand"), cell("status"), cell("source_url")
+    finally:
+        wb.close()
+
+
+def import_workbook(index_path, excel_file, registry=None, replace_registry=False):
+    """Loads a workbook written by one of the tools into the index."""
+    if not registry:
+        from openpyxl import load_workbook
+        wb = load_workbook(excel_file, read_only=True)
+        header = next(wb.active.iter_rows(max_row=1, values_only=True), ())
+        wb.close()
+        registry = detect_registry(header)
+        if not registry:
+            raise ValueError(f"Cannot detect registry for {excel_file}, pass --registry")
+    registry = registry.upper()
+    if registry not in WORKBOOK_COLUMNS:
+        raise ValueError(f"Unknown registry '{registry}' (expected one of {', '.join(REGISTRIES)})")
+
+    with RegistryIndex(index_path) as index:
+        count = index.add_rows(registry, read_workbook_rows(excel_file, registry), replace_registry)
+    print(f"Indexed {count} {registry} row(s) from {excel_file} into {index_path}")
+    return count
+
+
+def _print_listings(title, listings):
+    print(f"\n{title}")
+    if not listings:
+        print("   (not listed)")
+    for item in listings:
+        extra = f" [{item['status']}]" if item['status'] else ""
+        print(f"   {item['registry']:<5} {item['company']} -> {item['domain'] or '-'}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-registry company/domain index")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help=f"SQLite index path (default: {DEFAULT_INDEX})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="Import tool workbooks into the index")
+    p_import.add_argument("files", nargs="+", help="Workbooks written by the search tools")
+    p_import.add_argument("--registry", choices=REGISTRIES, type=str.upper, help="Registry (auto-detected for CGA/MGA/UKGC)")
+    p_import.add_argument("--full", action="store_true", help="Workbook is a full registry snapshot, replace all its rows")
+
+    p_domain = sub.add_parser("domain", help="Which licensees and registries list these domains")
+    p_domain.add_argument("domains", nargs="*")
+    p_domain.add_argument("--file", help="File with one domain per line")
+    p_domain.add_argument("--subdomains", action="store_true", help="Match on the registrable domain")
+    p_domain.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+
+    p_company = sub.add_parser("company", help="Which domains a company holds across registries")
+    p_company.add_argument("company", nargs="+")
+    p_company.add_argument("--registry", action="append", type=str.upper, help="Restrict to registry (repeatable)")
+    p_company.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+
+    sub.add_parser("stats", help="Row counts per registry")
+
+    args = parser.parse_args()
+
+    if args.command == "import":
+        for path in args.files:
+            import_workbook(args.index, path, registry=args.registry, replace_registry=args.full)
+        return
+
+    if not os.path.exists(args.index):
+        print(f"Error: index '{args.index}' not found. Import some workbooks first.")
+        exit(1)
+
+    with RegistryIndex(args.index) as index:
+        if args.command == "domain":
+            domains = list(args.domains)
+            if args.file:
+                with open(args.file, 'r', encoding='utf-8') as f:
+                    domains.extend(line.strip() for line in f if line.strip())
+            start = time.perf_counter()
+            results = index.lookup_domains(domains, include_subdomains=args.subdomains)
+            elapsed = time.perf_counter() - start
+            if args.json:
+                print(json.dumps(results, indent=2))
+            else:
+                for domain, listings in results.items():
+                    _print_listings(domain, listings)
+                per_lookup = elapsed / len(results) * 1e6 if results else 0
+                print(f"\n{len(results)} domain(s) looked up in {elapsed:.3f}s ({per_lookup:.0f} µs/lookup)")
+        elif args.command == "company":
+            name = " ".join(args.company)
+            listings = index.lookup_company(name, registries=args.registry)
+            if args.json:
+                print(json.dumps(listings, indent=2))
+            else:
+                _print_listings(name, listings)
+        elif args.command == "stats":
+            for row in index.stats():
+                print(f"{row['registry']:<5} {row['companies']} companies, {row['domains']} domains")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Time budgets, failure classification and per-host circuit breaking.
+
+Every company lookup gets a Budget: an overall deadline plus a cap per
+phase (consent banner, search box, result list, detail pages...). Waits ask
+the budget for their timeout instead of hard-coding 3/5/10 s, so a lookup
+never runs past its deadline however many waits time out along the way.
+
+Failures are classified as timeout, not_found, blocked, parse or error.
+Timeouts, blocks and generic errors count towards a per-host
+CircuitBreaker. After `threshold` of them in a row the host is skipped for
+`cooldown` seconds, and LookupGuard defers the companies that need it
+instead of waiting out every timeout on a registry that is down. Deferred
+companies get one more pass at the end of the run, starting with a single
+probe once the cooldown is over.
+"""
+import socket
+import threading
+import time
+import urllib.error
+from collections import Counter
+from urllib.parse import urlsplit
+
+TIMEOUT = "timeout"
+NOT_FOUND = "not_found"
+BLOCKED = "blocked"
+PARSE = "parse"
+ERROR = "error"
+
+# Kinds that say something about the host rather than about the company
+TRIPPING_KINDS = (TIMEOUT, BLOCKED, ERROR)
+
+DEFAULT_COMPANY_TIMEOUT = 120
+PHASE_TIMEOUTS = {
+    "consent": 3,
+    "search_box": 10,
+    "results": 5,
+    "cookie_banner": 3,
+    "detail": 20,
+    "tables": 5,
+    "page_load": 60,
+}
+
+BLOCKED_MARKERS = (
+    "unusual traffic", "recaptcha", "are you a robot", "access denied",
+    "too many requests", "request blocked", "attention required",
+)
+NOT_FOUND_MARKERS = ("page not found", "404 not found", "no longer available", "does not exist")
+
+
+class LookupFailure(Exception):
+    def __init__(self, kind, message="", host=None):
+        super().__init__(message or kind)
+        self.kind = kind
+        self.host = host
+
+
+class BudgetExceeded(LookupFailure):
+    def __init__(self, phase):
+        super().__init__(TIMEOUT, f"time budget used up before '{phase}'")
+        self.phase = phase
+
+
+def host_of(url):
+    """Host of a URL without a leading www., so detail pages and --filter prefixes match."""
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def page_source(driver):
+    """driver.page_source, or "" when the browser can no longer be read."""
+    try:
+        return driver.page_source
+    except Exception:
+        return ""
+
+
+def parse_phase_timeout(value):
+    """argparse type for --phase-timeout name=seconds."""
+    import argparse
+
+    name, _, seconds = value.partition("=")
+    try:
+        seconds = float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected phase=seconds, got '{value}'")
+    if name not in PHASE_TIMEOUTS:
+        raise argparse.ArgumentTypeError(f"unknown phase '{name}' (one of {', '.join(PHASE_TIMEOUTS)})")
+    return name, seconds
+
+
+def classify_page(text):
+    """BLOCKED / NOT_FOUND from visible page text, or None if it looks normal."""
+    text = (text or "").lower()
+    if any(m in text for m in BLOCKED_MARKERS):
+        return BLOCKED
+    if any(m in text for m in NOT_FOUND_MARKERS):
+        return NOT_FOUND
+    return None
+
+
+def classify_error(exc, page_text=None):
+    """Maps an exception (and optionally the page it happened on) to a failure kind."""
+    if isinstance(exc, LookupFailure):
+        return exc.kind
+    if isinstance(exc, urllib.error.HTTPError):
+        if exc.code in (404, 410):
+            return NOT_FOUND
+        if exc.code in (401, 403, 429, 503):
+            return BLOCKED
+        return ERROR
+    # A wait that timed out on a captcha or error page is a block, not a slow host
+    page_kind = classify_page(page_text)
+    if page_kind:
+        return page_kind
+    if isinstance(exc, (socket.timeout, TimeoutError)) or "Timeout" in type(exc).__name__:
+        return TIMEOUT
+    if isinstance(exc, urllib.error.URLError) and isinstance(exc.reason, (socket.timeout, TimeoutError)):
+        return TIMEOUT
+    if isinstance(exc, (ValueError, KeyError, IndexError, AttributeError, TypeError)):
+        return PARSE
+    return ERROR
+
+
+class Budget:
+    """Deadline for one company lookup, handing out per-phase wait timeouts."""
+
+    def __init__(self, seconds=None, phase_timeouts=None):
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.phase_timeouts = dict(PHASE_TIMEOUTS, **(phase_timeouts or {}))
+        self.failure = None  # (kind, message, host) of the first failure recorded
+
+    def remaining(self):
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def timeout(self, phase):
+        """Seconds to wait in `phase`: its cap, cut short by the deadline. Raises when none is left."""
+        cap = self.phase_timeouts.get(phase, 10)
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        if remaining <= 0:
+            raise BudgetExceeded(phase)
+        return max(0.1, min(cap, remaining))
+
+    def extend(self, seconds):
+        """Moves the deadline back by time spent queued rather than working (the shared rate limit)."""
+        if self.deadline is not None:
+            self.deadline += seconds
+
+    def fail(self, kind, message="", host=None):
+        if self.failure is None:
+            self.failure = (kind, message, host)
+
+
+class CircuitBreaker:
+    """Per-host breaker: opens after `threshold` consecutive tripping failures, for `cooldown` seconds.
+
+    Once the cooldown is over one probe is let through; success closes the
+    breaker, another failure opens it again straight away.
+    """
+
+    def __init__(self, threshold=5, cooldown=120):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = Counter()
+        self.open_until = {}
+        self.lock = threading.Lock()
+
+    def retry_in(self, host):
+        """Seconds until `host` may be tried again (0 when it is closed or due a probe)."""
+        with self.lock:
+            return max(0.0, self.open_until.get(host, 0) - time.monotonic())
+
+    def allow(self, host):
+        return self.retry_in(host) == 0
+
+    def record(self, host, kind=None):
+        """Records a lookup outcome for `host`; kind None means success."""
+        with self.lock:
+            if kind not in TRIPPING_KINDS:
+                self.failures[host] = 0
+                self.open_until.pop(host, None)
+                return
+            self.failures[host] += 1
+            if self.failures[host] >= self.threshold:
+                if host not in self.open_until or self.open_until[host] <= time.monotonic():
+                    print(f"[breaker] {host}: {self.failures[host]} failures in a row, "
+                          f"skipping it for {self.cooldown:.0f}s")
+                self.open_until[host] = time.monotonic() + self.cooldown
+
+
+class LookupGuard:
+    """Runs per-company lookups under a Budget and the hosts' circuit breakers.
+
+    run(company, lookup) calls lookup(budget) and returns (results, kind),
+    kind being the failure kind or None on success. Results are None when one
+    of the hosts is open and the company was deferred; with defer=False
+    (queue workers, batched queries) run() waits out the cooldown instead.
+    """
+
+    def __init__(self, hosts, company_timeout=DEFAULT_COMPANY_TIMEOUT, phase_timeouts=None,
+                 threshold=5, cooldown=120, defer=True):
+        self.hosts = tuple(hosts)
+        self.company_timeout = company_timeout
+        self.phase_timeouts = dict(phase_timeouts or {})
+        self.breaker = CircuitBreaker(threshold, cooldown)
+        self.defer = defer
+        self.deferred = []
+        self.outcomes = Counter()
+        self.lock = threading.Lock()
+        self.before_lookup = None  # Called before each lookup that runs, e.g. BrowserRecycler.checkpoint
+
+    def blocked_for(self):
+        return max(self.breaker.retry_in(h) for h in self.hosts)
+
+    def run(self, company, lookup):
+        wait = self.blocked_for()
+        if wait and self.defer:
+            with self.lock:
+                self.deferred.append(company)
+                self.outcomes["deferred"] += 1
+            print(f"Deferring {company}: registry circuit open for another {wait:.0f}s")
+            return None, None
+        if wait:
+            print(f"Registry circuit open, waiting {wait:.0f}s before {company}...")
+            time.sleep(wait)
+
+        if self.before_lookup:
+            self.before_lookup()
+        budget = Budget(self.company_timeout, self.phase_timeouts)
+        try:
+            results = lookup(budget) or []
+        except Exception as e:
+            budget.fail(classify_error(e), str(e))
+            results = []
+
+        kind, message, host = budget.failure or (None, "", None)
+        if kind is None and not results:
+            kind = NOT_FOUND
+        for h in ([host] if host in self.hosts else self.hosts):
+            self.breaker.record(h, kind if kind in TRIPPING_KINDS else None)
+        with self.lock:
+            self.outcomes[kind or "ok"] += 1
+        if kind and kind != NOT_FOUND:
+            print(f"Lookup for {company} failed ({kind}): {message}")
+        return results, kind
+
+    def retry_deferred(self, lookup, with_kind=False):
+        """One more pass over deferred companies once the cooldown is over; yields (company, results).
+
+        `lookup(company, budget)` is the same call run() made. Companies still
+        blocked after that pass are yielded with empty results. with_kind adds
+        the failure kind as a third item ("deferred" for those still blocked).
+        """
+        deferred, self.deferred = self.deferred, []
+        if not deferred:
+            return
+        wait = self.blocked_for()
+        print(f"\n{len(deferred)} deferred compan{'y' if len(deferred) == 1 else 'ies'}, "
+              f"retrying after {wait:.0f}s cooldown...")
+        time.sleep(wait)
+        for company in deferred:
+            with self.lock:
+                self.outcomes["deferred"] -= 1
+            results, kind = self.run(company, lambda budget, c=company: lookup(c, budget))
+            if with_kind:
+                yield company, results or [], kind if results is not None else "deferred"
+            else:
+                yield company, results or []
+        if self.deferred:
+            print(f"{len(self.deferred)} compan{'y' if len(self.deferred) == 1 else 'ies'} still blocked, "
+                  f"written without results")
+
+    def report(self, label="Lookup outcomes"):
+        print(f"{label}: " + ", ".join(f"{k} {v}" for k, v in sorted(self.outcomes.items()) if v))
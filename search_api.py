@@ -0,0 +1,143 @@
+"""Importable lookups for cga/mga/ukgc, yielding typed results as each company finishes.
+
+The command-line tools parse arguments, drive the loop and write a
+workbook in one go. These generators run the same lookups (search_web()
+under a LookupGuard budget and circuit breaker, with the tools' pacing)
+but hand back a records.LookupResult per company instead, so services can
+embed lookups and keep a browser across calls:
+
+    from search_api import lookup_companies
+
+    driver = search_tool_mga.init_driver()
+    for result in lookup_companies("mga", ["Company A", "Company B"], driver=driver):
+        print(result.company, result.failure, [r.website for r in result.records])
+
+An injected driver stays open; without one a driver is started with
+`driver_options` (init_driver() keyword arguments) and quit at the end.
+MGA can also skip the browser: lookup_mga_native() queries the register
+over HTTP, optionally on a caller's mga_register.RegisterSession.
+
+Each function's docstring says in which order its results come back.
+"""
+import importlib
+import random
+import time
+
+from records import LookupResult
+from resilience import DEFAULT_COMPANY_TIMEOUT, LookupGuard, host_of
+
+# Per registry: tool module, URL prefix of register pages and default number of results
+REGISTRIES = {
+    "cga": ("search_tool_cga", "https://cert.gcb.cw/certificate", 30),
+    "mga": ("search_tool_mga", "https://authorisation.mga.org.mt", 1),
+    "ukgc": ("search_tool_ukgc", "https://www.gamblingcommission.gov.uk/public-register/business/detail", 1),
+}
+
+
+def registry_tool(registry):
+    """The search_tool_<registry> module (imported on first use, it needs selenium)."""
+    registry = registry.lower()
+    if registry not in REGISTRIES:
+        raise ValueError(f"Unknown registry '{registry}' (expected one of {', '.join(REGISTRIES)})")
+    return importlib.import_module(REGISTRIES[registry][0])
+
+
+def make_guard(hosts, company_timeout=DEFAULT_COMPANY_TIMEOUT, phase_timeouts=None, threshold=5, cooldown=120):
+    return LookupGuard(hosts, company_timeout=company_timeout, phase_timeouts=phase_timeouts,
+                       threshold=threshold, cooldown=cooldown)
+
+
+def _pause(idx):
+    """The tools' pacing between companies: a longer breather every 5th one."""
+    if idx % 5 == 0:
+        time.sleep(random.uniform(5.0, 8.0))
+    else:
+        time.sleep(random.uniform(0.3, 0.8))
+
+
+def lookup_companies(registry, companies, driver=None, num=None, prefix=None, guard=None, pace=True,
+                     driver_options=None, **search_options):
+    """Yields a LookupResult per company of `companies` (any iterable, consumed lazily).
+
+    Results come in input order, each as soon as its lookup is done.
+    Companies deferred while the registry's breaker is open are left out of
+    that order and follow at the end, in input order, after one more pass.
+
+    `search_options` go to the tool's search_web() (direct/fetch_workers for
+    cga, max_tabs/per_host for mga and ukgc). `guard` is a LookupGuard
+    shared across calls if breaker state should carry over; by default each
+    call gets a fresh one. pace=False drops the pauses between companies
+    (the host-wide rate limit still applies if configured).
+    """
+    registry = registry.lower()
+    tool = registry_tool(registry)
+    _, default_prefix, default_num = REGISTRIES[registry]
+    prefix = prefix or default_prefix
+    num = num or default_num
+    guard = guard or make_guard((tool.SERP_HOST, host_of(prefix)))
+
+    own_driver = driver is None
+    if own_driver:
+        driver = tool.init_driver(**(driver_options or {}))
+
+    def search(company, budget):
+        return tool.search_web(driver, tool.QUERY_TEMPLATE.format(company=company), num_results=num,
+                               required_prefix=prefix, budget=budget, **search_options)
+
+    try:
+        previous = None
+        for idx, company in enumerate(companies, 1):
+            if pace and previous is not None:
+                _pause(idx - 1)
+            previous = company
+            results, failure = guard.run(company, lambda budget: search(company, budget))
+            if results is None:
+                continue  # Deferred, retried below
+            yield LookupResult(registry.upper(), company, results, failure)
+        for company, results, failure in guard.retry_deferred(search, with_kind=True):
+            yield LookupResult(registry.upper(), company, results, failure)
+    finally:
+        if own_driver:
+            driver.quit()
+
+
+def lookup_cga(companies, driver=None, **options):
+    return lookup_companies("cga", companies, driver=driver, **options)
+
+
+def lookup_mga(companies, driver=None, **options):
+    return lookup_companies("mga", companies, driver=driver, **options)
+
+
+def lookup_ukgc(companies, driver=None, **options):
+    return lookup_companies("ukgc", companies, driver=driver, **options)
+
+
+def lookup_mga_native(companies, num=1, session=None, workers=4, timeout=20, guard=None):
+    """MGA lookups over HTTP on the register's own search, yielding a LookupResult per company.
+
+    With a `session` (mga_register.RegisterSession) lookups run one after
+    another on it; without one they run `workers` at a time, each on its
+    own session. Either way results come in input order (concurrent lookups
+    are yielded in the order they were submitted, not as they finish).
+    Deferred companies follow at the end, in input order, like in
+    lookup_companies().
+    """
+    import mga_register
+
+    guard = guard or make_guard((host_of(mga_register.BASE_URL),))
+
+    def lookup(company, budget):
+        return mga_register.lookup_company(company, num, timeout=timeout, budget=budget, session=session)
+
+    if session is not None:
+        for company in companies:
+            results, failure = guard.run(company, lambda budget: lookup(company, budget))
+            if results is not None:
+                yield LookupResult("MGA", company, results, failure)
+    else:
+        for company, results, failure in mga_register.iter_lookups(companies, num, workers, timeout,
+                                                                   guard=guard, with_kind=True):
+            yield LookupResult("MGA", company, results, failure)
+    for company, results, failure in guard.retry_deferred(lookup, with_kind=True):
+        yield LookupResult("MGA", company, results, failure)
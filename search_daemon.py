@@ -0,0 +1,337 @@
+"""Long-running lookup daemon with warm browsers per registry.
+
+Keeps one initialised Chrome per registry (profile loaded, Google consent
+handled) and answers lookups over a local HTTP or Unix-socket API, so
+callers skip the cold start of running a tool from scratch. Lookups get the
+tools' time budget and circuit breakers; a tripped registry answers 503.
+
+Endpoints (GET query string or POST JSON body):
+    /lookup?registry=mga&company=Some+Company[&num=1]
+    /domain?domain=example.com        (needs --index)
+    /company?name=Some+Company        (needs --index)
+    /health
+
+Usage:
+    python search_daemon.py --registries cga,mga,ukgc --port 8765
+    python search_daemon.py --socket /tmp/search_tools.sock --index registry_index.sqlite
+"""
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from driver_utils import dismiss_banner, session_state
+from navigation import navigate
+from profile_template import add_template_arguments, clone_profile, discard_profile, ensure_template
+from profiling import add_profile_arguments, start_profiling
+from rate_limit import add_rate_arguments, configure as configure_rate_limit, rate_report
+from records import to_json
+from resilience import DEFAULT_COMPANY_TIMEOUT, NOT_FOUND, LookupGuard, host_of, parse_phase_timeout
+from search_api import REGISTRIES, registry_tool
+
+# Per-company registries: module, query template, URL prefix and default -n
+REGISTRY_TOOLS = {
+    name: (registry_tool(name), registry_tool(name).QUERY_TEMPLATE, prefix, num)
+    for name, (_, prefix, num) in REGISTRIES.items()
+}
+
+
+class RegistryBlocked(Exception):
+    """The registry's circuit breaker is open; the lookup was not attempted."""
+
+    def __init__(self, registry, retry_in):
+        super().__init__(f"{registry} circuit open for another {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class RegistryWorker:
+    """Owns one warm driver for a registry; lookups on it are serialised.
+
+    Lookups run under a LookupGuard like the tools' (time budget per company,
+    breakers for Google and the register); while a breaker is open, lookup()
+    raises RegistryBlocked instead of queueing callers behind the cooldown.
+    """
+
+    def __init__(self, registry, user_data_dir=None, profile_directory="Default", template=None, guard_options=None):
+        self.registry = registry
+        self.module, self.query_template, self.prefix, self.default_num = REGISTRY_TOOLS[registry]
+        self.guard = LookupGuard((self.module.SERP_HOST, host_of(self.prefix)), defer=False, **(guard_options or {}))
+        # Chrome locks its profile directory, so every registry gets its own
+        self.user_data_dir = user_data_dir or os.path.join(os.getcwd(), f"chrome_profile_{registry}")
+        self.profile_directory = profile_directory
+        self.template = template  # Each browser gets its own clone of it, deleted when the browser quits
+        self.clone = None
+        self.lock = threading.Lock()
+        self.driver = None
+        self.lookups = 0
+        self.started_at = None
+
+    def warm_up(self):
+        start = time.time()
+        if self.template:
+            self.clone = clone_profile(self.template)
+        self.driver = self.module.init_driver(user_data_dir=self.clone or self.user_data_dir,
+                                              profile_directory=self.profile_directory)
+        navigate(self.driver, "https://www.google.com", "GOOGLE", "home")
+        try:
+            # Recorded in the driver's session state, so lookups skip the consent wait
+            dismiss_banner(self.driver, "consent", 3)
+        except Exception:
+            pass
+        self.started_at = time.time()
+        print(f"[{self.registry}] warm in {self.started_at - start:.1f}s")
+
+    def restart(self):
+        self.close()
+        self.driver = None
+        self.warm_up()
+
+    def lookup(self, company, num=None):
+        """(results, failure kind or None) for one company."""
+        query = self.query_template.format(company=company)
+        wait = self.guard.blocked_for()
+        if wait:
+            raise RegistryBlocked(self.registry, wait)
+        with self.lock:
+            if self.driver is None:
+                self.warm_up()
+            try:
+                # Cheap liveness probe, the session dies if Chrome crashed
+                self.driver.current_url
+            except Exception:
+                print(f"[{self.registry}] driver lost, restarting...")
+                self.restart()
+            results, failure = self.guard.run(company, lambda budget: self.module.search_web(
+                self.driver, query, num_results=num or self.default_num, required_prefix=self.prefix, budget=budget))
+            self.lookups += 1
+        return results or [], failure
+
+    def close(self):
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+        if self.clone:
+            discard_profile(self.clone)
+            self.clone = None
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    server_version = "search_tools/1.0"
+
+    def address_string(self):
+        # Unix sockets have no (host, port) client address
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, default=to_json).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _params(self):
+        parsed = urllib.parse.urlparse(self.path)
+        params = {k: v[-1] for k, v in urllib.parse.parse_qs(parsed.query).items()}
+        if self.command == "POST":
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(body, dict):
+                    raise ValueError("JSON body must be an object")
+                params.update(body)
+        return parsed.path.rstrip("/") or "/", params
+
+    def do_GET(self):
+        try:
+            path, params = self._params()
+        except ValueError as e:
+            self._send_json(400, {"error": f"Bad request: {e}"})
+            return
+        daemon = self.server.daemon_state
+
+        if path == "/health":
+            self._send_json(200, daemon.health())
+        elif path == "/lookup":
+            registry = str(params.get("registry", "")).lower()
+            company = params.get("company")
+            if registry not in daemon.workers:
+                self._send_json(404, {"error": f"Registry '{registry}' not served", "registries": list(daemon.workers)})
+                return
+            if not company:
+                self._send_json(400, {"error": "Missing 'company'"})
+                return
+            num = params.get("num") or None
+            if num is not None:
+                try:
+                    num = int(num)
+                except (TypeError, ValueError):
+                    num = 0
+                if num < 1:
+                    self._send_json(400, {"error": f"'num' must be a positive integer, got {params['num']!r}"})
+                    return
+            start = time.time()
+            try:
+                results, failure = daemon.workers[registry].lookup(company, num)
+            except RegistryBlocked as e:
+                self._send_json(503, {"error": str(e), "registry": registry, "company": company},
+                                headers={"Retry-After": str(int(e.retry_in) + 1)})
+                return
+            except Exception as e:
+                self._send_json(502, {"error": str(e), "registry": registry, "company": company})
+                return
+            if failure and failure != NOT_FOUND:
+                self._send_json(502, {"error": f"Lookup failed ({failure})", "failure": failure,
+                                      "registry": registry, "company": company})
+                return
+            self._send_json(200, {
+                "registry": registry,
+                "company": company,
+                "results": results,
+                "failure": failure,
+                "seconds": round(time.time() - start, 2),
+            })
+        elif path in ("/domain", "/company"):
+            if not daemon.index_path:
+                self._send_json(404, {"error": "No --index configured"})
+                return
+            from registry_index import RegistryIndex
+            # sqlite3 connections are per-thread
+            with RegistryIndex(daemon.index_path) as index:
+                if path == "/domain":
+                    domain = params.get("domain")
+                    if not domain:
+                        self._send_json(400, {"error": "Missing 'domain'"})
+                        return
+                    self._send_json(200, {"domain": domain, "listings": index.lookup_domain(domain)})
+                else:
+                    name = params.get("name")
+                    if not name:
+                        self._send_json(400, {"error": "Missing 'name'"})
+                        return
+                    self._send_json(200, {"company": name, "listings": index.lookup_company(name)})
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint {path}"})
+
+    do_POST = do_GET
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class SearchDaemon:
+    def __init__(self, registries, index_path=None, profile_directory="Default", template=None, guard_options=None):
+        self.workers = {r: RegistryWorker(r, profile_directory=profile_directory, template=template,
+                                          guard_options=guard_options)
+                        for r in registries}
+        self.index_path = index_path
+        self.started_at = time.time()
+
+    def warm_up(self):
+        """Launches every registry's browser in parallel."""
+        threads = []
+        for worker in self.workers.values():
+            t = threading.Thread(target=self._warm_worker, args=(worker,), daemon=True)
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+
+    @staticmethod
+    def _warm_worker(worker):
+        with worker.lock:
+            try:
+                worker.warm_up()
+            except Exception as e:
+                print(f"[{worker.registry}] warm-up failed, will retry on first lookup: {e}")
+                worker.driver = None
+
+    def health(self):
+        return {
+            "uptime": round(time.time() - self.started_at, 1),
+            "index": self.index_path,
+            "registries": {
+                name: {"warm": w.driver is not None, "lookups": w.lookups, "busy": w.lock.locked(),
+                       "banner_wait_saved": round(session_state(w.driver).saved, 1) if w.driver else 0.0,
+                       "blocked_for": round(w.guard.blocked_for(), 1), "outcomes": dict(w.guard.outcomes)}
+                for name, w in self.workers.items()
+            },
+        }
+
+    def close(self):
+        for worker in self.workers.values():
+            worker.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lookup daemon keeping warm browsers per registry")
+    parser.add_argument("--registries", default="cga,mga,ukgc", help="Comma-separated registries to serve (default: cga,mga,ukgc)")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="HTTP port (default: 8765)")
+    parser.add_argument("--socket", type=str, help="Serve on this Unix socket path instead of TCP")
+    parser.add_argument("--index", type=str, help="Registry index for /domain and /company lookups")
+    parser.add_argument("--profile", type=str, default="Default", help="Chrome profile directory name (default: Default)")
+    parser.add_argument("--company-timeout", type=float, default=DEFAULT_COMPANY_TIMEOUT, help=f"Time budget per lookup in seconds (default: {DEFAULT_COMPANY_TIMEOUT})")
+    parser.add_argument("--phase-timeout", type=parse_phase_timeout, action="append", default=[], metavar="PHASE=SECONDS", help="Override one phase's wait cap, e.g. consent=1 (repeatable)")
+    parser.add_argument("--breaker-threshold", type=int, default=5, help="Consecutive timeouts/blocks on a host before lookups are refused with 503 (default: 5)")
+    parser.add_argument("--breaker-cooldown", type=float, default=120, help="Seconds a tripped host is left alone (default: 120)")
+    add_rate_arguments(parser)
+    add_template_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args, "daemon")
+    configure_rate_limit(args)
+
+    registries = [r.strip().lower() for r in args.registries.split(",") if r.strip()]
+    unknown = [r for r in registries if r not in REGISTRY_TOOLS]
+    if unknown:
+        print(f"Error: unknown registries {unknown}. Choose from: {', '.join(REGISTRY_TOOLS)}")
+        exit(1)
+
+    template = None
+    if args.profile_template:
+        template = ensure_template(REGISTRY_TOOLS[registries[0]][0].init_driver, args.profile_template,
+                                   profile_directory=args.profile)
+    guard_options = dict(company_timeout=args.company_timeout, phase_timeouts=dict(args.phase_timeout),
+                         threshold=args.breaker_threshold, cooldown=args.breaker_cooldown)
+    daemon = SearchDaemon(registries, index_path=args.index, profile_directory=args.profile, template=template,
+                          guard_options=guard_options)
+    print(f"Warming browsers for: {', '.join(registries)}")
+    daemon.warm_up()
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixHTTPServer(args.socket, LookupHandler)
+        where = args.socket
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), LookupHandler)
+        where = f"http://{args.host}:{args.port}"
+    server.daemon_state = daemon
+
+    print(f"Listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+        daemon.close()
+        rate_report()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,15 +10,19 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import ElementClickInterceptedException
 
-from webdriver_manager.chrome import ChromeDriverManager
-from openpyxl import Workbook
+from domain_utils import normalize_domain
+from driver_utils import StartupTimer, chromedriver_path
+from extraction import get_extractor
+from navigation import PAGE_LOAD_STRATEGIES, configure_options, navigate, navigation_report
+from profiling import add_profile_arguments, start_profiling
 
 URL = "https://www.gluecksspiel-behoerde.de/de/fuer-spielende/uebersicht-erlaubter-anbieter-whitelist"
 BATCH_SIZE = 15
 
 
-def init_driver(attach=False):
+def init_driver(attach=False, fast_start=False, page_load_strategy=None):
     options = Options()
+    configure_options(options, "GGL", page_load_strategy)
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_argument("--start-maximized")
 
@@ -27,7 +31,7 @@ def init_driver(attach=False):
         return webdriver.Chrome(options=options)
 
     return webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
+        service=Service(chromedriver_path(fast_start)),
         options=options
     )
 
@@ -40,6 +44,8 @@ def safe_click(driver, element):
 
 
 def export_excel(rows, output_dir, export_number):
+    from openpyxl import Workbook
+
     os.makedirs(output_dir, exist_ok=True)
     filename = f"ggl_whitelist_{export_number}.xlsx"
     path = os.path.join(output_dir, filename)
@@ -57,18 +63,23 @@ def export_excel(rows, output_dir, export_number):
 
     wb.save(path)
     print(f"✔ Exported → {path}")
+    return path
 
 
-def scrape_ggl(driver, output_dir):
-    wait = WebDriverWait(driver, 20)
-    driver.get(URL)
+def iter_companies_parsed(driver):
+    """Reads every accordion from one parse of the page source, without opening them.
 
-    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "ul[uk-accordion] > li")))
+    Returns None when the accordion bodies are not in the DOM (no domains at
+    all), so the caller can fall back to clicking through them.
+    """
+    companies = get_extractor("GGL").extract("whitelist", driver.page_source)["companies"]
+    if not any(c["domains"] for c in companies):
+        return None
+    return [(c["company"], c["domains"]) for c in companies]
 
-    results = []
-    export_count = 0
-    companies_processed = 0
 
+def iter_companies_clicked(driver, wait):
+    """Opens each accordion in turn and reads its rendered domains."""
     items = driver.find_elements(By.CSS_SELECTOR, "ul[uk-accordion] > li")
     total = len(items)
 
@@ -79,8 +90,6 @@ def scrape_ggl(driver, output_dir):
         title = li.find_element(By.CSS_SELECTOR, "a.uk-accordion-title")
         company = title.text.strip()
 
-        print(f"[{i+1}/{total}] {company}")
-
         # Open accordion safely
         driver.execute_script(
             "arguments[0].scrollIntoView({block:'center'});", title
@@ -100,31 +109,58 @@ def scrape_ggl(driver, output_dir):
         )
 
         for span in spans:
-            domain = span.text.strip().lower()
-            if domain and "." in domain:
+            domain = normalize_domain(span.text)
+            if domain:
                 urls.add(domain)
 
+        # Close accordion safely
+        safe_click(driver, title)
+        time.sleep(0.2)
+
+        yield company, urls
+
+
+def scrape_ggl(driver, output_dir):
+    wait = WebDriverWait(driver, 20)
+    navigate(driver, URL, "GGL", "whitelist")
+
+    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "ul[uk-accordion] > li")))
+
+    results = []
+    export_count = 0
+    companies_processed = 0
+    path = None
+
+    companies = iter_companies_parsed(driver)
+    if companies is None:
+        print("Accordion contents not rendered, opening each entry...")
+        total = len(driver.find_elements(By.CSS_SELECTOR, "ul[uk-accordion] > li"))
+        companies = iter_companies_clicked(driver, wait)
+    else:
+        total = len(companies)
+
+    for i, (company, urls) in enumerate(companies):
+        print(f"[{i+1}/{total}] {company}")
+
         if urls:
             for u in urls:
                 results.append((company, u))
         else:
             results.append((company, ""))
 
-        # Close accordion safely
-        safe_click(driver, title)
-        time.sleep(0.2)
-
         companies_processed += 1
 
         # Checkpoint export
         if companies_processed % BATCH_SIZE == 0:
             export_count += 1
-            export_excel(results, output_dir, export_count)
+            path = export_excel(results, output_dir, export_count)
 
     # Final fallback export
     if companies_processed % BATCH_SIZE != 0:
         export_count += 1
-        export_excel(results, output_dir, export_count)
+        path = export_excel(results, output_dir, export_count)
+
+    return path
 
 
 def main():
@@ -141,17 +177,48 @@ def main():
         action="store_true",
         help="Attach to Chrome on 127.0.0.1:9222"
     )
+    parser.add_argument(
+        "--fast-start",
+        action="store_true",
+        help="Reuse the cached chromedriver path instead of resolving it online"
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="Print how long each startup phase took"
+    )
+    parser.add_argument(
+        "--page-load",
+        choices=PAGE_LOAD_STRATEGIES,
+        help="Chrome page-load strategy (default: the registry's, see extraction_specs/)"
+    )
+    parser.add_argument(
+        "--index",
+        help="Also load the final export into this cross-registry SQLite index"
+    )
 
+    add_profile_arguments(parser)
     args = parser.parse_args()
-
-    driver = init_driver(attach=args.attach)
+    start_profiling(args, "ggl")
+    startup = StartupTimer()
+    startup.mark("imports + argument parsing")
+
+    driver = init_driver(attach=args.attach, fast_start=args.fast_start, page_load_strategy=args.page_load)
+    startup.mark("driver + browser launch")
+    if args.startup_report:
+        startup.report()
     try:
-        scrape_ggl(driver, args.output)
+        path = scrape_ggl(driver, args.output)
         print("\n✔ Scraping completed successfully.")
+        navigation_report(driver)
     finally:
         if not args.attach:
             driver.quit()
 
+    if args.index and path:
+        from registry_index import import_workbook
+        import_workbook(args.index, path, registry="GGL", replace_registry=True)
+
 
 if __name__ == "__main__":
     main()
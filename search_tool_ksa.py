@@ -1,73 +1,146 @@
 import argparse
-import re
-from playwright.sync_api import sync_playwright
-from openpyxl import Workbook
+import asyncio
+import time
+from urllib.parse import urljoin
 
+from playwright.async_api import async_playwright
+from openpyxl import Workbook
 
-URL = "https://kansspelautoriteit.nl/veilig-spelen/kansspelwijzer/"
+from extraction import get_extractor
+from profiling import add_profile_arguments, start_profiling
+from resilience import Budget, classify_error, parse_phase_timeout
 
 
-def scrape_kansspelwijzer(attach=False):
+URL = "https://kansspelautoriteit.nl/veilig-spelen/kansspelwijzer/"
+DEEP_HEADERS = ["Company", "Website", "Licence", "Licence type", "Valid until"]
+
+
+def nl_domains(domains):
+    # STRICT real .nl domain check
+    return [d for d in domains if d.endswith(".nl")]
+
+
+async def fetch_details(context, urls, budget, workers):
+    """Scrapes the company pages at `urls` on `workers` pages of the context at once.
+
+    Each worker keeps one page and pulls the next URL from a queue, so a slow
+    page only holds up its own worker. Returns {url: fields}.
+    """
+    extractor = get_extractor("KSA")
+    ready = extractor.navigation.get("ready", {}).get("company")
+    todo = asyncio.Queue()
+    for url in urls:
+        todo.put_nowait(url)
+    details = {}
+    failures = []
+    total = todo.qsize()
+
+    async def worker():
+        page = await context.new_page()
+        try:
+            while not todo.empty():
+                url = todo.get_nowait()
+                try:
+                    timeout = budget.timeout("detail") * 1000
+                    await page.goto(url, timeout=timeout, wait_until="domcontentloaded")
+                    if ready:
+                        await page.wait_for_selector(ready, timeout=timeout)
+                    details[url] = extractor.extract("company", await page.content())
+                except Exception as e:
+                    failures.append(classify_error(e))
+                    print(f"Could not read {url}: {e}")
+                done = len(details) + len(failures)
+                if done % 25 == 0 or done == total:
+                    print(f"Company pages: {done}/{total}")
+        finally:
+            await page.close()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(workers, total)))))
+    if failures:
+        kinds = ", ".join(f"{kind} {failures.count(kind)}" for kind in sorted(set(failures)))
+        print(f"{len(failures)} company page(s) failed ({kinds}), their grid rows are kept")
+    return details
+
+
+async def _scrape(attach, budget, deep, workers):
     rows = []
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(
             headless=not attach,
             slow_mo=50 if attach else 0
         )
-        context = browser.new_context()
-        page = context.new_page()
+        context = await browser.new_context()
+        page = await context.new_page()
 
         print("Loading page...")
-        page.goto(URL, timeout=60000, wait_until="domcontentloaded")
-
-        page.wait_for_selector(".grid-element", timeout=60000)
-
-        cards = page.locator(".grid-element")
-        total = cards.count()
-        print(f"Found {total} companies")
-
-        for i in range(total):
-            card = cards.nth(i)
-
-            name_el = card.locator(".grid-title a.siteLink")
-            if name_el.count() == 0:
+        await page.goto(URL, timeout=budget.timeout("page_load") * 1000, wait_until="domcontentloaded")
+
+        try:
+            await page.wait_for_selector(".grid-element", timeout=budget.timeout("page_load") * 1000)
+        except Exception as e:
+            kind = classify_error(e, await page.content())
+            await browser.close()
+            raise RuntimeError(f"Kansspelwijzer grid did not load ({kind}): {e}")
+
+        # One parse of the rendered grid instead of a locator round trip per card
+        companies = get_extractor("KSA").extract("kansspelwijzer", await page.content())["companies"]
+        await page.close()
+        print(f"Found {len(companies)} companies")
+
+        details = {}
+        if deep:
+            for entry in companies:
+                if entry.get("url"):
+                    entry["url"] = urljoin(URL, entry["url"])
+            urls = list(dict.fromkeys(entry["url"] for entry in companies if entry.get("url")))
+            print(f"Deep mode: reading {len(urls)} company pages, {workers} at a time...")
+            started = time.perf_counter()
+            details = await fetch_details(context, urls, budget, workers)
+            print(f"Read {len(details)} company pages in {time.perf_counter() - started:.1f}s")
+
+        for entry in companies:
+            company_name = entry["company"]
+            valid_domains = nl_domains(entry["products"])
+
+            if not deep:
+                if valid_domains:
+                    for domain in valid_domains:
+                        rows.append((company_name, domain))
+                else:
+                    # IMPORTANT: keep company even if no .nl sites
+                    rows.append((company_name, ""))
                 continue
 
-            company_name = name_el.first.text_content().strip()
-
-            product_items = card.locator("ul.products a").all_text_contents()
-
-            valid_domains = []
-
-            for item in product_items:
-                item = item.strip().lower()
+            detail = details.get(entry.get("url")) or {}
+            # Grid products first, then whatever only the company page lists
+            for domain in nl_domains(detail.get("domains") or []):
+                if domain not in valid_domains:
+                    valid_domains.append(domain)
+            licence = (detail.get("licence") or "", detail.get("licence_type") or "", detail.get("valid_until") or "")
+            for domain in valid_domains or [""]:
+                rows.append((company_name, domain, *licence))
 
-                # STRICT real .nl domain check
-                if re.fullmatch(r"[a-z0-9.-]+\.nl", item):
-                    valid_domains.append(item)
+        await browser.close()
 
-            if valid_domains:
-                for domain in valid_domains:
-                    rows.append((company_name, domain))
-            else:
-                # IMPORTANT: keep company even if no .nl sites
-                rows.append((company_name, ""))
+    return rows
 
-        browser.close()
 
-    return rows
+def scrape_kansspelwijzer(attach=False, budget=None, deep=False, workers=6):
+    # One budget for the whole list; the page_load and detail phases cap each wait
+    budget = budget or Budget()
+    return asyncio.run(_scrape(attach, budget, deep, workers))
 
 
-def export_xlsx(rows, filename):
+def export_xlsx(rows, filename, headers=("Company", "Website")):
     wb = Workbook()
     ws = wb.active
     ws.title = "Kansspelwijzer"
 
-    ws.append(["Company", "Website"])
+    ws.append(list(headers))
 
-    for company, site in rows:
-        ws.append([company, site])
+    for row in rows:
+        ws.append(list(row))
 
     wb.save(filename)
 
@@ -75,16 +148,28 @@ def export_xlsx(rows, filename):
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--attach", action="store_true", help="Run with visible browser")
+    parser.add_argument("--index", help="Also load the export into this cross-registry SQLite index")
+    parser.add_argument("--timeout", type=float, help="Time budget for the whole scrape in seconds (default: none)")
+    parser.add_argument("--phase-timeout", type=parse_phase_timeout, action="append", default=[], metavar="PHASE=SECONDS", help="Override a wait cap, e.g. page_load=30 (repeatable)")
+    parser.add_argument("--deep", action="store_true", help="Also read every company page for extra domains and licence data")
+    parser.add_argument("--deep-workers", type=int, default=6, help="Company pages loading at once in --deep mode (default: 6)")
+    add_profile_arguments(parser)
     args = parser.parse_args()
+    start_profiling(args, "ksa")
 
-    rows = scrape_kansspelwijzer(attach=args.attach)
+    rows = scrape_kansspelwijzer(attach=args.attach, budget=Budget(args.timeout, dict(args.phase_timeout)),
+                                 deep=args.deep, workers=max(1, args.deep_workers))
 
     if not rows:
         raise RuntimeError("Scrape finished but returned 0 rows")
 
-    export_xlsx(rows, "KSA_Kansspelwijzer_NL_Websites.xlsx")
+    export_xlsx(rows, "KSA_Kansspelwijzer_NL_Websites.xlsx", DEEP_HEADERS if args.deep else ("Company", "Website"))
     print(f"Exported {len(rows)} rows → KSA_Kansspelwijzer_NL_Websites.xlsx")
 
+    if args.index:
+        from registry_index import import_workbook
+        import_workbook(args.index, "KSA_Kansspelwijzer_NL_Websites.xlsx", registry="KSA", replace_registry=True)
+
 
 if __name__ == "__main__":
     main()
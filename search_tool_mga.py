@@ -2,8 +2,6 @@ import argparse
 import time
 import random
 import urllib.parse
-import re
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -11,9 +9,26 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium_stealth import stealth
-from fake_useragent import UserAgent
+
+from driver_utils import (StartupTimer, add_recycle_arguments, chromedriver_path, dismiss_banner,
+                          fetch_in_tabs, note_navigation, positive_int, recycling_driver, session_state,
+                          warm_up_google)
+from mga_register import BASE_URL, english_url, iter_lookups, lookup_company, parse_licensee
+from navigation import PAGE_LOAD_STRATEGIES, configure_options, navigation_report, ready_selector
+from navigation import navigate as navigate_to  # scrape_*() take a `navigate` flag
+from profile_template import add_template_arguments, clone_profile, ensure_template
+from profiling import add_profile_arguments, start_profiling
+from query_batching import DEFAULT_MAX_QUERY_LEN, run_batched
+from rate_limit import add_rate_arguments, configure as configure_rate_limit, rate_report, throttle
+from records import DomainRecord, LicenceRecord
+from resilience import (DEFAULT_COMPANY_TIMEOUT, PARSE, TIMEOUT, TRIPPING_KINDS, Budget, BudgetExceeded, LookupGuard,
+                        classify_error, classify_page, host_of, page_source, parse_phase_timeout)
+from stream_utils import StreamingWorkbook, count_companies, iter_companies, parse_shard, shard_filename
+from work_queue import DEFAULT_LEASE, finish_worker, start_worker
+
+QUERY_SITE = 'site:authorisation.mga.org.mt'
+QUERY_TEMPLATE = QUERY_SITE + ' "{company}"'
+SERP_HOST = "google.com"
 
 def check_for_captcha(driver):
     """Checks for captcha or 'unusual traffic' and blocks until solved."""
@@ -36,8 +51,10 @@ def human_type(element, text):
         element.send_keys(char)
         time.sleep(random.uniform(0.001, 0.005)) # Ultra-fast typing
 
-def init_driver(debugger_address=None, user_data_dir=None, profile_directory="Default"):
+def init_driver(debugger_address=None, user_data_dir=None, profile_directory="Default", fast_start=False, page_load_strategy=None):
     options = Options()
+    # driver.get() returns once the DOM is parsed; navigate() waits for what the extractor needs
+    configure_options(options, "MGA", page_load_strategy)
     
     if debugger_address:
         # When attaching, we ONLY want the debugger address
@@ -55,13 +72,9 @@ def init_driver(debugger_address=None, user_data_dir=None, profile_directory="De
         print(f"Using persistent browser profile in: {user_data_dir}")
 
         # Standard options for a new browser instance
-        try:
-            ua = UserAgent()
-            # Try to use a very common desktop User Agent
-            user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            options.add_argument(f'--user-agent={user_agent}')
-        except:
-            pass
+        # A very common desktop User Agent
+        user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        options.add_argument(f'--user-agent={user_agent}')
 
         options.add_argument("--disable-gpu")
         options.add_argument("--no-sandbox")
@@ -78,11 +91,12 @@ def init_driver(debugger_address=None, user_data_dir=None, profile_directory="De
         options.add_argument("--disable-notifications")
         options.add_argument("--disable-popup-blocking")
 
-    service = Service(ChromeDriverManager().install())
+    service = Service(chromedriver_path(fast_start))
     driver = webdriver.Chrome(service=service, options=options)
 
     # Only apply stealth if NOT attaching to an existing browser
     if not debugger_address:
+        from selenium_stealth import stealth
         stealth(driver,
             languages=["en-US", "en"],
             vendor="Google Inc.",
@@ -93,49 +107,81 @@ def init_driver(debugger_address=None, user_data_dir=None, profile_directory="De
         )
     return driver
 
-def search_web(driver, query, num_results=30, required_prefix=None, max_pages=10):
+def scrape_licensee(driver, url, navigate=True, budget=None):
+    """Scrapes website list and licence status from an MGA register page."""
+    if navigate:
+        navigate_to(driver, url, "MGA", "licensee", timeout=budget.timeout("detail") if budget else 20)
+    
+    # Check if we landed on a "Selection" page (multiple licensees)
+    # If there's a link with &details=1, follow it
+    try:
+        detail_link = driver.find_element(By.XPATH, "//a[contains(@href, 'details=1')]")
+        if detail_link:
+            print("Found multiple licensees, following detail link...")
+            detail_link.click()
+            note_navigation(driver)
+            random_sleep(0.7, 1.2)
+    except:
+        pass # No detail link, assume we are already on the detail page
+
+    websites, status, company = parse_licensee(driver.page_source)
+
+    if status:
+        print(f"Extracted License Status: {status}")
+    else:
+        print("Warning: Could not extract License Status")
+        if budget:
+            # An error page, or a layout the spec no longer matches
+            budget.fail(classify_page(page_source(driver)) or PARSE, f"no licence status on {url}", host_of(url))
+
+    return LicenceRecord(driver.current_url, status=status, company=company,
+                         domains=[DomainRecord(w) for w in websites])
+
+def search_web(driver, query, num_results=30, required_prefix=None, max_pages=10, max_tabs=4, per_host=2, budget=None):
+    from bs4 import BeautifulSoup
+
+    # Waits take their timeouts from the company's budget; failures are recorded on it
+    budget = budget or Budget()
+
     if required_prefix:
         print(f"Filtering for URLs starting with: {required_prefix}")
     
     # Check for captcha BEFORE starting
     check_for_captcha(driver)
     
-    collected_results = []  # Will store dicts: {'url': ..., 'website': ...}
+    collected_results = []  # LicenceRecords
+    seen_urls = set()
     
     try:
         # Check if we are on Google, otherwise go there
         if "google.com" not in driver.current_url:
-            driver.get("https://www.google.com")
+            navigate_to(driver, "https://www.google.com", "GOOGLE", "home", timeout=budget.timeout("search_box"))
             check_for_captcha(driver)
         
-        # Handle Consent if present (Before doing anything)
-        
-        # Handle Consent if present (Before doing anything)
-        try:
-            consent_button = WebDriverWait(driver, 3).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(., 'Accept all') or contains(., 'I agree')]"))
-            )
+        # Handle Consent if present (Before doing anything); only waited for until this session has seen it
+        if dismiss_banner(driver, "consent", budget.timeout("consent")):
             random_sleep(0.3, 0.6)
-            consent_button.click()
-        except:
-            pass # No consent button found or timeout
 
         # Find search box
+        search_box_wait = budget.timeout("search_box")
         try:
-            search_box = WebDriverWait(driver, 10).until(
+            search_box = WebDriverWait(driver, search_box_wait).until(
                 EC.presence_of_element_located((By.NAME, "q"))
             )
+            throttle(budget)  # Host-wide query rate, shared with the other workers
             search_box.clear() # Clear any existing text
             human_type(search_box, query)
             random_sleep(0.3, 0.8)
             search_box.send_keys(Keys.RETURN)
+            note_navigation(driver)
             
             # Check for captcha AFTER search submission
             random_sleep(0.5, 1.0)
             check_for_captcha(driver)
         except Exception as e:
             print(f"Error finding search box: {e}")
-            return
+            budget.fail(classify_error(e, page_source(driver)), f"search box: {e}", SERP_HOST)
+            return []
 
         pages_checked = 0
 
@@ -155,9 +201,10 @@ def search_web(driver, query, num_results=30, required_prefix=None, max_pages=10
 
             wait_retries = 0
             while wait_retries < 2:
+                results_wait = budget.timeout("results")
                 try:
                     # Try generic result container '#rso' or 'div.g'
-                    WebDriverWait(driver, 5).until(
+                    WebDriverWait(driver, results_wait).until(
                         EC.presence_of_element_located((By.CSS_SELECTOR, "#rso, .g, #search"))
                     )
                     break # Success
@@ -169,6 +216,8 @@ def search_web(driver, query, num_results=30, required_prefix=None, max_pages=10
                         continue
                     else:
                         print(f"Timeout waiting for results on page {pages_checked}. Current Title: {driver.title}")
+                        budget.fail(classify_page(page_source(driver)) or TIMEOUT,
+                                    f"no results on page {pages_checked}", SERP_HOST)
                         break
             
             if wait_retries >= 2:
@@ -178,7 +227,7 @@ def search_web(driver, query, num_results=30, required_prefix=None, max_pages=10
             # Parse current page
             soup = BeautifulSoup(driver.page_source, 'html.parser')
             
-            # Strategy: Collect result URLs matching the prefix (LIMIT TO FIRST ONE)
+            # Strategy: Collect result URLs matching the prefix (only as many as -n asks for)
             all_links = soup.find_all('a', href=True)
             page_urls = []
             
@@ -188,141 +237,44 @@ def search_web(driver, query, num_results=30, required_prefix=None, max_pages=10
                     continue
                 if required_prefix and not href.startswith(required_prefix):
                     continue
-                if any(r['url'] == href for r in collected_results) or href in page_urls:
+                if href in seen_urls or href in page_urls:
                     continue
                 
                 page_urls.append(href)
-                # USER REQUEST: Only look at the first URL found
-                break 
-
-            # Visit the first result page (if any) and scrape websites
-            for url in page_urls:
-                if len(collected_results) >= 1: # USER REQUEST: Only 1 result total
+                # Only take as many as still needed (default -n 1: the first URL found)
+                if len(collected_results) + len(page_urls) >= num_results:
                     break
-                    
+
+            # Scrape the result pages in background tabs; the SERP stays loaded
+            seen_urls.update(page_urls)
+            detail_urls = [english_url(url) for url in page_urls]
+            for url in detail_urls:
                 print(f"Scraping detail page: {url}")
-                try:
-                    search_results_url = driver.current_url
-                    
-                    # Force English for consistent label matching if possible
-                    if "lang=" in url:
-                        url = re.sub(r'lang=[^&]*', 'lang=EN', url)
-                    elif "?" in url:
-                        url += "&lang=EN"
-                    else:
-                        url += "?lang=EN"
-                        
-                    driver.get(url)
-                    random_sleep(0.8, 1.5)
-                    
-                    # Check if we landed on a "Selection" page (multiple licensees)
-                    # If there's a link with &details=1, follow it
-                    try:
-                        detail_link = driver.find_element(By.XPATH, "//a[contains(@href, 'details=1')]")
-                        if detail_link:
-                            print("Found multiple licensees, following detail link...")
-                            detail_link.click()
-                            random_sleep(0.7, 1.2)
-                    except:
-                        pass # No detail link, assume we are already on the detail page
-
-                    detail_soup = BeautifulSoup(driver.page_source, 'html.parser')
-                    websites = []
-                    status = None
-                    
-                    # New: Extract "Status Of Licence:" (Ultra-Precise from HTML screenshot)
-                    status = None
-                    
-                    # 1. Try targeting the specific row class shown in user's developer tools screenshot
-                    status_row = detail_soup.find('tr', class_=lambda c: c and 'license-status' in c)
-                    if status_row:
-                        val_cell = status_row.find('td', class_='seal-content-value')
-                        if val_cell:
-                            status = val_cell.get_text(strip=True)
-                    
-                    # 2. Fallback: Search by text label if row class wasn't found
-                    if not status:
-                        # Find the label tag (UK or US spelling)
-                        label_tag = detail_soup.find(lambda tag: tag.name in ['td', 'th', 'span'] and any(x in tag.get_text() for x in ['Status Of Licence', 'Status Of License']))
-                        
-                        if label_tag:
-                            # Find the closest row and then the value cell
-                            row = label_tag.find_parent('tr')
-                            if row:
-                                val_cell = row.find('td', class_='seal-content-value')
-                                if not val_cell:
-                                    # Just get the last td in this row if class is missing
-                                    tds = row.find_all('td')
-                                    if tds:
-                                        val_cell = tds[-1]
-                                if val_cell:
-                                    status = val_cell.get_text(strip=True)
-                    
-                    if status:
-                        print(f"Extracted License Status: {status}")
-                    else:
-                        print("Warning: Could not extract License Status")
-
-                    # Pattern 1: Look for "Website Urls:" section specifically
-                    label_elem = detail_soup.find(string=re.compile(r'Website Urls:', re.IGNORECASE))
-                    if label_elem:
-                        # Strategy: Look at the parent and siblings for links
-                        parent = label_elem.find_parent()
-                        # Sometimes it's in a <td> and the links are in the next <td>
-                        row = label_elem.find_parent('tr')
-                        if row:
-                            detail_links = row.find_all('a', href=True)
-                        else:
-                            detail_links = parent.find_all('a', href=True)
-                            
-                        for dlink in detail_links:
-                            d_href = dlink.get('href', '').strip()
-                            if d_href.startswith('http') and 'mga.org.mt' not in d_href:
-                                if d_href not in websites:
-                                    websites.append(d_href)
-                    
-                    # Pattern 2: Fallback - any links that don't belong to MGA or infrastructure
-                    if not websites:
-                        potential_links = detail_soup.find_all('a', href=True)
-                        for plink in potential_links:
-                            p_href = plink.get('href', '').strip()
-                            exclude_list = ['mga.org.mt', 'mailto:', 'twitter.com', 'facebook.com', 'linkedin.com', 'instagram.com', 'javascript:']
-                            if p_href.startswith('http') and not any(x in p_href for x in exclude_list):
-                                if p_href not in websites:
-                                    websites.append(p_href)
-
-                    website_str = ", ".join(websites) if websites else None
-                    collected_results.append({
-                        'url': driver.current_url, 
-                        'website': website_str,
-                        'status': status
-                    })
-                    
-                    driver.get(search_results_url)
-                    random_sleep(0.7, 1.2)
-                    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, "q")))
-                except Exception as e:
-                    print(f"Error scraping {url}: {e}")
-                    try:
-                        driver.get(search_results_url)
-                    except:
-                        pass
-                    continue
+            tab_results = fetch_in_tabs(
+                driver, detail_urls,
+                lambda d, u: scrape_licensee(d, u, navigate=False, budget=budget),
+                max_tabs=max_tabs, per_host=per_host, timeout=budget.timeout("detail"),
+                on_error=lambda u, e: budget.fail(classify_error(e), f"{u}: {e}", host_of(u)),
+                ready=ready_selector("MGA", "licensee"),
+            )
+            for url, result in tab_results:
+                if result:
+                    collected_results.append(result)
+
             
             
             # if found_count_on_page == 0:
             #     print("DEBUG: found 0 matching links on this page.")
             
-            if len(collected_results) >= 1:
-                break
-            
-            if len(collected_results) >= 1:
+            if len(collected_results) >= num_results:
                 break
                 
             # Next page
             try:
                 next_button = driver.find_element(By.ID, "pnnext")
+                throttle(budget)  # Each results page is a Google request too
                 next_button.click()
+                note_navigation(driver)
                 random_sleep(0.7, 1.5) # Wait for load with random delay
             except:
                 # Check for "omitted results" link (English and Spanish)
@@ -330,7 +282,9 @@ def search_web(driver, query, num_results=30, required_prefix=None, max_pages=10
                     # Using XPath to support multiple languages
                     omitted_link = driver.find_element(By.XPATH, "//a[contains(., 'omitted results') or contains(., 'resultados omitidos')]")
                     print("Found 'omitted results' link. Clicking to show all results...")
+                    throttle(budget)
                     omitted_link.click()
+                    note_navigation(driver)
                     random_sleep(1.0, 2.5)
                     continue # Continue the outer loop to scrape the new results
                 except:
@@ -344,9 +298,9 @@ def search_web(driver, query, num_results=30, required_prefix=None, max_pages=10
         
         if collected_results:
             for i, result in enumerate(collected_results, 1):
-                print(f"\n{i}. URL: {result['url']}")
-                if result['website']:
-                    print(f"   {result['website']}")
+                print(f"\n{i}. URL: {result.url}")
+                if result.website:
+                    print(f"   {result.website}")
                 else:
                     print(f"   (No certified website pattern found)")
         else:
@@ -356,10 +310,31 @@ def search_web(driver, query, num_results=30, required_prefix=None, max_pages=10
         
         return collected_results
 
+    except BudgetExceeded as e:
+        print(f"Stopping search: {e}")
+        budget.fail(e.kind, str(e))
+        return collected_results
     except Exception as e:
         print(f"An error occurred during search: {e}")
+        budget.fail(classify_error(e), str(e))
         return []
 
+EXPORT_HEADERS = ["MGA - Licencia", "Company", "", "Website", "Certificate URL", "Status"]
+EXPORT_WIDTHS = {'A': 15, 'B': 30, 'C': 5, 'D': 25, 'E': 15, 'F': 15}
+
+def result_rows(company_name, results):
+    """Workbook rows for one company: one per website, or a single placeholder row."""
+    if not results:
+        # Add an empty row if no results found for this company
+        yield ["MGA - Licencia", company_name, "", "", "", ""]
+        return
+    for result in results:
+        for domain in result.domains:
+            yield ["MGA - Licencia", company_name, "", domain.name, result.url, result.status]
+        if not result.domains:
+            # No websites found for this certificate, add one row with empty website
+            yield ["MGA - Licencia", company_name, "", "", result.url, result.status]
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Search for Company Certificates on authorisation.mga.org.mt.")
     parser.add_argument("company", nargs='*', help="The Company Name to search for (or use --file)")
@@ -370,124 +345,224 @@ if __name__ == "__main__":
     parser.add_argument("--attach", action="store_true", help="Attach to an already running Chrome on localhost:9222")
     parser.add_argument("--user-data-dir", type=str, help="Path to your Chrome user data directory for persistent sessions")
     parser.add_argument("--profile", type=str, default="Default", help="Chrome profile directory name (default: Default)")
+    parser.add_argument("--tabs", type=positive_int, default=4, help="Max detail pages loading at once in background tabs (default: 4)")
+    parser.add_argument("--tabs-per-host", type=positive_int, default=2, help="Max concurrent detail tabs per host (default: 2)")
+    parser.add_argument("--batch-queries", action="store_true", help="Pack several companies into one OR query and attribute results back")
+    parser.add_argument("--batch-query-len", type=int, default=DEFAULT_MAX_QUERY_LEN, help=f"Max characters per batched query (default: {DEFAULT_MAX_QUERY_LEN})")
+    parser.add_argument("--native", action="store_true", help="Query the MGA register's own search over HTTP instead of Google")
+    parser.add_argument("--native-workers", type=int, default=4, help="Concurrent register requests in --native mode (default: 4)")
+    parser.add_argument("--index", type=str, help="Also load the results into this cross-registry SQLite index")
+    parser.add_argument("--shard", type=parse_shard, help="Only process shard i of N of --file, e.g. 2/4 (merge with merge_shards.py)")
+    parser.add_argument("--queue", type=str, help="Pull companies from this shared SQLite work queue (seeded from --file if empty)")
+    parser.add_argument("--worker-id", type=str, help="Worker name recorded in the queue (default: host-pid)")
+    parser.add_argument("--lease", type=int, default=DEFAULT_LEASE, help=f"Seconds before a claimed company returns to the queue (default: {DEFAULT_LEASE})")
+    parser.add_argument("--company-timeout", type=float, default=DEFAULT_COMPANY_TIMEOUT, help=f"Time budget per company in seconds (default: {DEFAULT_COMPANY_TIMEOUT})")
+    parser.add_argument("--phase-timeout", type=parse_phase_timeout, action="append", default=[], metavar="PHASE=SECONDS", help="Override one phase's wait cap, e.g. consent=1 (repeatable)")
+    parser.add_argument("--breaker-threshold", type=int, default=5, help="Consecutive timeouts/blocks on a host before its lookups are deferred (default: 5)")
+    parser.add_argument("--breaker-cooldown", type=float, default=120, help="Seconds a tripped host is left alone (default: 120)")
+    parser.add_argument("--page-load", choices=PAGE_LOAD_STRATEGIES, help="Chrome page-load strategy (default: the registry's, see extraction_specs/)")
+    parser.add_argument("--fast-start", action="store_true", help="Reuse the cached chromedriver path instead of resolving it online")
+    parser.add_argument("--startup-report", action="store_true", help="Print how long each startup phase took")
     
+    add_rate_arguments(parser)
+    add_recycle_arguments(parser)
+    add_template_arguments(parser)
+    add_profile_arguments(parser)
     args = parser.parse_args()
+    start_profiling(args, "mga")
+    configure_rate_limit(args)
+    startup = StartupTimer()
+    startup.mark("imports + argument parsing")
     
     # Determine company list
     companies = []
     start_time = time.time() # Record start time
     
     if args.file:
-        # Read from file
+        # Names are streamed from the file; only the count is taken up front
         try:
-            with open(args.file, 'r', encoding='utf-8') as f:
-                companies = [line.strip() for line in f if line.strip()]
-            print(f"Loaded {len(companies)} companies from {args.file}")
+            total = count_companies(args.file, args.shard)
+            companies = iter_companies(args.file, args.shard)
+            print(f"Loaded {total} companies from {args.file}")
         except FileNotFoundError:
             print(f"Error: File '{args.file}' not found.")
             exit(1)
     elif args.company:
         # Single company from command line
         companies = [" ".join(args.company)]
+        total = 1
+    elif args.queue:
+        # Companies come from the queue
+        total = 0
     else:
         print("Error: Please provide a company name or use --file to specify an input file.")
         parser.print_help()
         exit(1)
     
-    # Batch processing
-    all_results = {}  # {company_name: [{'url': ..., 'website': ...}, ...]}
+    if args.shard and not args.file:
+        print("Error: --shard splits a --file input, it cannot be used with a single company.")
+        exit(1)
+
+    queue_worker = None
+    if args.queue:
+        if args.batch_queries or args.native:
+            print("Error: --queue hands out one company at a time and cannot be combined with --batch-queries or --native.")
+            exit(1)
+        queue_worker = start_worker(args.queue, "MGA", file=args.file, shard=args.shard,
+                                    worker_id=args.worker_id, lease_seconds=args.lease)
+        companies = queue_worker
+        total = sum(queue_worker.queue.counts().values())
+
+    import os
+    output_dir = args.output
+    os.makedirs(output_dir, exist_ok=True)
+    excel_file = os.path.join(output_dir, shard_filename("certificates.xlsx", args.shard))
+    if queue_worker:
+        # Each worker keeps its own rows; the combined workbook is rebuilt from the queue
+        excel_file = os.path.join(output_dir, f"certificates_{queue_worker.worker_id}.xlsx")
+
+    # Rows are written as each company finishes, nothing is kept per run
+    # Whichever mode finishes a company first, its rows mark time-to-first-result
+    writer = StreamingWorkbook(excel_file, "Certificates", EXPORT_HEADERS, EXPORT_WIDTHS,
+                               on_first_rows=lambda: startup.first_result(args.startup_report))
+    processed = 0
+
+    # Queue workers and batched queries wait out a tripped breaker instead of deferring
+    guard = LookupGuard(
+        (host_of(BASE_URL),) if args.native else (SERP_HOST, host_of(args.filter)),
+        company_timeout=args.company_timeout, phase_timeouts=dict(args.phase_timeout),
+        threshold=args.breaker_threshold, cooldown=args.breaker_cooldown,
+        defer=not (queue_worker or args.batch_queries),
+    )
     
-    driver = None
-    try:
-        if args.attach:
-            print("Connecting to existing Chrome on localhost:9222...")
-            driver = init_driver(debugger_address="127.0.0.1:9222")
-        else:
-            driver = init_driver(user_data_dir=args.user_data_dir, profile_directory=args.profile)
+    if args.native:
+        print("Native mode: querying the MGA register directly (no Google, no browser)")
+        try:
+            for company_name, results in iter_lookups(companies, num_results=args.num,
+                                                      workers=args.native_workers, total=total, guard=guard):
+                writer.extend(result_rows(company_name, results))
+                processed += 1
+            for company_name, results in guard.retry_deferred(
+                    lambda company, budget: lookup_company(company, args.num, budget=budget)):
+                writer.extend(result_rows(company_name, results))
+                processed += 1
+        finally:
+            writer.close()
+            guard.report()
+    else:
+        driver = None
+        recycler = None
+        try:
+            # A fresh in-memory copy of the template per browser instead of the persistent profile
+            template = None
+            if args.profile_template and not args.attach:
+                template = ensure_template(init_driver, args.profile_template, profile_directory=args.profile,
+                                           fast_start=args.fast_start, page_load_strategy=args.page_load)
+            if args.attach:
+                print("Connecting to existing Chrome on localhost:9222...")
+                driver = init_driver(debugger_address="127.0.0.1:9222", fast_start=args.fast_start, page_load_strategy=args.page_load)
+            elif args.recycle_after or args.recycle_rss:
+                recycler = recycling_driver(init_driver, args.user_data_dir or os.path.join(os.getcwd(), "chrome_profile"),
+                                            args.recycle_after, args.recycle_rss, warm_up=warm_up_google, template=template,
+                                            profile_directory=args.profile, fast_start=args.fast_start, page_load_strategy=args.page_load)
+                driver = recycler.driver
+                guard.before_lookup = recycler.checkpoint
+            else:
+                driver = init_driver(user_data_dir=clone_profile(template) if template else args.user_data_dir, profile_directory=args.profile, fast_start=args.fast_start, page_load_strategy=args.page_load)
+            startup.mark("driver + browser launch")
         
-        for idx, company_name in enumerate(companies, 1):
-            print(f"\n[{idx}/{len(companies)}] Processing: {company_name}")
-            print("=" * 60)
-            
-            # Construct specific query: site:authorisation.mga.org.mt "Company Name"
-            full_query = f'site:authorisation.mga.org.mt "{company_name}"'
+            if args.batch_queries:
+                def between_batches(batch_idx):
+                    # PERIODIC PAUSE: Every 5 queries, take a longer breather to evade detection
+                    if batch_idx % 5 == 0:
+                        pause_time = random.uniform(5.0, 8.0)
+                        print(f"\n[STEALTH] Periodic breather: Sleeping for {pause_time:.1f}s...")
+                        time.sleep(pause_time)
+                    random_sleep(0.3, 0.8)
+
+                batched = run_batched(
+                    companies, QUERY_SITE,
+                    lambda query, num: guard.run(query, lambda budget: search_web(
+                        driver, query, num_results=num, required_prefix=args.filter,
+                        max_tabs=args.tabs, per_host=args.tabs_per_host, budget=budget))[0],
+                    per_company=args.num, max_query_len=args.batch_query_len, between=between_batches,
+                )
+                for company_name, results in batched:
+                    writer.extend(result_rows(company_name, results))
+                    processed += 1
+                    print(f"Found {len(results)} result(s) for {company_name}")
+            else:
+                def lookup(company_name, budget):
+                    # Construct specific query: site:authorisation.mga.org.mt "Company Name"
+                    full_query = QUERY_TEMPLATE.format(company=company_name)
+                    return search_web(driver, full_query, num_results=args.num, required_prefix=args.filter,
+                                      max_tabs=args.tabs, per_host=args.tabs_per_host, budget=budget)
+
+                for idx, company_name in enumerate(companies, 1):
+                    print(f"\n[{idx}/{total}] Processing: {company_name}")
+                    print("=" * 60)
             
-            # Run search
-            results = search_web(driver, full_query, num_results=args.num, required_prefix=args.filter)
-            all_results[company_name] = results if results else []
+                    # Run search under the company's time budget and the hosts' breakers
+                    results, failure = guard.run(company_name, lambda budget: lookup(company_name, budget))
+                    if results is None:
+                        continue  # Deferred while the registry's breaker is open, retried below
+                    if queue_worker and failure in TRIPPING_KINDS:
+                        print(f"Returning {company_name} to the queue ({failure})")
+                        queue_worker.failed(failure)
+                        continue
+                    writer.extend(result_rows(company_name, results))
+                    if queue_worker:
+                        queue_worker.done(results)
+                    processed += 1
             
-            print(f"Found {len(all_results[company_name])} result(s) for {company_name}")
+                    print(f"Found {len(results)} result(s) for {company_name}")
             
-            # PERIODIC PAUSE: Every 5 companies, take a longer breather to evade detection
-            if idx % 5 == 0 and idx < len(companies):
-                pause_time = random.uniform(5.0, 8.0)
-                print(f"\n[STEALTH] Periodic breather: Sleeping for {pause_time:.1f}s...")
-                time.sleep(pause_time)
+                    # PERIODIC PAUSE: Every 5 companies, take a longer breather to evade detection
+                    if idx % 5 == 0 and idx < total:
+                        pause_time = random.uniform(5.0, 8.0)
+                        print(f"\n[STEALTH] Periodic breather: Sleeping for {pause_time:.1f}s...")
+                        time.sleep(pause_time)
             
-            # Small random pause between companies if more than one
-            if idx < len(companies):
-                random_sleep(0.3, 0.8)
-    finally:
-        if driver and not args.attach:
-            print("Closing Chrome...")
-            driver.quit()
-        elif driver:
-            print("Leaving Chrome open (attached mode).")
-    
-    # Export to files
-    import os
-    output_dir = args.output_dir
-    os.makedirs(output_dir, exist_ok=True)
-    
-    excel_file = os.path.join(output_dir, "certificates.xlsx")
-    
-    # Create Excel workbook
-    from openpyxl import Workbook
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Certificates"
-    
-    # Set up headers
-    headers = ["MGA - Licencia", "Company", "", "Website", "Certificate URL", "Status"]
-    ws.append(headers)
-    
-    # Add data rows
-    for company_name, results in all_results.items():
-        if not results:
-            # Add an empty row if no results found for this company
-            ws.append(["MGA - Licencia", company_name, "", "", "", ""])
-        else:
-            for result in results:
-                url = result['url']
-                website_data = result['website']
-                status = result.get('status', '')
-                
-                if website_data:
-                    # Split comma-separated websites and add a row for each
-                    websites = [s.strip() for s in website_data.split(',')]
-                    for web in websites:
-                        ws.append(["MGA - Licencia", company_name, "", web, url, status])
-                else:
-                    # No websites found for this certificate, add one row with empty website
-                    ws.append(["MGA - Licencia", company_name, "", "", url, status])
-    
-    # Adjust column widths
-    ws.column_dimensions['A'].width = 15
-    ws.column_dimensions['B'].width = 30
-    ws.column_dimensions['C'].width = 5  # Empty column
-    ws.column_dimensions['D'].width = 25
-    ws.column_dimensions['E'].width = 15
-    ws.column_dimensions['F'].width = 15  # Status column
+                    # Small random pause between companies if more than one
+                    if idx < total:
+                        random_sleep(0.3, 0.8)
+
+                for company_name, results in guard.retry_deferred(lookup):
+                    writer.extend(result_rows(company_name, results))
+                    processed += 1
+                    print(f"Found {len(results)} result(s) for {company_name}")
+            guard.report()
+            rate_report()
+            session_state(driver).report()
+            if recycler:
+                recycler.report()
+            navigation_report(driver)
+        finally:
+            if recycler:
+                print("Closing Chrome...")
+                recycler.close()
+            elif driver and not args.attach:
+                print("Closing Chrome...")
+                driver.quit()
+            elif driver:
+                print("Leaving Chrome open (attached mode).")
+            writer.close()
+
+    if queue_worker:
+        combined = finish_worker(queue_worker, os.path.join(output_dir, "certificates.xlsx"),
+                                 EXPORT_HEADERS, EXPORT_WIDTHS, result_rows)
+        if combined:
+            excel_file = combined
     
-    # Save workbook
-    wb.save(excel_file)
+    if args.index:
+        from registry_index import import_workbook
+        import_workbook(args.index, excel_file, registry="MGA")
     
     print("\n" + "=" * 60)
     print("EXPORT COMPLETE")
     print("=" * 60)
     print(f"Excel file saved to: {excel_file}")
-    print(f"Total companies processed: {len(companies)}")
+    print(f"Total companies processed: {processed}")
     
     # Calculate and print total duration
     end_time = time.time()
@@ -1,7 +1,6 @@
 import argparse
 import time
 import os
-import re
 
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -10,15 +9,19 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
-from webdriver_manager.chrome import ChromeDriverManager
-from openpyxl import Workbook
+from domain_utils import extract_domains
+from driver_utils import StartupTimer, chromedriver_path
+from extraction import get_extractor
+from navigation import PAGE_LOAD_STRATEGIES, configure_options, navigate, navigation_report
+from profiling import add_profile_arguments, start_profiling
 
 URL = "https://www.spillemyndigheden.dk/tilladelsesindehavere/print"
 BATCH_SIZE = 15
 
 
-def init_driver(attach=False):
+def init_driver(attach=False, fast_start=False, page_load_strategy=None):
     options = Options()
+    configure_options(options, "SGA", page_load_strategy)
     options.add_argument("--start-maximized")
     options.add_argument("--disable-blink-features=AutomationControlled")
 
@@ -27,12 +30,14 @@ def init_driver(attach=False):
         return webdriver.Chrome(options=options)
 
     return webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
+        service=Service(chromedriver_path(fast_start)),
         options=options
     )
 
 
 def export_excel(rows, output_dir, export_number):
+    from openpyxl import Workbook
+
     os.makedirs(output_dir, exist_ok=True)
     filename = f"spillemyndigheden_whitelist_{export_number}.xlsx"
     path = os.path.join(output_dir, filename)
@@ -51,70 +56,35 @@ def export_excel(rows, output_dir, export_number):
 
     wb.save(path)
     print(f"✔ Exported → {path}")
+    return path
 
 
 def extract_domains_from_text(text):
     """
     Extract domains from plain text (fallback).
     """
-    if not text:
-        return set()
-
-    pattern = r"\b(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,}\b"
-    return set(m.group(0).lower() for m in re.finditer(pattern, text))
+    return set(extract_domains(text))
 
 
 def scrape_spillemyndigheden(driver, output_dir):
     wait = WebDriverWait(driver, 20)
-    driver.get(URL)
+    navigate(driver, URL, "SGA", "licence_holders")
 
     wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "table")))
 
     rows_data = []
     export_count = 0
     companies_processed = 0
+    path = None
+
+    # One parse of the rendered table instead of a WebDriver call per cell
+    holders = get_extractor("SGA").extract("licence_holders", driver.page_source)["companies"]
 
-    table_rows = driver.find_elements(By.CSS_SELECTOR, "table tr")
-
-    # Skip header row
-    for row in table_rows[1:]:
-        cells = row.find_elements(By.TAG_NAME, "td")
-        if not cells:
-            continue
-
-        company = cells[0].text.strip()
-        websites_cell = cells[3]
-
-        urls = set()
-
-        # 1️⃣ Real links (if present)
-        links = websites_cell.find_elements(By.CSS_SELECTOR, "a[href]")
-        for a in links:
-            href = a.get_attribute("href")
-            if href:
-                clean = (
-                    href.replace("https://", "")
-                        .replace("http://", "")
-                        .replace("www.", "")
-                        .rstrip("/")
-                        .lower()
-                )
-                urls.add(clean)
-
-        # 2️⃣ Plain text, comma-separated domains
-        raw_text = websites_cell.text.strip()
-        if raw_text:
-            parts = [p.strip() for p in raw_text.split(",")]
-            for part in parts:
-                clean = (
-                    part.replace("https://", "")
-                        .replace("http://", "")
-                        .replace("www.", "")
-                        .rstrip("/")
-                        .lower()
-                )
-                if "." in clean:
-                    urls.add(clean)
+    for holder in holders:
+        company = holder["company"]
+
+        # 1️⃣ Real links (if present) + 2️⃣ plain text, comma-separated domains
+        urls = set(holder["links"]) | set(holder["text_domains"])
 
         if urls:
             for u in urls:
@@ -127,12 +97,14 @@ def scrape_spillemyndigheden(driver, output_dir):
 
         if companies_processed % BATCH_SIZE == 0:
             export_count += 1
-            export_excel(rows_data, output_dir, export_count)
+            path = export_excel(rows_data, output_dir, export_count)
 
     # Final fallback export
     if companies_processed % BATCH_SIZE != 0:
         export_count += 1
-        export_excel(rows_data, output_dir, export_count)
+        path = export_excel(rows_data, output_dir, export_count)
+
+    return path
 
 
 def main():
@@ -149,17 +121,48 @@ def main():
         action="store_true",
         help="Attach to Chrome on 127.0.0.1:9222"
     )
+    parser.add_argument(
+        "--fast-start",
+        action="store_true",
+        help="Reuse the cached chromedriver path instead of resolving it online"
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="Print how long each startup phase took"
+    )
+    parser.add_argument(
+        "--page-load",
+        choices=PAGE_LOAD_STRATEGIES,
+        help="Chrome page-load strategy (default: the registry's, see extraction_specs/)"
+    )
+    parser.add_argument(
+        "--index",
+        help="Also load the final export into this cross-registry SQLite index"
+    )
 
+    add_profile_arguments(parser)
     args = parser.parse_args()
-
-    driver = init_driver(attach=args.attach)
+    start_profiling(args, "sga")
+    startup = StartupTimer()
+    startup.mark("imports + argument parsing")
+
+    driver = init_driver(attach=args.attach, fast_start=args.fast_start, page_load_strategy=args.page_load)
+    startup.mark("driver + browser launch")
+    if args.startup_report:
+        startup.report()
     try:
-        scrape_spillemyndigheden(driver, args.output)
+        path = scrape_spillemyndigheden(driver, args.output)
         print("\n✔ Scraping completed successfully.")
+        navigation_report(driver)
     finally:
         if not args.attach:
             driver.quit()
 
+    if args.index and path:
+        from registry_index import import_workbook
+        import_workbook(args.index, path, registry="SGA", replace_registry=True)
+
 
 if __name__ == "__main__":
     main()
@@ -4,7 +4,9 @@ import random
 import urllib.parse
 import re
 import difflib
-from bs4 import BeautifulSoup
+import os
+import queue
+import threading
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -12,9 +14,23 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium_stealth import stealth
-from fake_useragent import UserAgent
+
+from domain_utils import normalize_domain, strip_public_suffix
+from driver_utils import (StartupTimer, add_recycle_arguments, chromedriver_path, dismiss_banner,
+                          fetch_in_tabs, note_navigation, positive_int, recycling_driver, session_state,
+                          warm_up_google)
+from extraction import get_extractor
+from navigation import PAGE_LOAD_STRATEGIES, configure_options, navigation_report, ready_selector
+from navigation import navigate as navigate_to  # scrape_*() take a `navigate` flag
+from profile_template import add_template_arguments, clone_profile, ensure_template
+from profiling import add_profile_arguments, start_profiling
+from query_batching import DEFAULT_MAX_QUERY_LEN, run_batched
+from rate_limit import add_rate_arguments, configure as configure_rate_limit, rate_report, throttle
+from records import DomainRecord, LicenceRecord
+from resilience import (DEFAULT_COMPANY_TIMEOUT, PARSE, TIMEOUT, TRIPPING_KINDS, Budget, BudgetExceeded, LookupGuard,
+                        classify_error, classify_page, host_of, page_source, parse_phase_timeout)
+from stream_utils import StreamingWorkbook, count_companies, iter_companies, parse_shard, shard_filename
+from work_queue import DEFAULT_LEASE, finish_worker, start_worker
 
 def check_for_captcha(driver):
     """Checks for captcha or 'unusual traffic' and blocks until solved."""
@@ -37,8 +53,10 @@ def human_type(element, text):
         element.send_keys(char)
         time.sleep(random.uniform(0.001, 0.005)) # Ultra-fast typing
 
-def init_driver(debugger_address=None, user_data_dir=None, profile_directory="Default"):
+def init_driver(debugger_address=None, user_data_dir=None, profile_directory="Default", fast_start=False, page_load_strategy=None):
     options = Options()
+    # driver.get() returns once the DOM is parsed; navigate() waits for what the extractor needs
+    configure_options(options, "UKGC", page_load_strategy)
     
     if debugger_address:
         # When attaching, we ONLY want the debugger address
@@ -56,13 +74,9 @@ def init_driver(debugger_address=None, user_data_dir=None, profile_directory="De
         print(f"Using persistent browser profile in: {user_data_dir}")
 
         # Standard options for a new browser instance
-        try:
-            ua = UserAgent()
-            # Try to use a very common desktop User Agent
-            user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            options.add_argument(f'--user-agent={user_agent}')
-        except:
-            pass
+        # A very common desktop User Agent
+        user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        options.add_argument(f'--user-agent={user_agent}')
 
         options.add_argument("--disable-gpu")
         options.add_argument("--no-sandbox")
@@ -79,11 +93,12 @@ def init_driver(debugger_address=None, user_data_dir=None, profile_directory="De
         options.add_argument("--disable-notifications")
         options.add_argument("--disable-popup-blocking")
 
-    service = Service(ChromeDriverManager().install())
+    service = Service(chromedriver_path(fast_start))
     driver = webdriver.Chrome(service=service, options=options)
 
     # Only apply stealth if NOT attaching to an existing browser
     if not debugger_address:
+        from selenium_stealth import stealth
         stealth(driver,
             languages=["en-US", "en"],
             vendor="Google Inc.",
@@ -94,284 +109,404 @@ def init_driver(debugger_address=None, user_data_dir=None, profile_directory="De
         )
     return driver
 
-def search_web(driver, query, num_results=30, required_prefix=None, max_pages=10):
-    if required_prefix:
-        print(f"Filtering for URLs starting with: {required_prefix}")
-        print("-" * 40)
-    
+DETAIL_BASE_URL = "https://www.gamblingcommission.gov.uk/public-register/business/detail"
+QUERY_SITE = 'site:gamblingcommission.gov.uk/public-register/business/detail'
+QUERY_TEMPLATE = QUERY_SITE + ' "{company}"'
+SERP_HOST = "google.com"
+
+def business_id_from_url(url):
+    """Extracts the business ID from /detail/123 or /detail/<sub-page>/123 URLs."""
+    id_match = re.search(r'/detail/(?:[^/]+/)?(\d+)', url or "")
+    return id_match.group(1) if id_match else None
+
+def submit_search(driver, query, budget=None):
+    """Opens Google if needed, handles consent and submits the query. Returns False on failure."""
+    budget = budget or Budget()
     # Check for captcha BEFORE starting
     check_for_captcha(driver)
-    
-    collected_results = []  # Will store dicts: {'url': ..., 'website': ...}
-    
+
     try:
         # Check if we are on Google, otherwise go there
         if "google.com" not in driver.current_url:
-            driver.get("https://www.google.com")
+            navigate_to(driver, "https://www.google.com", "GOOGLE", "home", timeout=budget.timeout("search_box"))
             check_for_captcha(driver)
         
-        # Handle Consent if present (Before doing anything)
-        try:
-            consent_button = WebDriverWait(driver, 3).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(., 'Accept all') or contains(., 'I agree')]"))
-            )
+        # Handle Consent if present (Before doing anything); only waited for until this session has seen it
+        if dismiss_banner(driver, "consent", budget.timeout("consent")):
             random_sleep(0.5, 1.0)
-            consent_button.click()
-        except:
-            pass # No consent button found or timeout
 
         # Find search box
+        search_box_wait = budget.timeout("search_box")
         try:
-            search_box = WebDriverWait(driver, 10).until(
+            search_box = WebDriverWait(driver, search_box_wait).until(
                 EC.presence_of_element_located((By.NAME, "q"))
             )
+            throttle(budget)  # Host-wide query rate, shared with the other workers
             search_box.clear() # Clear any existing text
             human_type(search_box, query)
             random_sleep(0.5, 1.5)
             search_box.send_keys(Keys.RETURN)
+            note_navigation(driver)
             
             # Check for captcha AFTER search submission
             random_sleep(1.0, 2.0)
             check_for_captcha(driver)
         except Exception as e:
             print(f"Error finding search box: {e}")
-            return
+            budget.fail(classify_error(e, page_source(driver)), f"search box: {e}", SERP_HOST)
+            return False
     except Exception as e:
         print(f"An error occurred: {e}")
+        budget.fail(classify_error(e), str(e), SERP_HOST)
+        return False
+    return True
+
+def serp_matching_urls(driver, required_prefix=None, exclude=(), limit=None, budget=None):
+    """Waits for the current SERP and returns result URLs matching the prefix, in page order."""
+    from bs4 import BeautifulSoup
+
+    budget = budget or Budget()
+    # TURBO: Redacted "Waiting for results" sleep - we just wait for the element
+    wait_retries = 0
+    while wait_retries < 2:
+        results_wait = budget.timeout("results")
+        try:
+            WebDriverWait(driver, results_wait).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "#rso, .g, #search"))
+            )
+            break
+        except:
+            if check_for_captcha(driver):
+                wait_retries += 1
+                continue
+            else:
+                budget.fail(classify_page(page_source(driver)) or TIMEOUT, "no search results", SERP_HOST)
+                break
+
+    soup = BeautifulSoup(driver.page_source, 'html.parser')
+    page_urls = []
+    for link in soup.find_all('a', href=True):
+        href = link.get('href')
+        if not href.startswith('http') or 'google.com' in href or 'google.co' in href:
+            continue
+        if required_prefix and not href.startswith(required_prefix):
+            continue
+        if href in exclude or href in page_urls:
+            continue
+        page_urls.append(href)
+        if limit and len(page_urls) >= limit:
+            break
+    return page_urls
+
+def next_serp_page(driver, budget=None):
+    """Clicks Google's next-page link. Returns False when there is none."""
+    # Next page (simplified for core logic)
+    try:
+        next_button = driver.find_element(By.ID, "pnnext")
+        throttle(budget)  # Each results page is a Google request too
+        next_button.click()
+        note_navigation(driver)
+        return True
+    except:
+        return False
+
+def scrape_business(driver, url, navigate=True, budget=None):
+    """Scrapes licence statuses, trading names and domains for one UKGC business page."""
+    budget = budget or Budget()
+    if navigate:
+        navigate_to(driver, url, "UKGC", "summary", timeout=budget.timeout("detail"))
+    
+    # UKGC Detail Page Scrape
+    # 0. Handle Cookie Banner (only waited for on the first register page of the session)
+    if dismiss_banner(driver, "cookie_banner", budget.timeout("cookie_banner")):
+        random_sleep(0.5, 1.0)
+
+    # 0.5 Ensure we are on the Licence summary page (Fallback if landed on Premises, etc.)
+    try:
+        current_url = driver.current_url
+        # Extract ID: handles /detail/123 or /detail/premises/123
+        business_id = business_id_from_url(current_url)
+        if business_id:
+            # If the URL is longer than the base detail URL, it's a sub-page
+            base_detail_url = f"{DETAIL_BASE_URL}/{business_id}"
+            if current_url.rstrip('/') != base_detail_url:
+                print(f"Landed on sub-page, jumping to Licence summary: {base_detail_url}")
+                navigate_to(driver, base_detail_url, "UKGC", "summary", timeout=budget.timeout("detail"))
+        else:
+            # Fallback click if regex fails
+            summary_tab = driver.find_elements(By.XPATH, "//a[contains(text(), 'Licence summary')]")
+            if summary_tab:
+                driver.execute_script("arguments[0].click();", summary_tab[0])
+                random_sleep(1.0, 2.0)
+    except Exception as e:
+        print(f"Fallback navigation to summary failed: {e}")
+
+    extractor = get_extractor("UKGC")
+    summary = extractor.extract("summary", driver.page_source)
+
+    # Business name, used to attribute results of batched queries
+    company = summary["company"]
+    if not company:
+        # A missing business name means an error page or a layout the spec no longer matches
+        budget.fail(classify_page(page_source(driver)) or PARSE, f"no business name on {url}", host_of(url))
+
+    # 1. Extract Statuses from Summary Table
+    status_counts = {}
+    for licence in summary["licences"]:
+        status_text = licence["status"]
+        status_counts[status_text] = status_counts.get(status_text, 0) + 1
+    
+    # Sort for consistent display
+    sorted_statuses = sorted(status_counts.items(), key=lambda x: x[1], reverse=True)
+    formatted_status = ", ".join([f"{count}x {status}" for status, count in sorted_statuses])
+    if not formatted_status:
+        formatted_status = "No status found"
+    print(f"Extracted formatted status: {formatted_status}")
+    print("-" * 40)
+    
+    # 1.5 Extract Trading Names for Brand Mapping
+    trading_names = []
+    try:
+        current_url = driver.current_url
+        business_id = current_url.split('/')[-1]
+        if business_id.isdigit():
+            trading_url = f"{DETAIL_BASE_URL}/trading-names/{business_id}"
+            print(f"Turbo: Fetching trading names from: {trading_url}")
+            navigate_to(driver, trading_url, "UKGC", "trading_names", timeout=budget.timeout("detail"))
+            
+            trading = extractor.extract("trading_names", driver.page_source)
+            trading_names = [r["name"] for r in trading["names"]]
+            print(f"Found {len(trading_names)} total trading names (including inactive).")
+            print("-" * 40)
+            # Return to summary to get ID correctly if needed, or just stay on detail/trading-names
+            # The domain logic below also uses the ID
+    except Exception as e:
+        print(f"Could not extract trading names: {e}")
+
+    # 2. Extract Domains (TURBO: Direct URL Navigation)
+    websites = []
+    tables_wait = budget.timeout("tables")
+    try:
+        # Extract business ID from current URL
+        # Format: .../detail/39372 or .../detail/domain-names/39372
+        current_url = driver.current_url
+        business_id = current_url.split('/')[-1]
+        
+        if business_id.isdigit():
+            domain_url = f"{DETAIL_BASE_URL}/domain-names/{business_id}"
+            print(f"Turbo: Jumping directly to domains: {domain_url}")
+            navigate_to(driver, domain_url, "UKGC", "domain_names", timeout=budget.timeout("detail"))
+        else:
+            # Fallback to clicking if ID extraction fails
+            print("Clicking 'Domain names' tab (fallback)...")
+            domain_link_xpath = "//a[contains(@class, 'gc-vertical-nav__link') and contains(normalize-space(.), 'Domain names')]"
+            domain_button = WebDriverWait(driver, tables_wait).until(
+                EC.element_to_be_clickable((By.XPATH, domain_link_xpath))
+            )
+            driver.execute_script("arguments[0].click();", domain_button)
+            random_sleep(1.0, 1.8) # Wait for page/tables load
+        
+        # 2.5 Parse domains (Handle cases with zero domains)
+        try:
+            # Check if "No domain names have been recorded" message exists
+            no_domains_text = "No domain names have been recorded for this business"
+            if no_domains_text in driver.page_source:
+                print("No domain names recorded for this business.")
+            else:
+                # Only wait for tables if the "No domain names" message is NOT present
+                WebDriverWait(driver, tables_wait).until(EC.presence_of_element_located((By.CLASS_NAME, "govuk-table")))
+                
+                domain_rows = extractor.extract("domain_names", driver.page_source)["domains"]
+                for row in domain_rows:
+                    domain_name = row["name"]
+                    status_val = row["status"] or ""
+                    # Best Match Logic
+                    best_brand = ""
+                    clean_domain = normalize_domain(domain_name) or domain_name.split('/')[0].lower()
+                    # Remove the public suffix for matching
+                    match_domain = strip_public_suffix(clean_domain).replace('.', '')
+                    
+                    if trading_names:
+                        # 1. Substring match
+                        for brand in trading_names:
+                            clean_brand = brand.replace(' ', '')
+                            if clean_brand in match_domain or match_domain in clean_brand:
+                                best_brand = brand.title()
+                                break
+                    
+                        # 2. Fuzzy match if no substring match
+                        if not best_brand:
+                            matches = difflib.get_close_matches(match_domain, trading_names, n=1, cutoff=0.6)
+                            if matches:
+                                best_brand = matches[0].title()
+                            else:
+                                best_brand = ""
+                    
+                    websites.append(DomainRecord(domain_name, status_val, best_brand))
+        except Exception as e:
+            # Only print the short error to keep the console clean
+            print(f"Note: Could not parse domains (usually means none listed).")
+        print(f"Found {len(websites)} domain names total.")
+        print("-" * 40)
+    except Exception as e:
+        print(f"Could not extract domains: {e}")
+
+    return LicenceRecord(url, status=formatted_status, company=company, domains=websites)
+
+def find_detail_urls(driver, query, num_results=1, required_prefix=None, max_pages=10, budget=None):
+    """Search stage only: returns up to num_results register URLs without visiting them."""
+    if not submit_search(driver, query, budget):
         return []
 
-    # Parse results
+    detail_urls = []
     pages_checked = 0
-    while len(collected_results) < num_results and pages_checked < max_pages:
+    while len(detail_urls) < num_results and pages_checked < max_pages:
         pages_checked += 1
-        # TURBO: Redacted "Waiting for results" sleep - we just wait for the element
-        
-        wait_retries = 0
-        while wait_retries < 2:
-            try:
-                WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "#rso, .g, #search"))
-                )
-                break
-            except:
-                if check_for_captcha(driver):
-                    wait_retries += 1
-                    continue
-                else: break
+        detail_urls.extend(serp_matching_urls(driver, required_prefix, exclude=detail_urls,
+                                              limit=num_results - len(detail_urls), budget=budget))
+        if len(detail_urls) >= num_results or not next_serp_page(driver, budget):
+            break
+    return detail_urls
 
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        all_links = soup.find_all('a', href=True)
-        page_urls = []
-        
-        for link in all_links:
-            href = link.get('href')
-            if not href.startswith('http') or 'google.com' in href or 'google.co' in href:
-                continue
-            if required_prefix and not href.startswith(required_prefix):
-                continue
-            if any(r['url'] == href for r in collected_results) or href in page_urls:
-                continue
-            page_urls.append(href)
-            break # First one only
+def search_web(driver, query, num_results=30, required_prefix=None, max_pages=10, max_tabs=4, per_host=2, budget=None):
+    # Waits take their timeouts from the company's budget; failures are recorded on it
+    budget = budget or Budget()
+    if required_prefix:
+        print(f"Filtering for URLs starting with: {required_prefix}")
+        print("-" * 40)
+    
+    collected_results = []  # LicenceRecords
+    seen_urls = []
+
+    if not submit_search(driver, query, budget):
+        return []
+
+    # Parse results
+    pages_checked = 0
+    try:
+        while len(collected_results) < num_results and pages_checked < max_pages:
+            pages_checked += 1
+
+            # Only as many as still needed (default -n 1: the first one)
+            page_urls = serp_matching_urls(driver, required_prefix, exclude=seen_urls,
+                                           limit=num_results - len(collected_results), budget=budget)
+            seen_urls.extend(page_urls)
+
+            # Scrape the register pages in background tabs; the SERP stays loaded
+            for url in page_urls:
+                print(f"Scraping detail page: {url}")
+            tab_results = fetch_in_tabs(
+                driver, page_urls,
+                lambda d, u: scrape_business(d, u, navigate=False, budget=budget),
+                max_tabs=max_tabs, per_host=per_host, timeout=budget.timeout("detail"),
+                on_error=lambda u, e: budget.fail(classify_error(e), f"{u}: {e}", host_of(u)),
+                ready=ready_selector("UKGC", "summary"),
+            )
+            for url, result in tab_results:
+                if result:
+                    collected_results.append(result)
 
-        for url in page_urls:
             if len(collected_results) >= num_results: break
-            print(f"Scraping detail page: {url}")
-            try:
-                search_results_url = driver.current_url
-                driver.get(url)
-                random_sleep(1.5, 2.5)
-                
-                # UKGC Detail Page Scrape
-                # 0. Handle Cookie Banner
-                try:
-                    cookie_button = WebDriverWait(driver, 3).until(
-                        EC.element_to_be_clickable((By.XPATH, "//button[contains(., 'Accept all cookies')]"))
-                    )
-                    cookie_button.click()
-                    random_sleep(0.5, 1.0)
-                except:
-                    pass
-
-                # 0.5 Ensure we are on the Licence summary page (Fallback if landed on Premises, etc.)
-                try:
-                    current_url = driver.current_url
-                    # Extract ID: handles /detail/123 or /detail/premises/123
-                    id_match = re.search(r'/detail/(?:[^/]+/)?(\d+)', current_url)
-                    if id_match:
-                        business_id = id_match.group(1)
-                        # If the URL is longer than the base detail URL, it's a sub-page
-                        base_detail_url = f"https://www.gamblingcommission.gov.uk/public-register/business/detail/{business_id}"
-                        if current_url.rstrip('/') != base_detail_url:
-                            print(f"Landed on sub-page, jumping to Licence summary: {base_detail_url}")
-                            driver.get(base_detail_url)
-                            random_sleep(1.0, 2.0)
-                    else:
-                        # Fallback click if regex fails
-                        summary_tab = driver.find_elements(By.XPATH, "//a[contains(text(), 'Licence summary')]")
-                        if summary_tab:
-                            driver.execute_script("arguments[0].click();", summary_tab[0])
-                            random_sleep(1.0, 2.0)
-                except Exception as e:
-                    print(f"Fallback navigation to summary failed: {e}")
 
-                detail_soup = BeautifulSoup(driver.page_source, 'html.parser')
-                
-                # 1. Extract Statuses from Summary Table
-                status_counts = {}
-                summary_table = detail_soup.find('table', class_='govuk-table')
-                if not summary_table:
-                    summary_table = detail_soup.find('table') # Fallback
-                
-                if summary_table:
-                    summary_rows = summary_table.select('tbody tr')
-                    for row in summary_rows:
-                        tds = row.find_all('td')
-                        if len(tds) >= 2:
-                            status_text = tds[1].get_text(strip=True)
-                            if status_text:
-                                status_counts[status_text] = status_counts.get(status_text, 0) + 1
-                
-                # Sort for consistent display
-                sorted_statuses = sorted(status_counts.items(), key=lambda x: x[1], reverse=True)
-                formatted_status = ", ".join([f"{count}x {status}" for status, count in sorted_statuses])
-                if not formatted_status:
-                    formatted_status = "No status found"
-                print(f"Extracted formatted status: {formatted_status}")
-                print("-" * 40)
-                
-                # 1.5 Extract Trading Names for Brand Mapping
-                trading_names = []
-                try:
-                    current_url = driver.current_url
-                    business_id = current_url.split('/')[-1]
-                    if business_id.isdigit():
-                        trading_url = f"https://www.gamblingcommission.gov.uk/public-register/business/detail/trading-names/{business_id}"
-                        print(f"Turbo: Fetching trading names from: {trading_url}")
-                        driver.get(trading_url)
-                        random_sleep(0.8, 1.5)
-                        
-                        trading_soup = BeautifulSoup(driver.page_source, 'html.parser')
-                        trading_table = trading_soup.find('table', class_='govuk-table')
-                        if trading_table:
-                            rows = trading_table.select('tbody tr')
-                            for r in rows:
-                                tds = r.find_all('td')
-                                if tds:
-                                    name = tds[0].get_text(strip=True)
-                                    if name:
-                                        trading_names.append(name.lower())
-                        print(f"Found {len(trading_names)} total trading names (including inactive).")
-                        print("-" * 40)
-                        # Return to summary to get ID correctly if needed, or just stay on detail/trading-names
-                        # The domain logic below also uses the ID
-                except Exception as e:
-                    print(f"Could not extract trading names: {e}")
+            if not next_serp_page(driver, budget): break
+    except BudgetExceeded as e:
+        print(f"Stopping search: {e}")
+        budget.fail(e.kind, str(e))
+
+    return collected_results
+
+def run_pipeline(search_driver, detail_driver, companies, num_results=1, required_prefix=None, total=None, guard=None,
+                 detail_guard=None):
+    """Pipelined mode: one driver searches the next company while the other scrapes the current one.
 
-                # 2. Extract Domains (TURBO: Direct URL Navigation)
-                websites = []
+    The search stage resolves business IDs straight from the SERP URLs, so the
+    detail stage lands on the licence summary without the sub-page detour.
+    Throughput is bounded by the slower of the two stages. Yields
+    (company, results) as each company's detail pages are done. A
+    resilience.LookupGuard, if given, budgets and breaks the search stage;
+    `detail_guard` (over the register host) does the same for each
+    company's detail pages, so a slow or blocking register trips its own
+    breaker instead of Google's.
+    """
+    work = queue.Queue(maxsize=2)
+    total = total or "?"
+
+    def search_stage():
+        try:
+            for idx, company_name in enumerate(companies, 1):
+                query = QUERY_TEMPLATE.format(company=company_name)
                 try:
-                    # Extract business ID from current URL
-                    # Format: .../detail/39372 or .../detail/domain-names/39372
-                    current_url = driver.current_url
-                    business_id = current_url.split('/')[-1]
-                    
-                    if business_id.isdigit():
-                        domain_url = f"https://www.gamblingcommission.gov.uk/public-register/business/detail/domain-names/{business_id}"
-                        print(f"Turbo: Jumping directly to domains: {domain_url}")
-                        driver.get(domain_url)
+                    if guard:
+                        urls = guard.run(company_name, lambda budget: find_detail_urls(
+                            search_driver, query, num_results=num_results, required_prefix=required_prefix,
+                            budget=budget))[0] or []
                     else:
-                        # Fallback to clicking if ID extraction fails
-                        print("Clicking 'Domain names' tab (fallback)...")
-                        domain_link_xpath = "//a[contains(@class, 'gc-vertical-nav__link') and contains(normalize-space(.), 'Domain names')]"
-                        domain_button = WebDriverWait(driver, 5).until(
-                            EC.element_to_be_clickable((By.XPATH, domain_link_xpath))
-                        )
-                        driver.execute_script("arguments[0].click();", domain_button)
-                    
-                    random_sleep(1.0, 1.8) # Wait for page/tables load
-                    
-                    # 2.5 Parse domains (Handle cases with zero domains)
-                    try:
-                        # Check if "No domain names have been recorded" message exists
-                        no_domains_text = "No domain names have been recorded for this business"
-                        if no_domains_text in driver.page_source:
-                            print("No domain names recorded for this business.")
-                        else:
-                            # Only wait for tables if the "No domain names" message is NOT present
-                            WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CLASS_NAME, "govuk-table")))
-                            
-                            domain_soup = BeautifulSoup(driver.page_source, 'html.parser')
-                            all_domain_tables = domain_soup.find_all('table', class_='govuk-table')
-                            if not all_domain_tables:
-                                all_domain_tables = domain_soup.find_all('table') 
-                                
-                            for table in all_domain_tables:
-                                domain_rows = table.select('tbody tr')
-                                for row in domain_rows:
-                                    tds = row.find_all('td')
-                                    if len(tds) >= 2:
-                                        domain_name = tds[0].get_text(strip=True)
-                                        status_val = tds[1].get_text(strip=True)
-                                        if domain_name and "." in domain_name:
-                                            # Best Match Logic
-                                            best_brand = ""
-                                            clean_domain = domain_name.split('/')[0].lower()
-                                            # Remove TLDs for matching
-                                            match_domain = re.sub(r'\.(com|co\.uk|net|org|it|es|de|bet)$', '', clean_domain)
-                                            match_domain = match_domain.replace('www.', '').replace('.', '')
-                                            
-                                            if trading_names:
-                                                # 1. Substring match
-                                                for brand in trading_names:
-                                                    clean_brand = brand.replace(' ', '')
-                                                    if clean_brand in match_domain or match_domain in clean_brand:
-                                                        best_brand = brand.title()
-                                                        break
-                                                
-                                                # 2. Fuzzy match if no substring match
-                                                if not best_brand:
-                                                    matches = difflib.get_close_matches(match_domain, trading_names, n=1, cutoff=0.6)
-                                                    if matches:
-                                                        best_brand = matches[0].title()
-                                                    else:
-                                                        best_brand = ""
-                                            
-                                            websites.append({
-                                                'name': domain_name, 
-                                                'status': status_val,
-                                                'brand': best_brand
-                                            })
-                    except Exception as e:
-                        # Only print the short error to keep the console clean
-                        print(f"Note: Could not parse domains (usually means none listed).")
-                    print(f"Found {len(websites)} domain names total.")
-                    print("-" * 40)
+                        urls = find_detail_urls(search_driver, query, num_results=num_results, required_prefix=required_prefix)
                 except Exception as e:
-                    print(f"Could not extract domains: {e}")
-                
-                # website_str is now a list of dicts, but search_web expects a string or similar
-                # Let's adjust how we return results to handle domain statuses
-                collected_results.append({
-                    'url': url,
-                    'websites': websites, # List of {'name': ..., 'status': ...}
-                    'status': formatted_status
-                })
-                
-                driver.get(search_results_url)
-                WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, "q")))
-            except Exception as e:
-                print(f"Error: {e}")
-        
-        if len(collected_results) >= num_results: break
-        
-        # Next page (simplified for core logic)
+                    print(f"Search failed for {company_name}: {e}")
+                    urls = []
+                targets = []
+                for url in urls:
+                    business_id = business_id_from_url(url)
+                    targets.append(f"{DETAIL_BASE_URL}/{business_id}" if business_id else url)
+                print(f"[search {idx}/{total}] {company_name}: {len(targets)} register page(s)")
+                work.put((idx, company_name, targets))
+        finally:
+            work.put(None)
+
+    searcher = threading.Thread(target=search_stage, daemon=True)
+    searcher.start()
+
+    while True:
+        item = work.get()
+        if item is None:
+            break
+        idx, company_name, targets = item
+        print(f"[{idx}/{total}] Processing: {company_name}")
+        print("-" * 40)
+        if detail_guard and targets:
+            company_results = detail_guard.run(
+                company_name, lambda budget: scrape_details(detail_driver, targets, budget))[0] or []
+        else:
+            company_results = scrape_details(detail_driver, targets)
+        yield company_name, company_results
+
+    searcher.join()
+
+def scrape_details(driver, urls, budget=None):
+    """Scrapes the register pages of one company under its budget; failures are recorded against the register."""
+    results = []
+    for url in urls:
+        print(f"Scraping detail page: {url}")
         try:
-            next_button = driver.find_element(By.ID, "pnnext")
-            next_button.click()
-        except: break
+            results.append(scrape_business(driver, url, budget=budget))
+        except Exception as e:
+            print(f"Error: {e}")
+            if budget:
+                budget.fail(classify_error(e, page_source(driver)), f"{url}: {e}", host_of(url))
+    return results
 
-    return collected_results
+EXPORT_HEADERS = ["UKGC - Licencia", "Company", "Brand", "Website", "URL Status", "Certificate URL", "Status"]
+EXPORT_WIDTHS = {'A': 15, 'B': 30, 'C': 20, 'D': 25, 'E': 15, 'F': 15, 'G': 30}
+
+def result_rows(company_name, results):
+    """Workbook rows for one company: one per domain, or a single placeholder row."""
+    if not results:
+        yield ["UKGC - Licencia", company_name, "", "", "", "", ""]
+        return
+    for result in results:
+        for domain in result.domains:
+            yield [
+                "UKGC - Licencia",
+                company_name,
+                domain.brand or "",
+                domain.name,
+                domain.status,
+                result.url,
+                result.status
+            ]
+        if not result.domains:
+            yield ["UKGC - Licencia", company_name, "", "", "", result.url, result.status]
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Search for Company Licences on the UK Gambling Commission register.")
@@ -383,78 +518,176 @@ if __name__ == "__main__":
     parser.add_argument("--attach", action="store_true", help="Attach to an already running Chrome on localhost:9222")
     parser.add_argument("--user-data-dir", type=str, help="Path to your Chrome user data directory")
     parser.add_argument("--profile", type=str, default="Default", help="Chrome profile directory name")
+    parser.add_argument("--tabs", type=positive_int, default=4, help="Max detail pages loading at once in background tabs (default: 4)")
+    parser.add_argument("--tabs-per-host", type=positive_int, default=2, help="Max concurrent detail tabs per host (default: 2)")
+    parser.add_argument("--batch-queries", action="store_true", help="Pack several companies into one OR query and attribute results back")
+    parser.add_argument("--batch-query-len", type=int, default=DEFAULT_MAX_QUERY_LEN, help=f"Max characters per batched query (default: {DEFAULT_MAX_QUERY_LEN})")
+    parser.add_argument("--index", type=str, help="Also load the results into this cross-registry SQLite index")
+    parser.add_argument("--shard", type=parse_shard, help="Only process shard i of N of --file, e.g. 2/4 (merge with merge_shards.py)")
+    parser.add_argument("--queue", type=str, help="Pull companies from this shared SQLite work queue (seeded from --file if empty)")
+    parser.add_argument("--worker-id", type=str, help="Worker name recorded in the queue (default: host-pid)")
+    parser.add_argument("--lease", type=int, default=DEFAULT_LEASE, help=f"Seconds before a claimed company returns to the queue (default: {DEFAULT_LEASE})")
+    parser.add_argument("--company-timeout", type=float, default=DEFAULT_COMPANY_TIMEOUT, help=f"Time budget per company in seconds (default: {DEFAULT_COMPANY_TIMEOUT})")
+    parser.add_argument("--phase-timeout", type=parse_phase_timeout, action="append", default=[], metavar="PHASE=SECONDS", help="Override one phase's wait cap, e.g. consent=1 (repeatable)")
+    parser.add_argument("--breaker-threshold", type=int, default=5, help="Consecutive timeouts/blocks on a host before its lookups are deferred (default: 5)")
+    parser.add_argument("--breaker-cooldown", type=float, default=120, help="Seconds a tripped host is left alone (default: 120)")
+    parser.add_argument("--page-load", choices=PAGE_LOAD_STRATEGIES, help="Chrome page-load strategy (default: the registry's, see extraction_specs/)")
+    parser.add_argument("--fast-start", action="store_true", help="Reuse the cached chromedriver path instead of resolving it online")
+    parser.add_argument("--startup-report", action="store_true", help="Print how long each startup phase took")
+    parser.add_argument("--pipeline", action="store_true", help="Use a second browser to scrape details while the next company is searched")
     
+    add_rate_arguments(parser)
+    add_recycle_arguments(parser)
+    add_template_arguments(parser)
+    add_profile_arguments(parser)
     args = parser.parse_args()
+    start_profiling(args, "ukgc")
+    configure_rate_limit(args)
+    startup = StartupTimer()
+    startup.mark("imports + argument parsing")
     companies = []
     start_time = time.time()
     
     if args.file:
-        with open(args.file, 'r', encoding='utf-8') as f:
-            companies = [line.strip() for line in f if line.strip()]
+        # Names are streamed from the file; only the count is taken up front
+        total = count_companies(args.file, args.shard)
+        companies = iter_companies(args.file, args.shard)
     elif args.company:
         companies = [" ".join(args.company)]
+        total = 1
+    elif args.queue:
+        total = 0
     else:
         parser.print_help()
         exit(1)
     
-    all_results = {}
+    if args.pipeline and args.attach:
+        print("Error: --pipeline launches its own second browser and cannot be combined with --attach.")
+        exit(1)
+
+    if args.shard and not args.file:
+        print("Error: --shard splits a --file input, it cannot be used with a single company.")
+        exit(1)
+
+    queue_worker = None
+    if args.queue:
+        if args.pipeline or args.batch_queries:
+            print("Error: --queue hands out one company at a time and cannot be combined with --pipeline or --batch-queries.")
+            exit(1)
+        queue_worker = start_worker(args.queue, "UKGC", file=args.file, shard=args.shard,
+                                    worker_id=args.worker_id, lease_seconds=args.lease)
+        companies = queue_worker
+        total = sum(queue_worker.queue.counts().values())
+
+    output_dir = args.output
+    os.makedirs(output_dir, exist_ok=True)
+    excel_file = os.path.join(output_dir, shard_filename("certificates.xlsx", args.shard))
+    if queue_worker:
+        # Each worker keeps its own rows; the combined workbook is rebuilt from the queue
+        excel_file = os.path.join(output_dir, f"certificates_{queue_worker.worker_id}.xlsx")
+    # Rows go out as each company finishes, nothing is kept per run
+    # Whichever mode finishes a company first, its rows mark time-to-first-result
+    writer = StreamingWorkbook(excel_file, "Certificates", EXPORT_HEADERS, EXPORT_WIDTHS,
+                               on_first_rows=lambda: startup.first_result(args.startup_report))
+
+    # Queue workers, batched queries and the pipeline wait out a tripped breaker instead of deferring
+    guard = LookupGuard(
+        (SERP_HOST, host_of(args.filter)),
+        company_timeout=args.company_timeout, phase_timeouts=dict(args.phase_timeout),
+        threshold=args.breaker_threshold, cooldown=args.breaker_cooldown,
+        defer=not (queue_worker or args.batch_queries or args.pipeline),
+    )
+
     driver = None
+    detail_driver = None
+    recycler = None
     try:
+        # A fresh in-memory copy of the template per browser instead of the persistent profile
+        template = None
+        if args.profile_template and not args.attach:
+            template = ensure_template(init_driver, args.profile_template, profile_directory=args.profile,
+                                       fast_start=args.fast_start, page_load_strategy=args.page_load)
         if args.attach:
-            driver = init_driver(debugger_address="127.0.0.1:9222")
+            driver = init_driver(debugger_address="127.0.0.1:9222", fast_start=args.fast_start, page_load_strategy=args.page_load)
+        elif args.recycle_after or args.recycle_rss:
+            recycler = recycling_driver(init_driver, args.user_data_dir or os.path.join(os.getcwd(), "chrome_profile"),
+                                        args.recycle_after, args.recycle_rss, warm_up=warm_up_google, template=template,
+                                        profile_directory=args.profile, fast_start=args.fast_start, page_load_strategy=args.page_load)
+            driver = recycler.driver
+            guard.before_lookup = recycler.checkpoint
         else:
-            driver = init_driver(user_data_dir=args.user_data_dir, profile_directory=args.profile)
+            driver = init_driver(user_data_dir=clone_profile(template) if template else args.user_data_dir, profile_directory=args.profile, fast_start=args.fast_start, page_load_strategy=args.page_load)
+        if args.pipeline:
+            # Chrome locks its profile directory, so the detail browser gets a sibling one (or its own clone)
+            base_profile = args.user_data_dir or os.path.join(os.getcwd(), "chrome_profile")
+            detail_driver = init_driver(user_data_dir=clone_profile(template) if template else f"{base_profile}_detail", profile_directory=args.profile, fast_start=args.fast_start, page_load_strategy=args.page_load)
+        startup.mark("driver + browser launch")
         
-        for idx, company_name in enumerate(companies, 1):
-            print(f"[{idx}/{len(companies)}] Processing: {company_name}")
-            print("-" * 40)
-            full_query = f'site:gamblingcommission.gov.uk/public-register/business/detail "{company_name}"'
-            results = search_web(driver, full_query, num_results=args.num, required_prefix=args.filter)
-            all_results[company_name] = results
+        if args.pipeline:
+            # The register's breaker and budgets for the detail stage; Google's stay with the search stage
+            detail_guard = LookupGuard(
+                (host_of(DETAIL_BASE_URL),),
+                company_timeout=args.company_timeout, phase_timeouts=dict(args.phase_timeout),
+                threshold=args.breaker_threshold, cooldown=args.breaker_cooldown, defer=False,
+            )
+            for company_name, results in run_pipeline(driver, detail_driver, companies, num_results=args.num,
+                                                      required_prefix=args.filter, total=total, guard=guard,
+                                                      detail_guard=detail_guard):
+                writer.extend(result_rows(company_name, results))
+            detail_guard.report("Detail page outcomes")
+        elif args.batch_queries:
+            batched = run_batched(
+                companies, QUERY_SITE,
+                lambda query, num: guard.run(query, lambda budget: search_web(
+                    driver, query, num_results=num, required_prefix=args.filter,
+                    max_tabs=args.tabs, per_host=args.tabs_per_host, budget=budget))[0],
+                per_company=args.num, max_query_len=args.batch_query_len,
+            )
+            for company_name, results in batched:
+                writer.extend(result_rows(company_name, results))
+        else:
+            def lookup(company_name, budget):
+                full_query = QUERY_TEMPLATE.format(company=company_name)
+                return search_web(driver, full_query, num_results=args.num, required_prefix=args.filter,
+                                  max_tabs=args.tabs, per_host=args.tabs_per_host, budget=budget)
+
+            for idx, company_name in enumerate(companies, 1):
+                print(f"[{idx}/{total}] Processing: {company_name}")
+                print("-" * 40)
+                results, failure = guard.run(company_name, lambda budget: lookup(company_name, budget))
+                if results is None:
+                    continue  # Deferred while the registry's breaker is open, retried below
+                if queue_worker and failure in TRIPPING_KINDS:
+                    print(f"Returning {company_name} to the queue ({failure})")
+                    queue_worker.failed(failure)
+                    continue
+                writer.extend(result_rows(company_name, results))
+                if queue_worker:
+                    queue_worker.done(results)
+
+            for company_name, results in guard.retry_deferred(lookup):
+                writer.extend(result_rows(company_name, results))
+        guard.report()
+        rate_report()
+        session_state(driver).report()
+        if recycler:
+            recycler.report()
+        if detail_driver:
+            session_state(detail_driver).report()
+        navigation_report(driver, detail_driver)
     finally:
-        if driver and not args.attach: driver.quit()
+        if recycler: recycler.close()
+        elif driver and not args.attach: driver.quit()
+        if detail_driver: detail_driver.quit()
+        writer.close()
 
-    import os
-    from openpyxl import Workbook
-    output_dir = args.output_dir
-    os.makedirs(output_dir, exist_ok=True)
-    excel_file = os.path.join(output_dir, "certificates.xlsx")
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Certificates"
-    headers = ["UKGC - Licencia", "Company", "Brand", "Website", "URL Status", "Certificate URL", "Status"]
-    ws.append(headers)
-    
-    for company_name, results in all_results.items():
-        if not results:
-            ws.append(["UKGC - Licencia", company_name, "", "", "", "", ""])
-        else:
-            for result in results:
-                url = result['url']
-                websites_list = result.get('websites', [])
-                global_status = result.get('status', '')
-                
-                if websites_list:
-                    for web_dict in websites_list:
-                        ws.append([
-                            "UKGC - Licencia", 
-                            company_name, 
-                            web_dict.get('brand', ''), 
-                            web_dict['name'], 
-                            web_dict['status'], 
-                            url, 
-                            global_status
-                        ])
-                else:
-                    ws.append(["UKGC - Licencia", company_name, "", "", "", url, global_status])
-    
-    ws.column_dimensions['A'].width = 15
-    ws.column_dimensions['B'].width = 30
-    ws.column_dimensions['C'].width = 20
-    ws.column_dimensions['D'].width = 25
-    ws.column_dimensions['E'].width = 15 # URL Status
-    ws.column_dimensions['F'].width = 15 # Certificate URL
-    ws.column_dimensions['G'].width = 30 # Status
-    wb.save(excel_file)
+    if queue_worker:
+        combined = finish_worker(queue_worker, os.path.join(output_dir, "certificates.xlsx"),
+                                 EXPORT_HEADERS, EXPORT_WIDTHS, result_rows)
+        if combined:
+            excel_file = combined
+
+    if args.index:
+        from registry_index import import_workbook
+        import_workbook(args.index, excel_file, registry="UKGC")
     print(f"Export complete: {excel_file}")
@@ -0,0 +1,104 @@
+"""Streaming input and output for the per-company tools (cga/mga/ukgc).
+
+Company names are read lazily from the input file and each company's rows
+go straight into a write-only workbook as soon as it is done. Nothing is
+accumulated across companies, so memory stays flat however long the list
+is (50k-name re-verification runs included).
+
+Sharding (--shard i/N) splits one input file across hosts: a name belongs to
+shard hash(normalized name) % N + 1, so every host computes the same split
+without coordination and spelling variants of a name land on the same host.
+merge_shards.py puts the shard workbooks back together in input order.
+"""
+import argparse
+import hashlib
+
+from query_batching import normalize_name
+
+
+def parse_shard(value):
+    """argparse type for --shard: "i/N" with 1 <= i <= N, returned as (i, N)."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N (e.g. 2/4), got '{value}'")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 1 and N, got '{value}'")
+    return index, count
+
+
+def shard_of(name, count):
+    """1-based shard a company name belongs to. Stable across runs, hosts and Python versions."""
+    digest = hashlib.sha1(normalize_name(name).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def iter_companies(path, shard=None):
+    """Yields stripped, non-empty company names from a file, one line at a time.
+
+    With shard=(i, N) only the names belonging to shard i are yielded.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            name = line.strip()
+            if name and (shard is None or shard_of(name, shard[1]) == shard[0]):
+                yield name
+
+
+def count_companies(path, shard=None):
+    """Counts the names iter_companies() would yield, without keeping them."""
+    return sum(1 for _ in iter_companies(path, shard))
+
+
+def shard_filename(filename, shard):
+    """certificates.xlsx -> certificates_shard2of4.xlsx (unchanged without a shard)."""
+    if not shard:
+        return filename
+    stem, dot, ext = filename.rpartition(".")
+    return f"{stem}_shard{shard[0]}of{shard[1]}{dot}{ext}"
+
+
+class StreamingWorkbook:
+    """Single-sheet openpyxl workbook in write-only mode.
+
+    Rows are serialised as they are appended (openpyxl spools them to a
+    temporary file) and the workbook is written on close(). Closing saves
+    whatever was appended so far, so an interrupted run keeps its rows.
+    `on_first_rows` is called once, after the first extend() that wrote rows.
+    """
+
+    def __init__(self, path, title, headers, widths=None, on_first_rows=None):
+        from openpyxl import Workbook
+
+        self.path = path
+        self.rows = 0
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(title)
+        # Column widths must be set before the first row is written
+        for column, width in (widths or {}).items():
+            self.ws.column_dimensions[column].width = width
+        self.ws.append(headers)
+        self.closed = False
+        self.on_first_rows = on_first_rows
+
+    def append(self, row):
+        self.ws.append(row)
+        self.rows += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+        if self.rows and self.on_first_rows:
+            callback, self.on_first_rows = self.on_first_rows, None
+            callback()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.wb.save(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
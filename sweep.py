@@ -0,0 +1,211 @@
+"""Runs several registry tools concurrently on one company list and merges their results.
+
+Each registry runs as its own process (search_tool_<registry>.py), so every
+one gets its own browser, its own pacing and its own time budgets, and a
+full sweep takes as long as the slowest registry instead of the sum of all
+of them. cga/mga/ukgc look up the companies of the list; ggl/ksa/sga scrape
+their whole list and only the entries matching a company of the list are
+kept. Each tool writes its usual workbook and log under <output>/<registry>/;
+sweep.xlsx puts every registry's rows together in input order.
+
+Usage:
+    python sweep.py companies.txt
+    python sweep.py companies.txt --registries mga ukgc ggl -o sweep_2026-10 --fast-start
+"""
+import argparse
+import glob
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from profile_template import add_template_arguments
+from query_batching import normalize_name
+from registry_index import REGISTRIES, import_workbook, read_workbook_rows
+from stream_utils import StreamingWorkbook, iter_companies
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PER_COMPANY = ("CGA", "MGA", "UKGC")
+SELENIUM = ("CGA", "MGA", "UKGC", "GGL", "SGA")
+# Workbook each tool leaves in its output directory (the highest checkpoint for ggl/sga)
+OUTPUT_PATTERNS = {
+    "CGA": "certificates.xlsx",
+    "MGA": "certificates.xlsx",
+    "UKGC": "certificates.xlsx",
+    "GGL": "ggl_whitelist_*.xlsx",
+    "SGA": "spillemyndigheden_whitelist_*.xlsx",
+    "KSA": "KSA_Kansspelwijzer_NL_Websites.xlsx",
+}
+SWEEP_HEADERS = ["Company", "Registry", "Registry company", "Brand", "Website", "Status", "Source URL"]
+SWEEP_WIDTHS = {'A': 30, 'B': 8, 'C': 30, 'D': 20, 'E': 25, 'F': 15, 'G': 30}
+_NUMBER_RE = re.compile(r"(\d+)\.xlsx$")
+
+
+def parse_tool_args(value):
+    """argparse type for --tool-args REGISTRY="ARGS", returned as (registry, [args])."""
+    registry, _, extra = value.partition("=")
+    registry = registry.upper()
+    if registry not in REGISTRIES:
+        raise argparse.ArgumentTypeError(f"unknown registry '{registry}' (one of {', '.join(REGISTRIES)})")
+    return registry, shlex.split(extra)
+
+
+def tool_command(registry, args):
+    """Command line running one registry's tool for this sweep (the tool runs inside its output dir)."""
+    command = [sys.executable, os.path.join(HERE, f"search_tool_{registry.lower()}.py")]
+    if registry in PER_COMPANY:
+        command += ["--file", os.path.abspath(args.file), "--company-timeout", str(args.company_timeout)]
+        if args.profile_template:
+            command += ["--profile-template", os.path.abspath(args.profile_template)]
+    if registry != "KSA":
+        command += ["--output", "."]
+    if registry in SELENIUM:
+        if args.fast_start:
+            command.append("--fast-start")
+        if args.page_load:
+            command += ["--page-load", args.page_load]
+    return command + args.tool_args.get(registry, [])
+
+
+def tool_output(registry, directory):
+    """Path of the workbook a tool wrote in `directory`, or None."""
+    paths = glob.glob(os.path.join(directory, OUTPUT_PATTERNS[registry]))
+    if not paths:
+        return None
+    return max(paths, key=lambda p: int(m.group(1)) if (m := _NUMBER_RE.search(p)) else 0)
+
+
+def run_tools(registries, args):
+    """Starts every tool, waits for all of them and returns {registry: (exit code, seconds)}."""
+    running = {}
+    for i, registry in enumerate(registries):
+        if i and args.stagger:
+            time.sleep(args.stagger)  # Browser launches and driver resolution don't all hit at once
+        directory = os.path.join(args.output, registry.lower())
+        os.makedirs(directory, exist_ok=True)
+        log = open(os.path.join(directory, f"{registry.lower()}.log"), "w", encoding="utf-8")
+        process = subprocess.Popen(tool_command(registry, args), cwd=directory, stdout=log,
+                                   stderr=subprocess.STDOUT, env=dict(os.environ, PYTHONUNBUFFERED="1"))
+        running[registry] = (process, log, time.monotonic())
+        print(f"[{registry}] started (pid {process.pid}), log: {log.name}")
+
+    outcomes = {}
+    try:
+        while running:
+            for registry, (process, log, started) in list(running.items()):
+                if process.poll() is None:
+                    continue
+                log.close()
+                del running[registry]
+                outcomes[registry] = (process.returncode, time.monotonic() - started)
+                state = "done" if process.returncode == 0 else f"failed (exit {process.returncode})"
+                print(f"[{registry}] {state} after {outcomes[registry][1]:.0f}s, {len(running)} still running")
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("Interrupted, stopping the remaining tools...")
+        for registry, (process, log, started) in running.items():
+            process.terminate()
+            process.wait()
+            log.close()
+            outcomes[registry] = (process.returncode, time.monotonic() - started)
+    return outcomes
+
+
+def merge_sweep(input_file, workbooks, output):
+    """Writes every registry's rows to `output`, grouped by company in input order. Returns the row count.
+
+    Rows of the per-company tools belong to the company they were looked up
+    for; whole-list rows belong to the input company with the same
+    normalized name and are dropped when no company of the list matches.
+    """
+    rows = defaultdict(list)  # normalized input name -> rows
+    leftover = []
+    names = {normalize_name(name) for name in iter_companies(input_file)}
+    for registry, path in workbooks.items():
+        for company, domain, brand, status, source_url in read_workbook_rows(path, registry):
+            key = normalize_name(company)
+            row = [registry, company, brand, domain, status, source_url]
+            if key in names:
+                rows[key].append(row)
+            elif registry in PER_COMPANY:
+                leftover.append(["", *row])  # Batch rows that could not be attributed
+
+    with StreamingWorkbook(output, "Sweep", SWEEP_HEADERS, SWEEP_WIDTHS) as out:
+        for name in iter_companies(input_file):
+            # pop: a name listed twice gets its rows once
+            for row in rows.pop(normalize_name(name), ()):
+                out.append([name, *row])
+        out.extend(leftover)
+        return out.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several registries concurrently on one company list")
+    parser.add_argument("file", help="File with company names (one per line)")
+    parser.add_argument("--registries", nargs="+", type=str.upper, choices=REGISTRIES, default=list(REGISTRIES),
+                        metavar="REGISTRY", help=f"Registries to run (default: all of {', '.join(REGISTRIES)})")
+    parser.add_argument("-o", "--output", default="sweep", help="Directory for the per-registry outputs and sweep.xlsx (default: sweep)")
+    parser.add_argument("--company-timeout", type=float, default=120, help="Time budget per company for cga/mga/ukgc in seconds (default: 120)")
+    parser.add_argument("--page-load", choices=("normal", "eager", "none"), help="Chrome page-load strategy for the Selenium tools (default: each registry's)")
+    parser.add_argument("--fast-start", action="store_true", help="Pass --fast-start to the Selenium tools")
+    parser.add_argument("--stagger", type=float, default=2, help="Seconds between tool launches (default: 2)")
+    parser.add_argument("--tool-args", type=parse_tool_args, action="append", default=[], metavar='REGISTRY="ARGS"',
+                        help='Extra arguments for one tool, e.g. --tool-args mga="--native" (repeatable)')
+    add_template_arguments(parser)
+    parser.add_argument("--check-domains", action="store_true", help="Check that the merged domains are live (domain_check.py) and add the results to sweep.xlsx")
+    parser.add_argument("--index", type=str, help="Also load every registry's results into this cross-registry SQLite index")
+    args = parser.parse_args()
+    args.tool_args = dict(args.tool_args)
+    registries = list(dict.fromkeys(args.registries))
+
+    if not os.path.isfile(args.file):
+        print(f"Error: File '{args.file}' not found.")
+        exit(1)
+    os.makedirs(args.output, exist_ok=True)
+
+    start = time.monotonic()
+    outcomes = run_tools(registries, args)
+    wall = time.monotonic() - start
+
+    workbooks = {}
+    for registry in registries:
+        path = tool_output(registry, os.path.join(args.output, registry.lower()))
+        if path:
+            workbooks[registry] = path
+        else:
+            print(f"[{registry}] wrote no workbook, see its log")
+
+    print("\nRegistry timings:")
+    for registry in registries:
+        code, seconds = outcomes.get(registry, (None, 0))
+        print(f"  {registry:<5} {seconds:7.0f}s  {'ok' if code == 0 else f'exit {code}'}")
+    total = sum(seconds for _, seconds in outcomes.values())
+    print(f"  wall  {wall:7.0f}s  (run one after another: ~{total:.0f}s)")
+
+    if not workbooks:
+        exit(1)
+    output = os.path.join(args.output, "sweep.xlsx")
+    count = merge_sweep(args.file, workbooks, output)
+    print(f"Merged {len(workbooks)} registr{'y' if len(workbooks) == 1 else 'ies'}, {count} row(s) -> {output}")
+
+    if args.check_domains:
+        from domain_check import annotate_workbook, check_domains, summarize, workbook_domains
+
+        started = time.monotonic()
+        checks = check_domains(workbook_domains(output))
+        summarize(checks, time.monotonic() - started)
+        annotate_workbook(output, checks)
+
+    if args.index:
+        for registry, path in workbooks.items():
+            import_workbook(args.index, path, registry=registry, replace_registry=registry not in PER_COMPANY)
+
+    if any(code != 0 for code, _ in outcomes.values()):
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import asyncio
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from domain_check import CHECK_HEADERS, DomainChecker, annotate_workbook
+from records import DomainCheck
+from stream_utils import StreamingWorkbook
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Redirects every host to shared.test on the first server; shared.test answers 200."""
+
+    def do_HEAD(self):
+        if self.headers["Host"].split(":")[0] == "shared.test":
+            self.send_response(200)
+        else:
+            self.send_response(302)
+            self.send_header("Location", f"http://shared.test:{self.server.shared_port}/")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class SlowStandIn(StandIn):
+    """Holds every connection (the https attempt included) for 0.6s before answering."""
+
+    def handle(self):
+        time.sleep(0.6)
+        super().handle()
+
+
+@pytest.fixture
+def servers():
+    running = []
+    for handler in (StandIn, SlowStandIn):
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        running.append(httpd)
+    for httpd in running:
+        httpd.shared_port = running[0].server_port
+    yield [httpd.server_port for httpd in running]
+    for httpd in running:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_timeout_does_not_cancel_shared_dns_lookup(servers):
+    fast, slow = servers
+    loop = asyncio.new_event_loop()
+
+    async def slow_getaddrinfo(host, *args, **kwargs):
+        await asyncio.sleep(1.2)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", fast))]
+
+    # a.test starts resolving shared.test at once and times out at 1s, before the lookup
+    # ends at 1.2s; b.test (http attempt from 0.6s) reaches the redirect at 1.2s and waits on it
+    loop.getaddrinfo = slow_getaddrinfo
+    checker = DomainChecker(timeout=1.0, resolve={"a.test": ("127.0.0.1", fast), "b.test": ("127.0.0.1", slow)})
+    try:
+        results = loop.run_until_complete(checker.check_all(["a.test", "b.test"]))
+    finally:
+        loop.close()
+
+    assert not results["a.test"].reachable
+    assert results["a.test"].error.startswith("timeout")
+    assert results["b.test"].reachable
+    assert results["b.test"].status == 200
+    assert results["b.test"].final_url == f"http://shared.test:{fast}/"
+
+
+def test_rerun_replaces_check_columns_and_keeps_widths(tmp_path):
+    from openpyxl import load_workbook
+
+    path = str(tmp_path / "certificates.xlsx")
+    with StreamingWorkbook(path, "Certificates", ["Company", "Website", "URL"], {"A": 30, "B": 25, "C": 15}) as out:
+        out.append(["Example Ltd", "example.nl", "https://cert.gcb.cw/certificate?id=1"])
+
+    annotate_workbook(path, {"example.nl": DomainCheck("example.nl", reachable=False, error="dns")})
+    annotate_workbook(path, {"example.nl": DomainCheck("example.nl", True, 200, "https://example.nl/", 12)})
+
+    wb = load_workbook(path)
+    ws = wb.active
+    assert [c.value for c in ws[1]] == ["Company", "Website", "URL"] + CHECK_HEADERS
+    assert [c.value for c in ws[2]] == ["Example Ltd", "example.nl", "https://cert.gcb.cw/certificate?id=1",
+                                        "yes", 200, "https://example.nl/", 12]
+    assert [ws.column_dimensions[c].width for c in "ABC"] == [30, 25, 15]
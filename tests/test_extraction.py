@@ -0,0 +1,22 @@
+from extraction import get_extractor, parse_html
+
+
+def _result(body):
+    return parse_html(f'<div class="g"><a href="https://cert.gcb.cw/certificate?id=1"><h3>Certificate</h3></a>{body}</div>').div
+
+
+def test_cga_snippet_reads_the_certificate_sentence():
+    container = _result('<div><span>cert.gcb.cw</span><span class="VwiC3b">This is to certify that '
+                        'example.com is operated by Example N.V., registered in Curacao</span></div>')
+    assert get_extractor("CGA").extract("snippet", container) == {"website": "example.com", "operator": "Example N.V."}
+
+
+def test_cga_snippet_falls_back_to_the_whole_result():
+    # No known snippet class: the sentence is read from the result element itself
+    container = _result("<em>This is to certify that</em> example.com is operated by Example Ltd; licence 1668/JAZ")
+    assert get_extractor("CGA").extract("snippet", container) == {"website": "example.com", "operator": "Example Ltd"}
+
+
+def test_cga_snippet_without_sentence():
+    container = _result('<span class="VwiC3b">Certificate validation</span>')
+    assert get_extractor("CGA").extract("snippet", container) == {"website": None, "operator": None}
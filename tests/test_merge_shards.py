@@ -0,0 +1,47 @@
+from openpyxl import Workbook, load_workbook
+
+from merge_shards import UNATTRIBUTED_PREFIX, merge_shards
+from stream_utils import shard_of
+
+HEADER = ["Source", "Company", "Brand", "Website", "URL", "Operator"]
+
+
+def _shard(path, rows):
+    wb = Workbook()
+    wb.active.append(HEADER)
+    for row in rows:
+        wb.active.append(row)
+    wb.save(path)
+
+
+def test_deferred_companies_merge_back_in_input_order(tmp_path):
+    names = [f"Company {i} Ltd" for i in range(8)]
+    (tmp_path / "companies.txt").write_text("\n".join(names) + "\n", encoding="utf-8")
+    shards = {1: [], 2: []}
+    for name in names:
+        shards[shard_of(name, 2)].append(name)
+    assert shards[1] and shards[2]
+
+    paths = []
+    for index, own in shards.items():
+        # The shard's first company was deferred by an open breaker and written last
+        order = own[1:] + own[:1]
+        rows = []
+        for name in order:
+            rows += [["CGA - Licencia", name, "", "", f"https://cert.gcb.cw/certificate?id={name}-{n}", ""] for n in range(2)]
+        rows.append(["CGA - Licencia", f"{UNATTRIBUTED_PREFIX}{order[-1]})", "", "", "https://cert.gcb.cw/certificate?id=x", ""])
+        path = tmp_path / f"certificates_shard{index}of2.xlsx"
+        _shard(path, rows)
+        paths.append(str(path))
+
+    output = tmp_path / "certificates.xlsx"
+    assert merge_shards(str(tmp_path / "companies.txt"), paths, str(output)) == 2 * len(names) + 2
+
+    companies = [row[1] for row in load_workbook(output, read_only=True).active.iter_rows(min_row=2, values_only=True)]
+    attributed = [c for c in companies if not c.startswith(UNATTRIBUTED_PREFIX)]
+    assert attributed == [name for name in names for _ in range(2)]
+    # Batch leftovers follow the company they were found with
+    for index, company in enumerate(companies):
+        if company.startswith(UNATTRIBUTED_PREFIX):
+            assert companies[index - 1] == company[len(UNATTRIBUTED_PREFIX):-1]
+
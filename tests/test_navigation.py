@@ -0,0 +1,37 @@
+import threading
+
+from navigation import NavigationStats
+
+
+class StubDriver:
+    """Each navigation opens a new tab, so `pending` keeps hitting its cap."""
+
+    def __init__(self):
+        self.tabs = 0
+
+    @property
+    def current_window_handle(self):
+        return f"tab-{self.tabs}"
+
+    def execute_script(self, script):
+        self.tabs += 1
+        return 1000.0, 0, 500.0
+
+
+def test_concurrent_records_keep_counts_and_pending_cap():
+    stats = NavigationStats()
+
+    def worker():
+        driver = StubDriver()
+        for _ in range(2000):
+            stats.settle(driver)
+            stats.record(driver, "ukgc", 0.01)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stats.navigations["ukgc"] == 8 * 2000
+    assert len(stats.pending) <= 256
@@ -0,0 +1,76 @@
+import sys
+import time
+import types
+
+import pytest
+
+import search_api
+from records import LicenceRecord
+from resilience import LookupGuard
+
+
+class StubDriver:
+    def __init__(self):
+        self.quit_calls = 0
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+@pytest.fixture
+def tool(monkeypatch):
+    """Stand-in for search_tool_mga: "Boom" times out, "Nobody" has no licence, the rest have one."""
+    module = types.ModuleType("search_tool_mga")
+    module.SERP_HOST = "google.com"
+    module.QUERY_TEMPLATE = 'site:authorisation.mga.org.mt "{company}"'
+    module.drivers = []
+
+    def init_driver(**options):
+        driver = StubDriver()
+        module.drivers.append(driver)
+        return driver
+
+    def search_web(driver, query, num_results=1, required_prefix=None, budget=None, **options):
+        company = query.split('"')[1]
+        if company == "Boom":
+            raise TimeoutError("results did not load")
+        if company == "Nobody":
+            return []
+        return [LicenceRecord(f"{required_prefix}/{company}", status="Active", company=company)]
+
+    module.init_driver = init_driver
+    module.search_web = search_web
+    monkeypatch.setitem(sys.modules, "search_tool_mga", module)
+    return module
+
+
+def test_results_follow_input_order_and_injected_driver_stays_open(tool):
+    driver = StubDriver()
+    results = list(search_api.lookup_mga(["Alpha", "Nobody", "Beta"], driver=driver, pace=False))
+
+    assert [r.company for r in results] == ["Alpha", "Nobody", "Beta"]
+    assert [r.failure for r in results] == [None, "not_found", None]
+    assert results[0].records[0].url == "https://authorisation.mga.org.mt/Alpha"
+    assert all(r.registry == "MGA" for r in results)
+    assert driver.quit_calls == 0
+    assert tool.drivers == []
+
+
+def test_own_driver_is_quit(tool):
+    list(search_api.lookup_mga(["Alpha"], pace=False))
+    assert len(tool.drivers) == 1
+    assert tool.drivers[0].quit_calls == 1
+
+
+def test_deferred_companies_follow_at_the_end(tool):
+    guard = LookupGuard(("google.com", "authorisation.mga.org.mt"), threshold=1, cooldown=0.2)
+
+    def companies():
+        yield "Boom"   # Trips the breaker
+        yield "Alpha"  # Deferred while it is open
+        time.sleep(0.3)
+        yield "Beta"   # Cooldown over, runs in order
+
+    results = list(search_api.lookup_mga(companies(), driver=StubDriver(), guard=guard, pace=False))
+
+    assert [(r.company, r.failure) for r in results] == [("Boom", "timeout"), ("Beta", None), ("Alpha", None)]
@@ -0,0 +1,59 @@
+import importlib
+import sys
+import types
+
+import pytest
+
+from records import LicenceRecord
+
+
+class StubDriver:
+    current_url = "about:blank"
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    """search_daemon over stand-in tools: "Boom" times out, "Nobody" has no licence, the rest have one."""
+    calls = []
+
+    def search_web(driver, query, num_results=1, required_prefix=None, budget=None, **options):
+        calls.append(query)
+        if query == "Boom":
+            raise TimeoutError("results did not load")
+        if query == "Nobody":
+            return []
+        return [LicenceRecord(f"{required_prefix}/{query}", company=query)]
+
+    for name in ("search_tool_cga", "search_tool_mga", "search_tool_ukgc"):
+        module = types.ModuleType(name)
+        module.SERP_HOST = "google.com"
+        module.QUERY_TEMPLATE = "{company}"
+        module.init_driver = lambda **options: StubDriver()
+        module.search_web = search_web
+        monkeypatch.setitem(sys.modules, name, module)
+    monkeypatch.delitem(sys.modules, "search_daemon", raising=False)
+    module = importlib.import_module("search_daemon")
+    monkeypatch.setattr(module.RegistryWorker, "warm_up", lambda self: setattr(self, "driver", StubDriver()))
+    module.calls = calls
+    yield module
+    sys.modules.pop("search_daemon", None)
+
+
+def test_lookup_runs_under_the_guard(daemon):
+    worker = daemon.RegistryWorker("mga", guard_options={"threshold": 2, "cooldown": 60})
+
+    results, failure = worker.lookup("Alpha")
+    assert failure is None and results[0].company == "Alpha"
+    assert worker.lookup("Nobody") == ([], "not_found")
+    # Failures come back as a kind instead of an exception, and trip the breaker
+    assert worker.lookup("Boom") == ([], "timeout")
+    assert worker.lookup("Boom") == ([], "timeout")
+
+    with pytest.raises(daemon.RegistryBlocked) as blocked:
+        worker.lookup("Beta")
+    assert blocked.value.retry_in > 0
+    assert "Beta" not in daemon.calls
+    assert worker.guard.outcomes == {"ok": 1, "not_found": 1, "timeout": 2}
@@ -0,0 +1,64 @@
+import inspect
+import tracemalloc
+
+import pytest
+
+from records import LicenceRecord
+from stream_utils import StreamingWorkbook, iter_companies
+
+HEADERS = ["Source", "Company", "Brand", "Website", "URL", "Operator"]
+
+
+def _plain_rows(name):
+    yield ["CGA - Licencia", name, "", f"example{len(name)}.com", "https://cert.gcb.cw/certificate?id=1", name]
+
+
+def _peak_streaming(tmp_path, rows, company_rows=_plain_rows):
+    """Peak traced memory of streaming `rows` names from a file into a workbook."""
+    source = tmp_path / f"companies_{rows}.txt"
+    with open(source, "w", encoding="utf-8") as f:
+        for i in range(rows):
+            f.write(f"Example Gaming Company {i} Limited\n")
+
+    tracemalloc.start()
+    try:
+        with StreamingWorkbook(str(tmp_path / f"out_{rows}.xlsx"), "Certificates", HEADERS) as out:
+            for name in iter_companies(str(source)):
+                out.extend(company_rows(name))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _assert_flat(tmp_path, company_rows=_plain_rows):
+    _peak_streaming(tmp_path, 100, company_rows)  # Module imports and openpyxl's first-use caches are not per row
+    small = _peak_streaming(tmp_path, 2_000, company_rows)
+    large = _peak_streaming(tmp_path, 20_000, company_rows)
+    # Ten times the rows: anything kept per row would show up as ~10x the peak
+    assert large < small * 1.5
+
+
+def test_peak_memory_does_not_grow_with_row_count(tmp_path):
+    _assert_flat(tmp_path)
+
+
+def test_tool_result_rows_stream(tmp_path):
+    pytest.importorskip("selenium")
+    from search_tool_cga import result_rows
+
+    def company_rows(name):
+        return result_rows(name, [LicenceRecord("https://cert.gcb.cw/certificate?id=1", company=name, operator=name)])
+
+    # Rows are produced lazily, one company at a time, straight into the workbook
+    assert inspect.isgenerator(company_rows("Example"))
+    _assert_flat(tmp_path, company_rows)
+
+
+def test_first_rows_callback_fires_once(tmp_path):
+    calls = []
+    with StreamingWorkbook(str(tmp_path / "out.xlsx"), "Certificates", ["Company"],
+                           on_first_rows=lambda: calls.append(out.rows)) as out:
+        out.extend([])
+        out.extend([["A"], ["A"]])
+        out.extend([["B"]])
+    assert calls == [2]
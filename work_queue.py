@@ -0,0 +1,310 @@
+"""Shared SQLite work queue for cga/mga/ukgc worker processes.
+
+Workers started with --queue pull one company at a time from the queue
+instead of walking a fixed input list. A claim is a lease: if a worker dies
+or hangs, its company goes back to the queue once the lease expires and
+another worker picks it up. Results and attempt counts are stored next to
+each item, so workers can be added or stopped at any time during a run and
+the workbook is rebuilt from the queue in input order once it is drained.
+
+The database may live on a shared disk. It uses SQLite's rollback journal
+rather than WAL, because WAL needs shared memory on a single host.
+
+Usage:
+    python work_queue.py --queue jobs.sqlite --registry MGA load companies.txt
+    python search_tool_mga.py --queue jobs.sqlite          # on every worker host
+    python work_queue.py --queue jobs.sqlite --registry MGA status
+    python work_queue.py --queue jobs.sqlite --registry MGA retry-failed
+"""
+import argparse
+import os
+import socket
+import sqlite3
+import time
+
+import records
+from stream_utils import iter_companies
+
+DEFAULT_LEASE = 600
+DEFAULT_MAX_ATTEMPTS = 3
+REGISTRIES = ("CGA", "MGA", "UKGC")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    registry TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    company TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    results TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (registry, position)
+);
+CREATE INDEX IF NOT EXISTS idx_items_claim ON items(registry, status, position);
+"""
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """Leased work items of one registry in a shared SQLite database."""
+
+    def __init__(self, path, registry, lease_seconds=DEFAULT_LEASE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.registry = registry.upper()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Autocommit mode; claims open their own IMMEDIATE transaction
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, sql, params=()):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = self.conn.execute(sql, params)
+            self.conn.execute("COMMIT")
+            return cur.rowcount
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def load(self, companies, only_if_empty=False):
+        """Appends companies after the existing items. Returns how many were added.
+
+        With only_if_empty the queue is seeded only when it has no items yet,
+        so several workers started with the same --file load it once.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            start = self.conn.execute(
+                "SELECT COALESCE(MAX(position), 0) FROM items WHERE registry = ?", (self.registry,)
+            ).fetchone()[0]
+            count = 0
+            if only_if_empty and start:
+                self.conn.execute("COMMIT")
+                return 0
+            for offset, company in enumerate(companies, 1):
+                self.conn.execute(
+                    "INSERT INTO items (registry, position, company, updated_at) VALUES (?, ?, ?, ?)",
+                    (self.registry, start + offset, company, now),
+                )
+                count += 1
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def claim(self, worker):
+        """Leases the next pending (or lease-expired) item. Returns a Row or None."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT position, company, attempts FROM items WHERE registry = ? AND attempts < ? AND "
+                "(status = 'pending' OR (status = 'leased' AND lease_until < ?)) ORDER BY position LIMIT 1",
+                (self.registry, self.max_attempts, now),
+            ).fetchone()
+            if row:
+                self.conn.execute(
+                    "UPDATE items SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE registry = ? AND position = ?",
+                    (worker, now + self.lease_seconds, now, self.registry, row["position"]),
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def complete(self, position, worker, results):
+        """Stores an item's results. A late finish after the lease moved on still counts once."""
+        return self._write(
+            "UPDATE items SET status = 'done', worker = ?, lease_until = NULL, error = NULL, results = ?, "
+            "updated_at = ? WHERE registry = ? AND position = ? AND status != 'done'",
+            (worker, records.dumps(results), time.time(), self.registry, position),
+        )
+
+    def fail(self, position, worker, error):
+        """Returns an item to the queue, or marks it failed once it is out of attempts."""
+        return self._write(
+            "UPDATE items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "worker = ?, lease_until = NULL, error = ?, updated_at = ? "
+            "WHERE registry = ? AND position = ? AND status = 'leased' AND worker = ?",
+            (self.max_attempts, worker, str(error)[:500], time.time(), self.registry, position, worker),
+        )
+
+    def retry_failed(self):
+        """Puts failed items (and expired leases that ran out of attempts) back with fresh attempts."""
+        return self._write(
+            "UPDATE items SET status = 'pending', attempts = 0, lease_until = NULL, updated_at = ? "
+            "WHERE registry = ? AND (status = 'failed' OR (status = 'leased' AND attempts >= ? AND lease_until < ?))",
+            (time.time(), self.registry, self.max_attempts, time.time()),
+        )
+
+    def counts(self):
+        """{status: count}; leases that expired with no attempts left count as failed."""
+        now = time.time()
+        rows = self.conn.execute(
+            "SELECT CASE WHEN status = 'leased' AND lease_until < ? AND attempts >= ? THEN 'failed' "
+            "ELSE status END AS state, COUNT(*) AS n FROM items WHERE registry = ? GROUP BY state",
+            (now, self.max_attempts, self.registry),
+        )
+        return {r["state"]: r["n"] for r in rows}
+
+    def drained(self):
+        """True when nothing is pending or leased any more."""
+        counts = self.counts()
+        return not counts.get("pending") and not counts.get("leased")
+
+    def iter_results(self):
+        """Yields (company, results) for every item in input order; unfinished items yield []."""
+        cur = self.conn.execute(
+            "SELECT company, results FROM items WHERE registry = ? ORDER BY position", (self.registry,)
+        )
+        for row in cur:
+            yield row["company"], records.loads(row["results"]) if row["results"] else []
+
+
+class QueueWorker:
+    """Iterates over claimed companies; call done(results) for each one.
+
+    A company whose loop body did not call done() (an exception was caught
+    and the loop moved on) is handed back as failed. If the worker dies, its
+    lease simply expires. When nothing is claimable but other workers still
+    hold leases, the iterator polls until those finish or expire.
+    """
+
+    def __init__(self, queue, worker_id=None, poll_interval=15):
+        self.queue = queue
+        self.worker_id = worker_id or default_worker_id()
+        self.poll_interval = poll_interval
+        self.current = None
+        self.completed = 0
+
+    def __iter__(self):
+        while True:
+            self._release_current("not completed")
+            row = self.queue.claim(self.worker_id)
+            if row is None:
+                if self.queue.drained():
+                    return
+                time.sleep(self.poll_interval)
+                continue
+            self.current = row
+            if row["attempts"]:
+                print(f"[queue] retrying {row['company']} (attempt {row['attempts'] + 1}/{self.queue.max_attempts})")
+            yield row["company"]
+
+    def done(self, results):
+        if self.current is not None:
+            self.queue.complete(self.current["position"], self.worker_id, results)
+            self.current = None
+            self.completed += 1
+
+    def failed(self, error):
+        self._release_current(error)
+
+    def _release_current(self, error):
+        if self.current is not None:
+            self.queue.fail(self.current["position"], self.worker_id, error)
+            self.current = None
+
+
+def start_worker(path, registry, file=None, shard=None, worker_id=None, lease_seconds=DEFAULT_LEASE):
+    """Opens the queue for a tool run, seeding it from `file` if it is still empty."""
+    queue = WorkQueue(path, registry, lease_seconds=lease_seconds)
+    if file:
+        added = queue.load(iter_companies(file, shard), only_if_empty=True)
+        if added:
+            print(f"Queued {added} companies from {file} in {path}")
+        else:
+            print(f"Queue {path} already holds {registry} items, not reloading {file}")
+    worker = QueueWorker(queue, worker_id)
+    counts = queue.counts()
+    print(f"Worker {worker.worker_id} joining queue {path}: "
+          + ", ".join(f"{counts.get(s, 0)} {s}" for s in ("pending", "leased", "done", "failed")))
+    return worker
+
+
+def export_queue(queue, excel_file, headers, widths, result_rows):
+    """Writes the queue's results to a workbook in input order with a tool's row layout.
+
+    The file is written under a temporary name and renamed into place, since
+    two workers finishing together may both export.
+    """
+    from stream_utils import StreamingWorkbook
+
+    tmp_file = f"{excel_file}.{os.getpid()}.tmp"
+    with StreamingWorkbook(tmp_file, "Certificates", headers, widths) as writer:
+        for company, results in queue.iter_results():
+            writer.extend(result_rows(company, results))
+    os.replace(tmp_file, excel_file)
+    return excel_file
+
+
+def finish_worker(worker, excel_file, headers, widths, result_rows):
+    """Writes the combined workbook if the queue is drained. Returns its path, or None."""
+    queue = worker.queue
+    print(f"Worker {worker.worker_id} completed {worker.completed} item(s)")
+    try:
+        if not queue.drained():
+            counts = queue.counts()
+            print(f"Queue not drained yet ({counts.get('pending', 0)} pending, {counts.get('leased', 0)} leased); "
+                  f"the last worker to finish writes the combined workbook")
+            return None
+        if queue.counts().get("failed"):
+            print(f"Warning: {queue.counts()['failed']} item(s) failed after {queue.max_attempts} attempts; requeue them with "
+                  f"python work_queue.py --queue {queue.path} --registry {queue.registry} retry-failed")
+        return export_queue(queue, excel_file, headers, widths, result_rows)
+    finally:
+        queue.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared SQLite work queue for cga/mga/ukgc workers")
+    parser.add_argument("--queue", required=True, help="SQLite queue path (on a disk every worker can reach)")
+    parser.add_argument("--registry", required=True, choices=REGISTRIES, type=str.upper, help="Registry the items belong to")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_load = sub.add_parser("load", help="Append the companies of a file to the queue")
+    p_load.add_argument("file", help="File with one company name per line")
+
+    sub.add_parser("status", help="Item counts per state")
+    sub.add_parser("retry-failed", help="Give failed items a fresh set of attempts")
+
+    args = parser.parse_args()
+    with WorkQueue(args.queue, args.registry) as queue:
+        if args.command == "load":
+            try:
+                added = queue.load(iter_companies(args.file))
+            except FileNotFoundError:
+                print(f"Error: File '{args.file}' not found.")
+                exit(1)
+            print(f"Queued {added} {args.registry} companies in {args.queue}")
+        elif args.command == "status":
+            counts = queue.counts()
+            for state in ("pending", "leased", "done", "failed"):
+                print(f"{state:<8} {counts.get(state, 0)}")
+        elif args.command == "retry-failed":
+            print(f"Requeued {queue.retry_failed()} item(s)")
+
+
+if __name__ == "__main__":
+    main()